@@ -8,6 +8,9 @@ JUSTIFICACIÓN CIENTÍFICA:
 - Birth-Death Prior: Refleja procesos de especiación/extinción a nivel de familia
 - Calibración Dilcherocarpon: Offset 93.5 Ma (Paleoceno-Eoceno)
 - 50M iteraciones: ESS > 200 para parámetros de reloj relajado
+- Réplicas (generate_replicates): N cadenas de 50M/N iteraciones con semillas
+  distintas, una por núcleo o nodo; combinar_replicas.py verifica que
+  coincidan (PSRF, frecuencias de splits) y une log y árboles
 
 REFERENCIAS:
 - Drummond et al. (2006): Relaxed phylogenetics
@@ -15,22 +18,144 @@ REFERENCIAS:
 - Gilles et al. (2019): Dilcherocarpon fósil de Combretaceae
 """
 
+import os
 import sys
-from Bio import SeqIO
+import json
 import math
+import random
+from xml.sax.saxutils import escape
 
-def generate_beast_xml_thesis(nexus_file):
+# scripts/ del proyecto (archivos.py: lectura transparente de .gz)
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir, 'scripts')
+if SCRIPTS_DIR not in sys.path:
+    sys.path.append(SCRIPTS_DIR)
+from archivos import abrir  # noqa: E402  (supermatriz.nex.gz, salidas .gz)
+
+RATE_NAMES = ['rateAC', 'rateAG', 'rateAT', 'rateCG', 'rateCT', 'rateGT']
+
+# Modelos de seleccion_modelos.py -> (spec BEAST, frecuencias empíricas)
+SUBST_MODELS = {
+    'JC':  ('JukesCantor', False),
+    'F81': ('GTR', True),
+    'K80': ('HKY', False),
+    'HKY': ('HKY', True),
+    'SYM': ('GTR', False),
+    'GTR': ('GTR', True),
+}
+
+CHAIN_LENGTH = 50000000
+LOG_EVERY = 50000
+LOG_PREFIX = 'thesis_beast'
+
+# Dilcherocarpon calibration (MRCAPrior on crown Combretaceae)
+CALIBRATION_TAXA = ['Buchenavia_tetraphylla', 'Conocarpus_erectus',
+                    'Laguncularia_racemosa', 'Terminalia_catappa']
+CALIBRATION_OFFSET = 93.5
+CALIBRATION_M = 1.5
+# Median age of the calibrated node (offset + exp(M)); used to scale fixed starting trees
+CALIBRATION_AGE = CALIBRATION_OFFSET + math.exp(CALIBRATION_M)
+
+
+def load_model(model_arg):
+    """Accept a model name (e.g. 'GTR+I+G') or a JSON file from seleccion_modelos.py."""
+    if model_arg.endswith('.json'):
+        with open(model_arg) as f:
+            return json.load(f)
+    return {'modelo': model_arg}
+
+
+def site_model_lines(modelo=None):
+    """
+    Substitution + site model XML lines.
+    
+    Without a model the original GTR block is produced (rates 1.0, no gamma
+    categories). With a model from seleccion_modelos.py the parameters are
+    fixed at their maximum-likelihood estimates.
+    """
+    if modelo is None:
+        modelo = {'modelo': 'GTR'}
+    name = modelo['modelo']
+    base = name.split('+')[0]
+    spec, empirical = SUBST_MODELS[base]
+    subst_id = base.lower()
+    rates = modelo.get('tasas', [1.0] * 6)
+    
+    lines = [f"    <!-- ===== SUBSTITUTION MODEL: {name} ===== -->"]
+    if spec == 'JukesCantor':
+        lines.append(f"    <input spec='JukesCantor' id='{subst_id}'/>")
+    else:
+        lines.append(f"    <input spec='{spec}' id='{subst_id}'>")
+        if spec == 'HKY':
+            lines.append(f"        <parameter name='kappa' value='{rates[1]}'/>")
+        else:
+            for rate_name, rate in zip(RATE_NAMES, rates):
+                lines.append(f"        <parameter name='{rate_name}' value='{rate}'/>")
+        if empirical:
+            lines.extend([
+                "        <frequencies id='freqs' spec='Frequencies'>",
+                "            <input name='data' idref='alignment'/>",
+                "        </frequencies>",
+            ])
+        else:
+            lines.append("        <frequencies id='freqs' spec='Frequencies' frequencies='0.25 0.25 0.25 0.25'/>")
+        lines.append("    </input>")
+    
+    gamma = " gammaCategoryCount='4'" if '+G' in name else ""
+    lines.extend([
+        "",
+        "    <!-- ===== SITE MODEL ===== -->",
+        f"    <input spec='SiteModel' id='siteModel'{gamma}>",
+        f"        <input name='substModel' idref='{subst_id}'/>",
+        f"        <parameter name='shape' value='{modelo.get('alpha') or 1.0}'/>",
+        f"        <parameter name='proportionInvariant' value='{modelo.get('pinv', 0.0)}'/>",
+        "    </input>",
+        "",
+    ])
+    return lines
+
+
+def initial_tree_lines(newick=None):
+    """
+    Initial tree XML lines.
+    
+    Without a Newick string BEAST builds its own UPGMA ClusterTree at startup.
+    With one (e.g. the calibrated UPGMA tree from arboles_rapidos.py) the
+    tree is parsed with TreeParser; tip names must match the alignment.
+    """
+    if newick is None:
+        return [
+            "    <!-- ===== INITIAL TREE ===== -->",
+            "    <input spec='beast.base.evolution.tree.ClusterTree' id='tree' clusterType='upgma'>",
+            "        <input name='taxa' idref='alignment'/>",
+            "    </input>",
+        ]
+    newick = escape(newick.strip(), {"'": "&apos;"})
+    return [
+        "    <!-- ===== INITIAL TREE: fixed (arboles_rapidos.py) ===== -->",
+        "    <input spec='beast.base.evolution.tree.TreeParser' id='tree' IsLabelledNewick='true'",
+        f"           newick='{newick}'>",
+        "        <input name='taxa' idref='alignment'/>",
+        "    </input>",
+    ]
+
+
+def generate_beast_xml_thesis(nexus_file, modelo=None, output_file="combretaceae_thesis.xml",
+                              initial_tree=None, chain_length=CHAIN_LENGTH, log_prefix=LOG_PREFIX):
     """Generate BEAST XML with Relaxed Clock + Birth-Death + Fossil Calibration."""
+    from Bio import SeqIO  # only needed here; load_model() and friends stay Bio-free
     
-    alignment = list(SeqIO.parse(nexus_file, "nexus"))
+    with abrir(nexus_file, 'r') as handle:
+        alignment = list(SeqIO.parse(handle, "nexus"))
     n_taxa = len(alignment)
     n_char = len(alignment[0])
     
     print(f"[THESIS CONFIG] Alignment: {n_taxa} taxa, {n_char} bp")
+    print(f"[SITE MODEL] {(modelo or {'modelo': 'GTR'})['modelo']}")
     print(f"[CLOCK] Relaxed Clock Log-Normal (heterogeneous evolutionary rates)")
     print(f"[PRIOR] Birth-Death Model (macroevolutionary speciation/extinction)")
-    print(f"[CALIBRATION] Dilcherocarpon fossil: 93.5 Ma (offset)")
-    print(f"[CHAIN] 50,000,000 iterations (ESS > 200)")
+    print(f"[CALIBRATION] Dilcherocarpon fossil: {CALIBRATION_OFFSET} Ma (offset)")
+    print(f"[INITIAL TREE] {'fixed (Newick)' if initial_tree else 'UPGMA ClusterTree'}")
+    print(f"[CHAIN] {chain_length:,} iterations -> {log_prefix}.log / .trees")
     
     xml_lines = [
         "<?xml version='1.0' encoding='UTF-8'?>",
@@ -52,26 +177,10 @@ def generate_beast_xml_thesis(nexus_file):
     xml_lines.extend([
         "    </data>",
         "",
-        "    <!-- ===== SUBSTITUTION MODEL: GTR ===== -->",
-        "    <input spec='GTR' id='gtr'>",
-        "        <parameter name='rateAC' value='1.0'/>",
-        "        <parameter name='rateAG' value='1.0'/>",
-        "        <parameter name='rateAT' value='1.0'/>",
-        "        <parameter name='rateCG' value='1.0'/>",
-        "        <parameter name='rateCT' value='1.0'/>",
-        "        <parameter name='rateGT' value='1.0'/>",
-        "        <frequencies id='freqs' spec='Frequencies'>",
-        "            <input name='data' idref='alignment'/>",
-        "        </frequencies>",
-        "    </input>",
-        "",
-        "    <!-- ===== SITE MODEL ===== -->",
-        "    <input spec='SiteModel' id='siteModel'>",
-        "        <input name='substModel' idref='gtr'/>",
-        "        <parameter name='shape' value='1.0'/>",
-        "        <parameter name='proportionInvariant' value='0.0'/>",
-        "    </input>",
-        "",
+    ])
+    xml_lines.extend(site_model_lines(modelo))
+    
+    xml_lines.extend([
         "    <!-- ===== TREE LIKELIHOOD ===== -->",
         "    <input spec='TreeLikelihood' id='treeLikelihood'>",
         "        <input name='data' idref='alignment'/>",
@@ -79,10 +188,9 @@ def generate_beast_xml_thesis(nexus_file):
         "        <input name='siteModel' idref='siteModel'/>",
         "    </input>",
         "",
-        "    <!-- ===== INITIAL TREE ===== -->",
-        "    <input spec='beast.base.evolution.tree.ClusterTree' id='tree' clusterType='upgma'>",
-        "        <input name='taxa' idref='alignment'/>",
-        "    </input>",
+    ])
+    xml_lines.extend(initial_tree_lines(initial_tree))
+    xml_lines.extend([
         "",
         "    <!-- ===== RELAXED CLOCK: Log-Normal ===== -->",
         "    <!-- Permite tasas evolutivas heterogéneas entre linajes -->",
@@ -116,19 +224,18 @@ def generate_beast_xml_thesis(nexus_file):
         "    <!-- LogNormal: M=1.5, S=0.3 (Gilles et al. 2019) -->",
         "    <distribution id='cal_Dilcherocarpon' monophyletic='true' spec='beast.base.evolution.tree.MRCAPrior' tree='@tree' tipsonly='false'>",
         "        <taxonset id='taxonset_Combretaceae' spec='TaxonSet'>",
-        "            <taxon id='Buchenavia_tetraphylla' spec='Taxon'/>",
-        "            <taxon id='Conocarpus_erectus' spec='Taxon'/>",
-        "            <taxon id='Laguncularia_racemosa' spec='Taxon'/>",
-        "            <taxon id='Terminalia_catappa' spec='Taxon'/>",
+    ])
+    xml_lines.extend(f"            <taxon id='{taxon}' spec='Taxon'/>" for taxon in CALIBRATION_TAXA)
+    xml_lines.extend([
         "        </taxonset>",
-        "        <distr id='LogNormal_Dilcherocarpon' meanInRealSpace='false' offset='93.5' spec='beast.base.inference.distribution.LogNormalDistributionModel'>",
-        "            <parameter dimension='1' estimate='false' id='RealParameter_M_Dil' name='M' value='1.5'/>",
+        f"        <distr id='LogNormal_Dilcherocarpon' meanInRealSpace='false' offset='{CALIBRATION_OFFSET}' spec='beast.base.inference.distribution.LogNormalDistributionModel'>",
+        f"            <parameter dimension='1' estimate='false' id='RealParameter_M_Dil' name='M' value='{CALIBRATION_M}'/>",
         "            <parameter dimension='1' estimate='false' id='RealParameter_S_Dil' lower='0.01' name='S' upper='5.0' value='0.3'/>",
         "        </distr>",
         "    </distribution>",
         "",
         "    <!-- ===== MCMC: 50M ITERATIONS ===== -->",
-        "    <run spec='MCMC' id='mcmc' chainLength='50000000' storeEvery='50000'>",
+        f"    <run spec='MCMC' id='mcmc' chainLength='{chain_length}' storeEvery='{LOG_EVERY}'>",
         "        <state>",
         "            <stateNode idref='tree'/>",
         "            <stateNode idref='clock.rate'/>",
@@ -167,14 +274,14 @@ def generate_beast_xml_thesis(nexus_file):
         "        </operator>",
         "",
         "        <!-- ===== LOGGING: ESS > 200 ===== -->",
-        "        <logger spec='Logger' logEvery='50000' fileName='thesis_beast.log'>",
+        f"        <logger spec='Logger' logEvery='{LOG_EVERY}' fileName='{log_prefix}.log'>",
         "            <log idref='posterior'/>",
         "            <log idref='clock.rate'/>",
         "        </logger>",
-        "        <logger spec='Logger' logEvery='50000' fileName='thesis_beast.trees'>",
+        f"        <logger spec='Logger' logEvery='{LOG_EVERY}' fileName='{log_prefix}.trees'>",
         "            <log idref='tree'/>",
         "        </logger>",
-        "        <logger spec='Logger' logEvery='50000'>",
+        f"        <logger spec='Logger' logEvery='{LOG_EVERY}'>",
         "            <log idref='posterior'/>",
         "        </logger>",
         "    </run>",
@@ -182,17 +289,69 @@ def generate_beast_xml_thesis(nexus_file):
         "</beast>"
     ])
     
-    output_file = "combretaceae_thesis.xml"
-    with open(output_file, 'w') as f:
+    with abrir(output_file, 'w') as f:
         f.write('\n'.join(xml_lines))
     
     print(f"\n[✓ SUCCESS] Generated: {output_file}")
     return output_file
 
+
+def generate_replicates(nexus_file, n_replicates, modelo=None, output_dir=".", initial_tree=None,
+                        chain_length=CHAIN_LENGTH, seed=None):
+    """
+    Write N replicate XMLs that split one long chain across cores or nodes.
+    
+    Each replicate runs ceil(chain_length / N) iterations (rounded up to
+    LOG_EVERY), so after the same relative burn-in the replicates together
+    give the same number of posterior samples as the single chain. Output
+    names get an _rN suffix (thesis_beast_r1.log, ...). BEAST 2 takes the
+    seed on the command line, so the seeds go to replicas.tsv and to
+    run_replicas.sh (one 'beast -seed' line per replicate; on a cluster,
+    submit each line as its own job).
+    
+    Returns:
+        list of (xml, seed, log, trees)
+    """
+    per_chain = math.ceil(chain_length / n_replicates / LOG_EVERY) * LOG_EVERY
+    seeds = random.Random(seed).sample(range(1, 2**31), n_replicates)
+    os.makedirs(output_dir, exist_ok=True)
+    
+    replicates = []
+    for k, replicate_seed in enumerate(seeds, 1):
+        prefix = f"{LOG_PREFIX}_r{k}"
+        xml = os.path.join(output_dir, f"combretaceae_thesis_r{k}.xml")
+        generate_beast_xml_thesis(nexus_file, modelo, xml, initial_tree, per_chain, prefix)
+        replicates.append((xml, replicate_seed, f"{prefix}.log", f"{prefix}.trees"))
+    
+    with abrir(os.path.join(output_dir, "replicas.tsv"), 'w') as f:
+        f.write("replica\tseed\txml\tlog\ttrees\n")
+        for k, (xml, replicate_seed, log, trees) in enumerate(replicates, 1):
+            f.write(f"{k}\t{replicate_seed}\t{os.path.basename(xml)}\t{log}\t{trees}\n")
+    script = os.path.join(output_dir, "run_replicas.sh")
+    with abrir(script, 'w') as f:
+        f.write("#!/bin/sh\n")
+        f.write(f"# {n_replicates} independent BEAST chains of {per_chain:,} iterations; "
+                "on a cluster submit each line as its own job\n")
+        f.write('cd "$(dirname "$0")"\n')
+        for xml, replicate_seed, _, _ in replicates:
+            name = os.path.basename(xml)
+            f.write(f"beast -overwrite -threads 1 -seed {replicate_seed} {name} "
+                    f"> {name[:-4]}.out 2>&1 &\n")
+        f.write("wait\n")
+    os.chmod(script, 0o755)
+    
+    print(f"\n[✓ REPLICATES] {n_replicates} x {per_chain:,} iterations -> {script}")
+    return replicates
+
 if __name__ == "__main__":
     if len(sys.argv) < 2:
-        print("Usage: python3 beast_thesis_config.py <nexus_file>")
+        print("Usage: python3 beast_thesis_config.py <nexus_file> [modelo | modelo.json] [initial.nwk]")
         sys.exit(1)
     
     nexus_file = sys.argv[1]
-    generate_beast_xml_thesis(nexus_file)
+    modelo = load_model(sys.argv[2]) if len(sys.argv) > 2 else None
+    initial_tree = None
+    if len(sys.argv) > 3:
+        with open(sys.argv[3]) as f:
+            initial_tree = f.read()
+    generate_beast_xml_thesis(nexus_file, modelo, initial_tree=initial_tree)
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+LECTURA Y CODIFICACIÓN DE ALINEAMIENTOS - PROYECTO MANGLARES COMBRETACEAE
+==========================================================================
+Propósito: Leer matrices alineadas (FASTA, TNT xread, NEXUS) y codificarlas
+          como matrices uint8 para los análisis vectorizados con NumPy.
+
+Codificación (un bit por base, las ambigüedades IUPAC son el OR de sus bases):
+    A=1  C=2  G=4  T=8   R=A|G  Y=C|T ...   N/?=15   gap '-'=16
+
+Los archivos .gz se leen y escriben de forma transparente (archivos.py); el
+formato se decide por la extensión sin la de compresión (ITS.nex.gz = NEXUS).
+"""
+
+import re
+
+import numpy as np
+
+from archivos import abrir, sin_compresion
+
+# ============================================================================
+# CONFIGURACIÓN
+# ============================================================================
+
+A, C, G, T = 1, 2, 4, 8
+GAP = 16
+DESCONOCIDO = A | C | G | T
+
+IUPAC = {
+    'A': A, 'C': C, 'G': G, 'T': T, 'U': T,
+    'R': A | G, 'Y': C | T, 'S': C | G, 'W': A | T, 'K': G | T, 'M': A | C,
+    'B': C | G | T, 'D': A | G | T, 'H': A | C | T, 'V': A | C | G,
+    'N': DESCONOCIDO, '?': DESCONOCIDO, '-': GAP, '.': GAP,
+}
+
+# Tabla de traducción byte -> código (bytes desconocidos = N)
+TABLA = np.full(256, DESCONOCIDO, dtype=np.uint8)
+for _base, _codigo in IUPAC.items():
+    TABLA[ord(_base)] = _codigo
+    TABLA[ord(_base.lower())] = _codigo
+
+BASES = np.array([A, C, G, T], dtype=np.uint8)
+
+_CHARSET = re.compile(r"\s*CHARSET\s+('[^']+'|\S+)\s*=\s*(\d+)(?:\s*-\s*(\d+))?\s*;", re.I)
+
+# ============================================================================
+# LECTURA
+# ============================================================================
+
+def leer_fasta_alineado(ruta):
+    """Lee un FASTA alineado y retorna [(nombre, secuencia)] (nombre = primera palabra)"""
+    registros = []
+    nombre = None
+    partes = []
+
+    with abrir(ruta, 'r') as f:
+        for linea in f:
+            linea = linea.strip()
+            if not linea:
+                continue
+            if linea.startswith('>'):
+                if nombre is not None:
+                    registros.append((nombre, ''.join(partes)))
+                nombre = linea[1:].split()[0]
+                partes = []
+            else:
+                partes.append(linea.replace(' ', ''))
+        if nombre is not None:
+            registros.append((nombre, ''.join(partes)))
+
+    return registros
+
+
+def leer_tnt(ruta):
+    """Lee el bloque xread de un archivo TNT (formato de convertidor_fasta_corregido.py)"""
+    registros = []
+    with abrir(ruta, 'r') as f:
+        en_matriz = False
+        dimensiones = False
+        for linea in f:
+            linea = linea.strip()
+            if not linea:
+                continue
+            if linea.lower().startswith('xread'):
+                en_matriz = True
+                continue
+            if not en_matriz:
+                continue
+            if linea.startswith(';'):
+                break
+            if not dimensiones:
+                dimensiones = True  # línea "nchar ntax"
+                continue
+            nombre, _, seq = linea.partition(' ')
+            registros.append((nombre, seq.replace(' ', '')))
+    return registros
+
+
+def leer_nexus(ruta):
+    """Lee el bloque MATRIX de un NEXUS de datos (secuencial, no intercalado)"""
+    registros = []
+    with abrir(ruta, 'r') as f:
+        en_matriz = False
+        for linea in f:
+            linea = linea.strip()
+            if not linea:
+                continue
+            if linea.upper().startswith('MATRIX'):
+                en_matriz = True
+                continue
+            if not en_matriz:
+                continue
+            if linea.startswith(';'):
+                break
+            partes = linea.split()
+            registros.append((partes[0].strip("'"), ''.join(partes[1:]).rstrip(';')))
+            if linea.endswith(';'):
+                break
+    return registros
+
+
+def leer_particiones(ruta):
+    """
+    Charsets de un NEXUS (bloques SETS / ASSUMPTIONS), como los escribe
+    escribir_nexus: [(marcador, inicio, fin)] desde 1. Los charsets que no
+    son un único tramo contiguo (con paso '\\3' o varios tramos) se omiten.
+    """
+    particiones = []
+    with abrir(ruta, 'r') as f:
+        for linea in f:
+            match = _CHARSET.match(linea)
+            if match:
+                marcador, inicio, fin = match.groups()
+                particiones.append((marcador.strip("'"), int(inicio), int(fin or inicio)))
+    return particiones
+
+
+def leer_matriz(ruta):
+    """Lee una matriz alineada según la extensión (.tnt, .nex/.nexus, FASTA)"""
+    nombre = sin_compresion(ruta).lower()
+    if nombre.endswith('.tnt'):
+        return leer_tnt(ruta)
+    if nombre.endswith(('.nex', '.nexus', '.nxs')):
+        return leer_nexus(ruta)
+    return leer_fasta_alineado(ruta)
+
+
+# ============================================================================
+# CODIFICACIÓN
+# ============================================================================
+
+def codificar(registros):
+    """
+    Codifica registros alineados como matriz uint8 (taxones × sitios)
+
+    Returns:
+        (nombres, matriz)
+    """
+    if not registros:
+        raise ValueError("Alineamiento vacío")
+    longitudes = {len(seq) for _, seq in registros}
+    if len(longitudes) != 1:
+        raise ValueError(f"Secuencias de longitud desigual: {sorted(longitudes)}")
+
+    nombres = [nombre for nombre, _ in registros]
+    crudo = np.frombuffer(''.join(seq for _, seq in registros).encode('ascii'), dtype=np.uint8)
+    matriz = TABLA[crudo].reshape(len(registros), longitudes.pop())
+    return nombres, matriz
+
+
+def leer_codificado(ruta):
+    """Atajo: leer_matriz + codificar"""
+    return codificar(leer_matriz(ruta))
+
+
+def decodificar(matriz):
+    """Convierte la matriz uint8 de vuelta a cadenas (ambigüedades como IUPAC)"""
+    inversa = np.full(256, ord('N'), dtype=np.uint8)
+    for base, codigo in IUPAC.items():
+        if base in 'U?.':
+            continue
+        inversa[codigo] = ord(base)
+    letras = inversa[matriz]
+    return [fila.tobytes().decode('ascii') for fila in letras]
+
+
+def escribir_fasta(ruta, nombres, secuencias, ancho=80):
+    """Escribe un FASTA con líneas de `ancho` caracteres (estándar FASTA)"""
+    with abrir(ruta, 'w') as f:
+        for nombre, seq in zip(nombres, secuencias):
+            f.write(f">{nombre}\n")
+            for i in range(0, len(seq), ancho):
+                f.write(seq[i:i + ancho] + '\n')
+
+
+def escribir_nexus(ruta, nombres, secuencias, particiones=None):
+    """
+    Escribe un NEXUS de datos (bloque DATA secuencial, como supermatriz.nex)
+
+    Args:
+        particiones: [(marcador, inicio, fin)] con posiciones desde 1;
+            se escriben como charsets en un bloque SETS
+    """
+    ancho = max(len(nombre) for nombre in nombres)
+    with abrir(ruta, 'w') as f:
+        f.write("#NEXUS\nBEGIN DATA;\n")
+        f.write(f"DIMENSIONS NTAX={len(nombres)} NCHAR={len(secuencias[0])};\n")
+        f.write("FORMAT DATATYPE=DNA MISSING=? GAP=-;\nMATRIX\n")
+        for nombre, seq in zip(nombres, secuencias):
+            f.write(f"{nombre:<{ancho}}  {seq}\n")
+        f.write(";\nEND;\n")
+        if particiones:
+            f.write("\nBEGIN SETS;\n")
+            for marcador, inicio, fin in particiones:
+                f.write(f"    CHARSET {marcador} = {inicio}-{fin};\n")
+            f.write("END;\n")
+
+
+# ============================================================================
+# CONCATENACIÓN
+# ============================================================================
+
+def concatenar(alineamientos):
+    """
+    Concatena alineamientos por marcador en una supermatriz
+
+    Args:
+        alineamientos: {marcador: ruta} en el orden de concatenación
+
+    Returns:
+        (nombres, secuencias, particiones); los taxones ausentes en un
+        marcador se rellenan con '?'
+    """
+    por_marcador = []
+    nombres = []
+    vistos = set()
+    for marcador, ruta in alineamientos.items():
+        registros = dict(leer_matriz(ruta))
+        longitudes = {len(seq) for seq in registros.values()}
+        if len(longitudes) != 1:
+            raise ValueError(f"{marcador}: secuencias de longitud desigual {sorted(longitudes)}")
+        por_marcador.append((marcador, registros, longitudes.pop()))
+        for nombre in registros:
+            if nombre not in vistos:
+                vistos.add(nombre)
+                nombres.append(nombre)
+
+    partes = {nombre: [] for nombre in nombres}
+    particiones = []
+    inicio = 1
+    for marcador, registros, longitud in por_marcador:
+        for nombre in nombres:
+            partes[nombre].append(registros.get(nombre, '?' * longitud))
+        particiones.append((marcador, inicio, inicio + longitud - 1))
+        inicio += longitud
+
+    return nombres, [''.join(partes[nombre]) for nombre in nombres], particiones
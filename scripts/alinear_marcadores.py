@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+ALINEAMIENTO PARALELO POR MARCADOR - PROYECTO MANGLARES COMBRETACEAE
+====================================================================
+Propósito: Alinear con MAFFT todos los marcadores a la vez (salida de
+          consolidar_fastas.py), en lugar de pegar un comando por marcador.
+
+Método:
+  - Costo esperado por marcador: n_secuencias × longitud_media² para
+    L-INS-i (aprox. cuadrático en la longitud); n × L para FFT-NS-2.
+  - Los núcleos se reparten entre marcadores en proporción al costo
+    (mínimo 1 por marcador, resto por mayor residuo) y se pasan a MAFFT
+    con --thread; si hay más marcadores que núcleos, se alinean de a
+    `nucleos` a la vez, del más caro al más barato, con 1 hilo cada uno.
+  - Por encima de UMBRAL_SECUENCIAS o UMBRAL_COSTO se usa el algoritmo
+    barato (FFT-NS-2) en lugar de L-INS-i.
+  - La salida de MAFFT va directo a un archivo temporal (sin pasar por
+    memoria) que se renombra al terminar bien.
+  - Caché por contenido: SHA-256 de la entrada + ejecutable + argumentos
+    (sin --thread, que no cambia el resultado). Un marcador sin cambios se
+    copia desde <salida>/.cache_alineamientos/ sin volver a alinear. La
+    caché guarda solo el último alineamiento de cada marcador
+    (<marcador>.<huella>.fasta): no crece con cada cambio de la entrada.
+
+Input:  alineamiento_input/<marcador>_all.fasta (o .fasta.gz: MAFFT recibe
+        una copia descomprimida temporal)
+Output: alineamientos/<marcador>_aligned.fasta
+
+Uso:
+    python alinear_marcadores.py alineamiento_input alineamientos --nucleos 8
+    python alinear_marcadores.py alineamiento_input alineamientos --plan
+    python alinear_marcadores.py entrada salida --mafft ./mafft_falso.py
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import instrumentacion as inst
+from archivos import abrir, comprimido, listar, nombre_base
+
+# ============================================================================
+# CONFIGURACIÓN
+# ============================================================================
+
+ALGORITMOS = {
+    'linsi': ['--maxiterate', '1000', '--localpair'],
+    'fftns2': ['--retree', '2'],
+}
+
+# L-INS-i se recomienda hasta ~200 secuencias; por encima, FFT-NS-2
+UMBRAL_SECUENCIAS = 200
+UMBRAL_COSTO = 200 * 3000 ** 2
+
+CACHE = '.cache_alineamientos'
+
+# ============================================================================
+# PLANIFICACIÓN
+# ============================================================================
+
+def medir_fasta(ruta):
+    """(n_secuencias, longitud_media) de un multi-FASTA"""
+    n = 0
+    total = 0
+    with abrir(ruta, 'r') as f:
+        for linea in f:
+            if linea.startswith('>'):
+                n += 1
+            else:
+                total += len(linea.strip())
+    return n, (total / n if n else 0.0)
+
+
+def costo(n, longitud, algoritmo):
+    if algoritmo == 'linsi':
+        return n * longitud ** 2
+    return n * longitud
+
+
+def repartir_hilos(costos, nucleos):
+    """Hilos por trabajo, proporcionales al costo (mínimo 1, suma = núcleos)"""
+    n = len(costos)
+    if n == 0:
+        return []
+    if n >= nucleos:
+        return [1] * n
+    total = sum(costos)
+    extra = nucleos - n
+    cuotas = [extra * c / total if total else extra / n for c in costos]
+    hilos = [1 + int(q) for q in cuotas]
+    orden = sorted(range(n), key=lambda i: cuotas[i] - int(cuotas[i]), reverse=True)
+    for i in orden[:nucleos - sum(hilos)]:
+        hilos[i] += 1
+    return hilos
+
+
+def planificar(pares, nucleos, algoritmo='linsi', algoritmo_grande='fftns2',
+               umbral_secuencias=UMBRAL_SECUENCIAS, umbral_costo=UMBRAL_COSTO):
+    """
+    Args:
+        pares: {marcador: (entrada, salida)}
+
+    Returns:
+        lista de trabajos (dict) ordenada del más caro al más barato
+    """
+    trabajos = []
+    for marcador, (entrada, salida) in pares.items():
+        n, longitud = medir_fasta(entrada)
+        elegido = algoritmo
+        if n > umbral_secuencias or costo(n, longitud, algoritmo) > umbral_costo:
+            elegido = algoritmo_grande
+        trabajos.append({
+            'marcador': marcador, 'entrada': str(entrada), 'salida': str(salida),
+            'n': n, 'longitud': longitud, 'algoritmo': elegido,
+            'costo': costo(n, longitud, elegido),
+        })
+    trabajos.sort(key=lambda t: t['costo'], reverse=True)
+    for t, hilos in zip(trabajos, repartir_hilos([t['costo'] for t in trabajos], nucleos)):
+        t['hilos'] = hilos
+    return trabajos
+
+
+# ============================================================================
+# ALINEAMIENTO
+# ============================================================================
+
+def huella(entrada, argumentos):
+    h = hashlib.sha256()
+    h.update(json.dumps(argumentos).encode())
+    with open(entrada, 'rb') as f:
+        for bloque in iter(lambda: f.read(1 << 20), b''):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+def podar_cache(cache, marcador, conservar):
+    """Borra los alineamientos viejos de un marcador (queda solo `conservar`)"""
+    prefijo = f"{marcador}."
+    for archivo in os.listdir(cache):
+        if not (archivo.startswith(prefijo) and archivo.endswith('.fasta')):
+            continue
+        ruta = os.path.join(cache, archivo)
+        # <marcador>.<sha256>.fasta: no confundir "ITS" con "ITS.2"
+        if ruta != conservar and len(archivo) == len(prefijo) + 64 + len('.fasta'):
+            os.remove(ruta)
+
+
+def alinear(trabajo, ejecutable='mafft', cache=None):
+    """
+    Alinea un marcador (o lo copia desde la caché)
+
+    Returns:
+        (marcador, 'cache' | 'alineado', segundos)
+    """
+    ejecutable = ejecutable if isinstance(ejecutable, list) else [ejecutable]
+    argumentos = ejecutable + ALGORITMOS[trabajo['algoritmo']]
+    salida = trabajo['salida']
+    inicio = time.perf_counter()
+
+    clave = huella(trabajo['entrada'], argumentos)
+    guardado = os.path.join(cache, f"{trabajo['marcador']}.{clave}.fasta") if cache else None
+    if guardado and os.path.exists(guardado):
+        shutil.copyfile(guardado, salida)
+        inst.incrementar('alineamientos', marcador=trabajo['marcador'], resultado='cache')
+        return trabajo['marcador'], 'cache', time.perf_counter() - inicio
+
+    entrada = trabajo['entrada']
+    descomprimida = None
+    if comprimido(entrada):
+        descomprimida = entrada = f"{salida}.{os.getpid()}.entrada"
+        with abrir(trabajo['entrada'], 'rb') as f, open(entrada, 'wb') as g:
+            shutil.copyfileobj(f, g)
+
+    comando = argumentos + ['--thread', str(trabajo['hilos']), entrada]
+    temporal = f"{salida}.{os.getpid()}.tmp"
+    try:
+        with inst.temporizador('alineamiento', marcador=trabajo['marcador'],
+                               algoritmo=trabajo['algoritmo']):
+            with open(temporal, 'w') as f:
+                resultado = subprocess.run(comando, stdout=f, stderr=subprocess.PIPE, text=True)
+    except OSError:
+        # Ejecutable inexistente o sin permisos: no dejar el temporal vacío
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        raise
+    finally:
+        if descomprimida:
+            os.remove(descomprimida)
+    if resultado.returncode != 0:
+        os.remove(temporal)
+        ultimas = resultado.stderr.strip().splitlines()[-5:]
+        raise RuntimeError('\n   '.join([f"{comando[0]} terminó con código "
+                                         f"{resultado.returncode}"] + ultimas))
+    if os.path.getsize(temporal) == 0:
+        os.remove(temporal)
+        raise RuntimeError(f"{comando[0]} no escribió el alineamiento")
+
+    if guardado:
+        os.makedirs(cache, exist_ok=True)
+        shutil.copyfile(temporal, guardado + '.tmp')
+        os.replace(guardado + '.tmp', guardado)
+        podar_cache(cache, trabajo['marcador'], guardado)
+    os.replace(temporal, salida)
+    inst.incrementar('alineamientos', marcador=trabajo['marcador'], resultado='alineado')
+    return trabajo['marcador'], 'alineado', time.perf_counter() - inicio
+
+
+def alinear_marcadores(pares, nucleos=None, ejecutable='mafft', cache=True, **opciones):
+    """
+    Alinea todos los marcadores en paralelo
+
+    Args:
+        pares: {marcador: (entrada, salida)}
+        nucleos: núcleos a repartir (defecto: todos)
+        ejecutable: ruta de MAFFT o lista (p. ej. ['python', 'mafft_falso.py'])
+        cache: True (carpeta de la primera salida), ruta, o False
+        opciones: algoritmo, algoritmo_grande, umbral_secuencias, umbral_costo
+
+    Returns:
+        {marcador: (estado, segundos)}; lanza RuntimeError si alguno falla
+    """
+    nucleos = nucleos or os.cpu_count() or 1
+    trabajos = planificar(pares, nucleos, **opciones)
+    if not trabajos:
+        return {}
+    if cache is True:
+        cache = os.path.join(os.path.dirname(trabajos[0]['salida']) or '.', CACHE)
+    for t in trabajos:
+        carpeta = os.path.dirname(t['salida'])
+        if carpeta:
+            os.makedirs(carpeta, exist_ok=True)
+
+    resultados = {}
+    errores = []
+    with ThreadPoolExecutor(min(len(trabajos), nucleos)) as pool:
+        futuros = {pool.submit(alinear, t, ejecutable, cache or None): t for t in trabajos}
+        for futuro, t in futuros.items():
+            try:
+                marcador, estado, segundos = futuro.result()
+            except Exception as error:
+                errores.append(str(error))
+                print(f"❌ {t['marcador']:12} {error}")
+                continue
+            resultados[marcador] = (estado, segundos)
+            print(f"✅ {marcador:12} {estado:9} {segundos:8.1f} s "
+                  f"({t['algoritmo']}, {t['hilos']} hilo(s))")
+    if errores:
+        raise RuntimeError(f"{len(errores)} marcador(es) sin alinear")
+    return resultados
+
+
+def pares_carpeta(entrada, salida, marcadores=None):
+    """{marcador: (<entrada>/<m>_all.fasta[.gz], <salida>/<m>_aligned.fasta)}"""
+    pares = {}
+    for archivo in listar(entrada, '*_all.fasta'):
+        marcador = nombre_base(archivo)[:-len('_all')]
+        if marcadores is None or marcador in marcadores:
+            pares[marcador] = (str(archivo), os.path.join(salida, f'{marcador}_aligned.fasta'))
+    return pares
+
+
+@inst.etapa('alineamiento')
+def main():
+    parser = argparse.ArgumentParser(description="Alineamiento MAFFT paralelo por marcador")
+    parser.add_argument("entrada", nargs='?', default="alineamiento_input",
+                        help="Carpeta con <marcador>_all.fasta")
+    parser.add_argument("salida", nargs='?', default="alineamientos",
+                        help="Carpeta para <marcador>_aligned.fasta")
+    parser.add_argument("--marcador", action='append', help="Solo estos marcadores")
+    parser.add_argument("--nucleos", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--mafft", default='mafft', help="Ejecutable de MAFFT")
+    parser.add_argument("--algoritmo", choices=sorted(ALGORITMOS), default='linsi')
+    parser.add_argument("--algoritmo-grande", choices=sorted(ALGORITMOS), default='fftns2')
+    parser.add_argument("--umbral-secuencias", type=int, default=UMBRAL_SECUENCIAS)
+    parser.add_argument("--sin-cache", action="store_true")
+    parser.add_argument("--plan", action="store_true", help="Solo mostrar el reparto de núcleos")
+    args = parser.parse_args()
+
+    pares = pares_carpeta(args.entrada, args.salida, args.marcador)
+    opciones = {'algoritmo': args.algoritmo, 'algoritmo_grande': args.algoritmo_grande,
+                'umbral_secuencias': args.umbral_secuencias}
+
+    print("=" * 80)
+    print("🧬 ALINEAMIENTO PARALELO POR MARCADOR")
+    print("=" * 80)
+    print(f"\n📁 Entrada: {args.entrada}  →  Salida: {args.salida}  "
+          f"({len(pares)} marcadores, {args.nucleos} núcleos)\n")
+
+    if not pares:
+        print(f"❌ ERROR: no hay archivos *_all.fasta en {args.entrada}")
+        print("   Ejecuta primero: python consolidar_fastas.py")
+        sys.exit(1)
+
+    for t in planificar(pares, args.nucleos, **opciones):
+        print(f"   {t['marcador']:12} {t['n']:5} seq × {t['longitud']:7.1f} bp  "
+              f"{t['algoritmo']:7} {t['hilos']:2} hilo(s)")
+    print()
+    if args.plan:
+        return
+
+    try:
+        alinear_marcadores(pares, args.nucleos, args.mafft, not args.sin_cache, **opciones)
+    except RuntimeError as error:
+        print(f"\n❌ {error}")
+        sys.exit(1)
+    print(f"\n✅ Alineamientos en: {args.salida}/")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,452 @@
+#!/usr/bin/env python3
+"""
+LECTURA Y ESCRITURA DE ÁRBOLES NEWICK/NEXUS - PROYECTO MANGLARES COMBRETACEAE
+==============================================================================
+Propósito: Utilidades compartidas para leer archivos de árboles en streaming
+          (BEAST .trees, MrBayes .t/.con.tre, TNT NEXUS, Newick plano),
+          parsear Newick sin recursión y calcular clados como máscaras de bits.
+
+Los archivos se leen línea por línea: nunca se carga el archivo completo en
+memoria, de modo que un .trees de decenas de GB se recorre con memoria plana.
+Los .gz se leen y escriben de forma transparente (archivos.py); en NEXUS
+planos o BGZF, posiciones_arboles() permite saltar el burn-in sin releerlo.
+El índice de posiciones solo se construye a pedido (python archivos.py
+--indexar-arboles, o posiciones_arboles(..., construir=True)) y se guarda en
+una carpeta de caché (~/.cache/conocarpus/indices o $CONOCARPUS_INDICES),
+nunca junto a los datos, con el tamaño y la fecha de modificación del
+archivo; se reutiliza mientras ambos coincidan.
+"""
+
+import hashlib
+import json
+import os
+import re
+
+from archivos import abrir, comprimido, es_bgzf, indexar_lineas, leer_desde
+
+# ============================================================================
+# ESTRUCTURA DE ÁRBOL
+# ============================================================================
+
+_TOKEN = re.compile(r"\s*(\[[^\]]*\]|'[^']*'|[(),:;]|[^\s(),:;\[\]']+)")
+_CABECERA_ARBOL = re.compile(r"u?tree\s+\*?\s*([^\s=\[]+)\s*(?:\[[^\]]*\]\s*)*=(.*)", re.I)
+SUFIJO_INDICE = '.tidx'
+CARPETA_INDICES = os.path.join(os.path.expanduser('~'), '.cache', 'conocarpus', 'indices')
+
+
+class Nodo:
+    """Nodo de un árbol enraizado (las hojas no tienen hijos)"""
+
+    __slots__ = ('hijos', 'padre', 'nombre', 'longitud', 'mascara')
+
+    def __init__(self, padre=None):
+        self.hijos = []
+        self.padre = padre
+        self.nombre = None
+        self.longitud = None
+        self.mascara = 0
+
+    @property
+    def es_hoja(self):
+        return not self.hijos
+
+    def preorden(self):
+        """Recorre el subárbol en preorden (iterativo, sin límite de recursión)"""
+        pila = [self]
+        while pila:
+            nodo = pila.pop()
+            yield nodo
+            pila.extend(reversed(nodo.hijos))
+
+    def postorden(self):
+        """Recorre el subárbol en postorden (hijos antes que el padre)"""
+        return reversed(list(_preorden_invertido(self)))
+
+    def hojas(self):
+        return [n for n in self.preorden() if not n.hijos]
+
+
+def _preorden_invertido(raiz):
+    # Preorden visitando hijos de derecha a izquierda: invertido es postorden
+    pila = [raiz]
+    while pila:
+        nodo = pila.pop()
+        yield nodo
+        pila.extend(nodo.hijos)
+
+
+# ============================================================================
+# PARSEO NEWICK
+# ============================================================================
+
+def parsear_newick(texto, traduccion=None):
+    """
+    Parsea un Newick y retorna la raíz; aplica la tabla translate a las hojas.
+    Un Nodo (árboles de un .ctrees, ver iterar_arboles) se retorna tal cual.
+    """
+    if isinstance(texto, Nodo):
+        return texto
+    raiz = Nodo()
+    actual = raiz
+    esperando_longitud = False
+
+    for match in _TOKEN.finditer(texto):
+        tok = match.group(1)
+        if tok == '(':
+            hijo = Nodo(actual)
+            actual.hijos.append(hijo)
+            actual = hijo
+        elif tok == ',':
+            padre = actual.padre
+            if padre is None:
+                raise ValueError("Newick mal formado: ',' fuera de paréntesis")
+            actual = Nodo(padre)
+            padre.hijos.append(actual)
+        elif tok == ')':
+            actual = actual.padre
+            if actual is None:
+                raise ValueError("Newick mal formado: ')' sin abrir")
+        elif tok == ':':
+            esperando_longitud = True
+            continue
+        elif tok == ';':
+            break
+        elif tok[0] == '[':
+            continue  # comentarios y anotaciones [&...] se ignoran
+        elif esperando_longitud:
+            actual.longitud = float(tok)
+        else:
+            actual.nombre = tok.strip("'")
+        esperando_longitud = False
+
+    if traduccion:
+        for hoja in raiz.hojas():
+            hoja.nombre = traduccion.get(hoja.nombre, hoja.nombre)
+    return raiz
+
+
+def a_newick(raiz, longitudes=True, anotar=None, formato='{:.10g}'):
+    """
+    Escribe un árbol en Newick (iterativo)
+
+    Args:
+        raiz: nodo raíz
+        longitudes: incluir longitudes de rama si existen
+        anotar: función opcional nodo -> texto de comentario (sin corchetes)
+        formato: formato de las longitudes de rama
+    """
+    partes = []
+    pila = [(raiz, False)]
+
+    while pila:
+        nodo, cerrado = pila.pop()
+        if nodo is None:
+            partes.append(',')
+            continue
+        if nodo.hijos and not cerrado:
+            partes.append('(')
+            pila.append((nodo, True))
+            for i, hijo in enumerate(reversed(nodo.hijos)):
+                pila.append((hijo, False))
+                if i < len(nodo.hijos) - 1:
+                    pila.append((None, True))
+            continue
+        if nodo.hijos:
+            partes.append(')')
+        if nodo.nombre is not None:
+            partes.append(nodo.nombre)
+        if anotar is not None:
+            texto = anotar(nodo)
+            if texto:
+                partes.append(f"[&{texto}]")
+        if longitudes and nodo.longitud is not None:
+            partes.append(':' + formato.format(nodo.longitud))
+
+    return ''.join(partes) + ';'
+
+
+# ============================================================================
+# CLADOS Y ALTURAS
+# ============================================================================
+
+def asignar_mascaras(raiz, indice):
+    """Asigna a cada nodo la máscara de bits de las hojas que contiene"""
+    for nodo in raiz.postorden():
+        if nodo.hijos:
+            mascara = 0
+            for hijo in nodo.hijos:
+                mascara |= hijo.mascara
+            nodo.mascara = mascara
+        else:
+            nodo.mascara = 1 << indice[nodo.nombre]
+    return raiz
+
+
+def particion_canonica(mascara, completo):
+    """Forma canónica de una bipartición no enraizada (el taxón 0 queda fuera)"""
+    return completo ^ mascara if mascara & 1 else mascara
+
+
+def biparticiones(raiz, indice):
+    """Conjunto de biparticiones no triviales (no enraizadas) del árbol"""
+    asignar_mascaras(raiz, indice)
+    completo = (1 << len(indice)) - 1
+    splits = set()
+    for nodo in raiz.preorden():
+        if nodo.hijos and nodo is not raiz:
+            split = particion_canonica(nodo.mascara, completo)
+            if 1 < bin(split).count('1') < len(indice) - 1:
+                splits.add(split)
+    return frozenset(splits)
+
+
+def alturas_nodos(raiz):
+    """Retorna {nodo: altura} medida desde la punta más reciente"""
+    profundidad = {raiz: 0.0}
+    maxima = 0.0
+    for nodo in raiz.preorden():
+        base = profundidad[nodo]
+        for hijo in nodo.hijos:
+            profundidad[hijo] = base + (hijo.longitud or 0.0)
+        if not nodo.hijos and base > maxima:
+            maxima = base
+    return {nodo: maxima - p for nodo, p in profundidad.items()}
+
+
+# ============================================================================
+# ARCHIVOS DE ÁRBOLES
+# ============================================================================
+
+def _parsear_translate(texto):
+    traduccion = {}
+    for entrada in texto.split(','):
+        partes = entrada.split(None, 1)
+        if len(partes) == 2:
+            traduccion[partes[0]] = partes[1].strip().strip("'")
+    return traduccion
+
+
+def _tread_a_newick(texto):
+    # Formato tread de TNT: hermanos separados por espacios y terminales
+    # numerados desde 0; se numeran desde 1 como en la exportación NEXUS de TNT
+    partes = []
+    previo = '('
+    for tok in re.findall(r"[()]|[^\s()]+", texto):
+        if tok != ')' and previo != '(':
+            partes.append(',')
+        partes.append(str(int(tok) + 1) if tok.isdigit() else tok)
+        previo = tok
+    return ''.join(partes) + ';'
+
+
+def _firma(ruta):
+    estado = os.stat(ruta)
+    return [estado.st_size, estado.st_mtime_ns]
+
+
+def _ruta_indice(ruta):
+    """<carpeta de caché>/<hash de la ruta absoluta>.tidx"""
+    carpeta = os.environ.get('CONOCARPUS_INDICES') or CARPETA_INDICES
+    clave = hashlib.sha256(os.path.abspath(ruta).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(carpeta, clave + SUFIJO_INDICE)
+
+
+def _leer_indice(ruta):
+    """Posiciones del índice en caché si corresponde al archivo actual; None si no"""
+    try:
+        with open(_ruta_indice(ruta)) as f:
+            datos = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if datos.get('firma') != _firma(ruta):
+        return None
+    return datos.get('posiciones')
+
+
+def _guardar_indice(ruta, posiciones):
+    """Escritura atómica del índice en caché; si la carpeta no admite escritura se omite"""
+    destino = _ruta_indice(ruta)
+    temporal = f"{destino}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        with open(temporal, 'w') as f:
+            json.dump({'firma': _firma(ruta), 'posiciones': posiciones}, f)
+        os.replace(temporal, destino)
+    except OSError:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+
+
+def posiciones_arboles(ruta, construir=False):
+    """
+    Desplazamiento de cada árbol de un NEXUS (de byte, o virtual en BGZF)
+
+    Se usa el índice en caché si el tamaño y la fecha de modificación del
+    archivo no cambiaron.
+
+    Args:
+        construir: True para recorrer el archivo y guardar el índice si no
+            hay uno válido (solo a pedido: los lectores no escriben nada)
+
+    Returns:
+        lista de desplazamientos, o None si no hay índice (y no se pidió
+        construirlo), el archivo no admite acceso aleatorio (gzip común,
+        .ctrees) o no es NEXUS
+    """
+    if str(ruta).endswith('.ctrees') or (comprimido(ruta) and not es_bgzf(ruta)):
+        return None
+    posiciones = _leer_indice(ruta)
+    if posiciones is not None or not construir:
+        return posiciones
+    with abrir(ruta, 'r') as f:
+        if not f.readline().strip().upper().startswith('#NEXUS'):
+            return None
+    posiciones = [desplazamiento for desplazamiento, linea
+                  in indexar_lineas(ruta, ('tree ', 'utree '))
+                  if _CABECERA_ARBOL.match(linea)]
+    _guardar_indice(ruta, posiciones)
+    return posiciones
+
+
+def iterar_arboles(ruta, abrir=abrir, saltar=0, posiciones=None):
+    """
+    Itera en streaming los árboles de un archivo NEXUS, Newick plano o tread
+    de TNT
+
+    Args:
+        saltar: árboles iniciales a descartar (burn-in)
+        posiciones: posiciones_arboles(ruta); con ellas se salta directo al
+            primer árbol conservado en lugar de recorrer el burn-in
+
+    Yields:
+        (nombre, newick, traduccion) sin parsear; traduccion puede ser None.
+        En un .ctrees, newick es directamente el Nodo raíz (ya con los
+        nombres de taxón): se evita reescribir y volver a parsear el texto,
+        y parsear_newick lo acepta sin cambios
+    """
+    if str(ruta).endswith('.ctrees'):
+        # Almacén binario deduplicado (ver almacen_arboles.py)
+        from almacen_arboles import iterar_arboles_compactos
+        for nombre, raiz in iterar_arboles_compactos(ruta, saltar):
+            yield nombre, raiz, None
+        return
+
+    if posiciones is not None and saltar:
+        if saltar >= len(posiciones):
+            return
+        _, _, traduccion = next(_iterar_lineas(ruta, abrir))
+        lineas = leer_desde(ruta, posiciones[saltar])
+        yield from _arboles_de_lineas(lineas, nexus=True, traduccion=traduccion)
+        return
+
+    for i, arbol in enumerate(_iterar_lineas(ruta, abrir)):
+        if i >= saltar:
+            yield arbol
+
+
+def _iterar_lineas(ruta, abrir):
+    with abrir(ruta, 'r') as f:
+        yield from _arboles_de_lineas(f)
+
+
+def _arboles_de_lineas(lineas, nexus=None, traduccion=None):
+    """Máquina de estados de iterar_arboles sobre un iterable de líneas"""
+    en_translate = False
+    buffer = []
+    nombre = None
+    tread = False
+    n_tread = 0
+
+    for linea in lineas:
+        linea = linea.strip()
+        if not linea:
+            continue
+        if nexus is None:
+            nexus = linea.upper().startswith('#NEXUS')
+            if nexus:
+                continue
+
+        if not nexus:
+            minus = linea.lower()
+            if minus.startswith('tread'):
+                tread = True
+                continue
+            if minus.startswith('proc'):
+                tread = False
+                continue
+            buffer.append(linea)
+            if linea.endswith(';') or (tread and linea.endswith('*')):
+                texto = ' '.join(buffer)
+                buffer = []
+                if tread:
+                    n_tread += 1
+                    yield f"tnt_{n_tread}", _tread_a_newick(texto[:-1]), None
+                else:
+                    yield '', texto, None
+            continue
+
+        if buffer:
+            buffer.append(linea)
+            if linea.endswith(';'):
+                yield nombre, ' '.join(buffer), traduccion
+                buffer = []
+            continue
+
+        minus = linea.lower()
+        if en_translate:
+            buffer_translate.append(linea)
+            if linea.endswith(';'):
+                traduccion = _parsear_translate(' '.join(buffer_translate).rstrip(';'))
+                en_translate = False
+            continue
+        if minus.startswith('translate'):
+            en_translate = True
+            buffer_translate = [linea[len('translate'):]]
+            if linea.endswith(';'):
+                traduccion = _parsear_translate(' '.join(buffer_translate).rstrip(';'))
+                en_translate = False
+            continue
+        cabecera = _CABECERA_ARBOL.match(linea)
+        if cabecera:
+            nombre, cuerpo = cabecera.groups()
+            if cuerpo.rstrip().endswith(';'):
+                yield nombre, cuerpo, traduccion
+            else:
+                buffer = [cuerpo]
+
+
+def contar_arboles(ruta, abrir=abrir):
+    """Cuenta árboles sin parsearlos (para calcular el burn-in)"""
+    if str(ruta).endswith('.ctrees'):
+        from almacen_arboles import contar_muestras
+        return contar_muestras(ruta)
+    return sum(1 for _ in _iterar_lineas(ruta, abrir))
+
+
+def escribir_nexus(ruta, taxa, arboles, anotar=None, formato='{:.10g}', abrir=abrir):
+    """
+    Escribe un archivo NEXUS con bloque taxa y translate numérico
+
+    Args:
+        taxa: lista ordenada de nombres de taxones
+        arboles: iterable de (nombre, arbol) donde arbol es un Nodo o un texto
+                 Newick, con nombres completos en las hojas
+        anotar: función opcional nodo -> anotación [&...] (ver a_newick)
+        formato: formato de las longitudes de rama
+    """
+    numeros = {nombre: str(i) for i, nombre in enumerate(taxa, 1)}
+
+    with abrir(ruta, 'w') as f:
+        f.write("#NEXUS\n\nBegin taxa;\n")
+        f.write(f"\tDimensions ntax={len(taxa)};\n\t\tTaxlabels\n")
+        for nombre in taxa:
+            f.write(f"\t\t\t{nombre}\n")
+        f.write("\t\t\t;\nEnd;\nBegin trees;\n\tTranslate\n")
+        f.write(',\n'.join(f"\t\t{i:6d} {nombre}" for i, nombre in enumerate(taxa, 1)))
+        f.write("\n;\n")
+        for nombre, arbol in arboles:
+            raiz = parsear_newick(arbol) if isinstance(arbol, str) else arbol
+            for hoja in raiz.hojas():
+                hoja.nombre = numeros.get(hoja.nombre, hoja.nombre)
+            f.write(f"tree {nombre} = {a_newick(raiz, anotar=anotar, formato=formato)}\n")
+        f.write("End;\n")
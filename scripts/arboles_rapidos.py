@@ -0,0 +1,628 @@
+#!/usr/bin/env python3
+"""
+ÁRBOLES RÁPIDOS POR DISTANCIAS - PROYECTO MANGLARES COMBRETACEAE
+=================================================================
+Propósito: Construir árboles Neighbor-Joining y UPGMA en proceso a partir
+          de una matriz de distancias (matriz_distancias.py), para:
+            - revisar cada marcador antes de días de MCMC (taxones mal
+              ubicados, marcadores en conflicto con la supermatriz),
+            - fijar el árbol inicial de BEAST (en lugar de ClusterTree) y
+              de MrBayes (startvals).
+
+Método (sin bucles por par en Python):
+  - Matriz de tamaño fijo; los clusters unidos se desactivan con inf.
+  - Se mantiene el mínimo de cada fila (valor e índice) y se actualiza al
+    unir: solo se recalculan las filas cuyo mínimo apuntaba a los nodos
+    unidos.
+  - UPGMA: el par a unir es el mínimo de los mínimos de fila (las distancias
+    promediadas nunca bajan del mínimo previo de la fila). Con `clado`
+    (p. ej. los taxones de la calibración fósil) se arma primero el UPGMA
+    del clado y luego el del resto con el clado como un solo cluster, así
+    el clado sale monofilético como exige el MRCAPrior de BEAST.
+  - NJ (como RapidNJ): cada fila guarda sus columnas ordenadas por
+    distancia. En cada paso se evalúa Q_ij = (n-2) d_ij - S_i - S_j en una
+    ventana corta al comienzo de cada fila; el resto de la fila queda
+    acotado por (n-2) d_límite - S_i - max S y solo se amplía la ventana de
+    las filas cuya cota aún no supera el mejor Q. El resultado es el NJ
+    exacto; con distancias arbóreas se evalúan pocas columnas por fila.
+
+Control por marcador: con varios alineamientos se escribe un árbol por
+marcador y una tabla con, para cada taxón, su vecino más cercano y si es de
+otro género habiendo congéneres con datos (candidato a identificación
+errónea o contaminación), más la distancia de Robinson-Foulds de cada
+árbol de marcador contra el de la supermatriz (--referencia).
+
+Uso:
+    python arboles_rapidos.py supermatriz.fasta --metodo upgma --salida inicial.nwk
+    python arboles_rapidos.py alineamientos/*_aligned.fasta --referencia supermatriz.fasta \\
+        --carpeta arboles_marcadores --tabla control_marcadores.tsv
+"""
+
+import argparse
+import os
+import re
+import time
+
+import numpy as np
+
+from arboles_nexus import Nodo, a_newick, biparticiones
+
+# ============================================================================
+# CONFIGURACIÓN
+# ============================================================================
+
+METODOS = ('nj', 'upgma')
+VENTANA = 16   # columnas por fila en la primera pasada de NJ (se cuadruplica si no alcanza)
+ARBOL_MRBAYES = 'inicial'   # nombre del árbol en el bloque trees para startvals
+
+# ============================================================================
+# MÍNIMOS POR FILA
+# ============================================================================
+
+def _hojas(nombres):
+    nodos = []
+    for nombre in nombres:
+        hoja = Nodo()
+        hoja.nombre = nombre
+        nodos.append(hoja)
+    return nodos
+
+
+def _unir(padre, hijos, longitudes):
+    for hijo, longitud in zip(hijos, longitudes):
+        hijo.longitud = max(0.0, longitud)
+        hijo.padre = padre
+        padre.hijos.append(hijo)
+    return padre
+
+
+def _preparar(distancias):
+    d = np.array(distancias, dtype=np.float64)
+    if d.ndim != 2 or d.shape[0] != d.shape[1]:
+        raise ValueError("La matriz de distancias debe ser cuadrada")
+    if np.isnan(d).any():
+        raise ValueError("La matriz de distancias contiene NaN")
+    np.fill_diagonal(d, np.inf)
+    return d
+
+
+def _actualizar_minimos(d, minimos, argmin, activos, i, j, nuevas):
+    """
+    Mínimos de fila después de unir j en i (fila i = nuevas distancias):
+    se recalculan las filas cuyo mínimo apuntaba a i o j; el resto solo
+    puede bajar hacia el nuevo nodo
+    """
+    minimos[i] = nuevas[activos].min() if activos.size else np.inf
+    argmin[i] = activos[np.argmin(nuevas[activos])] if activos.size else i
+    minimos[j] = np.inf
+
+    otros = activos[activos != i]
+    afectadas = otros[(argmin[otros] == i) | (argmin[otros] == j)]
+    if afectadas.size:
+        filas = d[afectadas]
+        argmin[afectadas] = filas.argmin(axis=1)
+        minimos[afectadas] = filas[np.arange(len(afectadas)), argmin[afectadas]]
+
+    resto = otros[(argmin[otros] != i) & (argmin[otros] != j)]
+    baja = resto[nuevas[resto] < minimos[resto]]
+    minimos[baja] = nuevas[baja]
+    argmin[baja] = i
+
+
+# ============================================================================
+# NEIGHBOR-JOINING
+# ============================================================================
+
+def _validas(orden, columnas, filas, activo, nacimiento):
+    return activo[columnas] & (nacimiento[columnas] <= nacimiento[filas][:, None])
+
+
+def _avanzar_inicios(orden, inicio, filas, activo, nacimiento, bloque=16):
+    """Salta las entradas inválidas al comienzo de cada fila ordenada (no vuelven a valer)"""
+    total = orden.shape[1]
+    while filas.size:
+        posiciones = np.minimum(inicio[filas][:, None] + np.arange(bloque), total - 1)
+        columnas = orden[filas[:, None], posiciones]
+        validas = _validas(orden, columnas, filas, activo, nacimiento)
+        primera = np.where(validas.any(axis=1), validas.argmax(axis=1), bloque)
+        inicio[filas] = np.minimum(inicio[filas] + primera, total - 1)
+        filas = filas[(primera == bloque) & (inicio[filas] < total - 1)]
+
+
+def _ventana_nj(d, orden, inicio, filas, ancho, activo, nacimiento, sumas, n):
+    """
+    Q de las primeras `ancho` columnas (en orden de distancia) de cada fila
+
+    Returns:
+        (q, columnas, limite) con limite = cota inferior de las distancias
+        que quedan fuera de la ventana en cada fila
+    """
+    total = orden.shape[1]
+    posiciones = inicio[filas][:, None] + np.arange(ancho)
+    fuera = posiciones >= total
+    columnas = orden[filas[:, None], np.minimum(posiciones, total - 1)]
+    validas = ~fuera & _validas(orden, columnas, filas, activo, nacimiento)
+    valores = d[filas[:, None], columnas]
+    q = np.where(validas, (n - 2) * valores - sumas[filas][:, None] - sumas[columnas], np.inf)
+    # Las entradas válidas conservan su distancia original, así que la mayor
+    # de la ventana acota por abajo a todas las que siguen en la fila
+    limite = np.where(validas, valores, -np.inf).max(axis=1)
+    limite[fuera[:, -1]] = np.inf
+    return q, columnas, limite
+
+
+def neighbor_joining(distancias, nombres, ventana=VENTANA):
+    """
+    Árbol NJ (Saitou & Nei 1987) no enraizado, con la raíz en una tricotomía
+
+    Args:
+        distancias: matriz n × n simétrica (se copia)
+        nombres: nombres de las hojas en el orden de la matriz
+        ventana: columnas por fila evaluadas en la primera pasada de cada paso
+
+    Returns:
+        Nodo raíz; las longitudes negativas se truncan a 0
+    """
+    d = _preparar(distancias)
+    nodos = _hojas(nombres)
+    total = len(nodos)
+    if total == 1:
+        return nodos[0]
+
+    activo = np.ones(total, dtype=bool)
+    sumas = np.where(np.isinf(d), 0.0, d).sum(axis=1)
+    # Columnas de cada fila ordenadas por distancia; una entrada (r, c) es
+    # válida mientras c siga activa y no se haya reutilizado después de
+    # ordenar la fila r (el par lo cubre entonces la fila nueva de c)
+    orden = np.argsort(d, axis=1, kind='stable').astype(np.int32)
+    nacimiento = np.zeros(total, dtype=np.int64)
+    inicio = np.zeros(total, dtype=np.int64)
+    n = total
+    paso = 0
+
+    while n > 3:
+        paso += 1
+        filas = np.flatnonzero(activo)
+        _avanzar_inicios(orden, inicio, filas, activo, nacimiento)
+        cota_s = sumas[filas].max()
+        mejor, bi, bj = np.inf, -1, -1
+        pendientes = filas
+        ancho = ventana
+        while pendientes.size:
+            q, columnas, limite = _ventana_nj(d, orden, inicio, pendientes, ancho,
+                                                       activo, nacimiento, sumas, n)
+            k = np.unravel_index(np.argmin(q), q.shape)
+            if q[k] < mejor:
+                mejor, bi, bj = q[k], pendientes[k[0]], columnas[k]
+            # Filas cuyo resto (fuera de la ventana) todavía podría mejorar
+            resto = (n - 2) * limite - sumas[pendientes] - cota_s
+            pendientes = pendientes[resto < mejor]
+            ancho *= 4
+
+        i, j = (bi, bj) if bi < bj else (bj, bi)
+        dij = d[i, j]
+        li = 0.5 * dij + (sumas[i] - sumas[j]) / (2 * (n - 2))
+        nodos[i] = _unir(Nodo(), (nodos[i], nodos[j]), (li, dij - li))
+        nodos[j] = None
+
+        nuevas = 0.5 * (d[i] + d[j] - dij)
+        activo[i] = activo[j] = False
+        otros = np.flatnonzero(activo)
+        sumas[otros] += nuevas[otros] - d[otros, i] - d[otros, j]
+        activo[i] = True
+        nuevas[~activo] = np.inf
+        nuevas[i] = np.inf
+        d[i, :] = nuevas
+        d[:, i] = nuevas
+        d[j, :] = np.inf
+        d[:, j] = np.inf
+        sumas[i] = nuevas[otros].sum()
+        orden[i] = np.argsort(nuevas, kind='stable')
+        nacimiento[i] = paso
+        inicio[i] = 0
+        n -= 1
+
+    restantes = np.flatnonzero(activo)
+    raiz = Nodo()
+    if n == 2:
+        a, b = restantes
+        return _unir(raiz, (nodos[a], nodos[b]), (0.0, d[a, b]))
+    # Tres nodos restantes: se unen en la raíz (tricotomía)
+    a, b, c = restantes
+    return _unir(raiz, (nodos[a], nodos[b], nodos[c]),
+                 (0.5 * (d[a, b] + d[a, c] - d[b, c]),
+                  0.5 * (d[a, b] + d[b, c] - d[a, c]),
+                  0.5 * (d[a, c] + d[b, c] - d[a, b])))
+
+
+# ============================================================================
+# UPGMA
+# ============================================================================
+
+def upgma(distancias, nombres, clado=None):
+    """
+    Árbol UPGMA enraizado y ultramétrico (altura de cada unión = d/2), como
+    el ClusterTree upgma de BEAST
+
+    Args:
+        clado: nombres que deben quedar monofiléticos (se ignoran los
+            ausentes; sin efecto con menos de dos presentes)
+
+    Returns:
+        Nodo raíz
+    """
+    d = _preparar(distancias)
+    nodos = _hojas(nombres)
+    total = len(nodos)
+    if total == 1:
+        return nodos[0]
+
+    clado = set(clado or ())
+    dentro = np.array([n in clado for n in nombres])
+    if 1 < dentro.sum() < total:
+        # UPGMA del clado y luego del resto con el clado como un cluster
+        # (distancia media a sus miembros, peso = tamaño del clado)
+        indices_clado = np.flatnonzero(dentro)
+        resto = np.flatnonzero(~dentro)
+        subarbol = upgma(np.asarray(distancias, dtype=np.float64)[np.ix_(indices_clado, indices_clado)],
+                         [nombres[i] for i in indices_clado])
+        reducida = np.full((len(resto) + 1, len(resto) + 1), np.inf)
+        reducida[:-1, :-1] = d[np.ix_(resto, resto)]
+        medias = d[np.ix_(indices_clado, resto)].mean(axis=0)
+        reducida[-1, :-1] = medias
+        reducida[:-1, -1] = medias
+        tamanos = np.ones(len(resto) + 1)
+        tamanos[-1] = len(indices_clado)
+        iniciales = np.zeros(len(resto) + 1)
+        iniciales[-1] = alturas(subarbol)[subarbol]
+        return _upgma(reducida, [nodos[i] for i in resto] + [subarbol], tamanos, iniciales)
+
+    return _upgma(d, nodos, np.ones(total), np.zeros(total))
+
+
+def _upgma(d, nodos, tamanos, alturas):
+    """Uniones UPGMA sobre d (diagonal inf) partiendo de clusters con tamaño y altura"""
+    total = len(nodos)
+    activo = np.ones(total, dtype=bool)
+    argmin = d.argmin(axis=1)
+    minimos = d[np.arange(total), argmin]
+
+    for _ in range(total - 1):
+        i = int(np.argmin(minimos))
+        j = int(argmin[i])
+        if i > j:
+            i, j = j, i
+        # Un cluster restringido puede ser más alto que d/2: rama de largo 0
+        altura = max(0.5 * d[i, j], alturas[i], alturas[j])
+        nodos[i] = _unir(Nodo(), (nodos[i], nodos[j]),
+                         (altura - alturas[i], altura - alturas[j]))
+        nodos[j] = None
+        alturas[i] = altura
+
+        nuevas = (tamanos[i] * d[i] + tamanos[j] * d[j]) / (tamanos[i] + tamanos[j])
+        tamanos[i] += tamanos[j]
+        activo[j] = False
+        nuevas[~activo] = np.inf
+        nuevas[i] = np.inf
+        d[i, :] = nuevas
+        d[:, i] = nuevas
+        d[j, :] = np.inf
+        d[:, j] = np.inf
+        activo[i] = False
+        otros = np.flatnonzero(activo)
+        activo[i] = True
+        _actualizar_minimos(d, minimos, argmin, otros, i, j, nuevas)
+
+    return nodos[int(np.flatnonzero(activo)[0])]
+
+
+def arbol_distancias(distancias, nombres, metodo='nj', clado=None):
+    if metodo not in METODOS:
+        raise ValueError(f"Método desconocido: {metodo} (opciones: {', '.join(METODOS)})")
+    if metodo == 'nj':
+        if clado:
+            raise ValueError("La restricción de clado solo está disponible con UPGMA")
+        return neighbor_joining(distancias, nombres)
+    return upgma(distancias, nombres, clado)
+
+
+def enraizar(raiz, grupo_externo):
+    """
+    Re-enraiza un árbol en la rama de la hoja grupo_externo (a mitad de la
+    rama); retorna la nueva raíz binaria
+    """
+    hoja = next((h for h in raiz.hojas() if h.nombre == grupo_externo), None)
+    if hoja is None:
+        raise ValueError(f"Grupo externo ausente del árbol: {grupo_externo}")
+    if hoja.padre is None:
+        return raiz
+
+    # Invertir el camino desde el padre de la hoja hasta la raíz vieja
+    camino = [hoja]
+    while camino[-1].padre is not None:
+        camino.append(camino[-1].padre)
+    longitudes = [n.longitud or 0.0 for n in camino]
+    arriba = camino[1]
+    arriba.hijos.remove(hoja)
+    for k in range(1, len(camino) - 1):
+        hijo, padre = camino[k], camino[k + 1]
+        padre.hijos.remove(hijo)
+        hijo.hijos.append(padre)
+        padre.padre = hijo
+        padre.longitud = longitudes[k]
+
+    nueva = Nodo()
+    _unir(nueva, (hoja, arriba), (longitudes[0] / 2, longitudes[0] / 2))
+
+    # La raíz vieja puede quedar con un solo hijo: se suprime
+    for nodo in list(nueva.preorden()):
+        if nodo is not nueva and len(nodo.hijos) == 1:
+            hijo = nodo.hijos[0]
+            hijo.longitud = (hijo.longitud or 0.0) + (nodo.longitud or 0.0)
+            hijo.padre = nodo.padre
+            nodo.padre.hijos[nodo.padre.hijos.index(nodo)] = hijo
+    return nueva
+
+
+# ============================================================================
+# CONTROL POR MARCADOR
+# ============================================================================
+
+def genero(nombre):
+    return nombre.split('_')[0]
+
+
+def vecinos_cercanos(distancias, nombres):
+    """
+    Vecino más cercano de cada taxón y si es de otro género habiendo
+    congéneres comparables
+
+    Returns:
+        [(taxon, vecino, distancia, sospechoso)]
+    """
+    d = np.array(distancias, dtype=np.float64)
+    np.fill_diagonal(d, np.inf)
+    d[np.isnan(d)] = np.inf
+    generos = np.array([genero(n) for n in nombres])
+    filas = []
+    for i, nombre in enumerate(nombres):
+        j = int(np.argmin(d[i]))
+        if not np.isfinite(d[i, j]):
+            continue
+        congeneres = (generos == generos[i]) & np.isfinite(d[i])
+        sospechoso = bool(generos[j] != generos[i] and congeneres.any())
+        filas.append((nombre, nombres[j], float(d[i, j]), sospechoso))
+    return filas
+
+
+def robinson_foulds(arbol_a, arbol_b):
+    """
+    Distancia RF normalizada (0-1) entre dos árboles, restringida a los
+    taxones comunes
+    """
+    comunes = sorted({h.nombre for h in arbol_a.hojas()} & {h.nombre for h in arbol_b.hojas()})
+    if len(comunes) < 4:
+        return float('nan')
+    indice = {nombre: i for i, nombre in enumerate(comunes)}
+    a = biparticiones(_podar(arbol_a, indice), indice)
+    b = biparticiones(_podar(arbol_b, indice), indice)
+    maximo = 2 * (len(comunes) - 3)
+    return len(a ^ b) / maximo if maximo else 0.0
+
+
+def _podar(raiz, indice):
+    """Copia del árbol con solo las hojas del índice (nodos de un hijo suprimidos)"""
+    copias = {}
+    for nodo in raiz.postorden():
+        if not nodo.hijos:
+            if nodo.nombre in indice:
+                hoja = Nodo()
+                hoja.nombre = nodo.nombre
+                copias[nodo] = hoja
+            continue
+        hijos = [copias[h] for h in nodo.hijos if h in copias]
+        if len(hijos) == 1:
+            copias[nodo] = hijos[0]
+        elif hijos:
+            copias[nodo] = _unir(Nodo(), hijos, [0.0] * len(hijos))
+    return copias[raiz]
+
+
+# ============================================================================
+# ÁRBOLES DESDE ALINEAMIENTOS
+# ============================================================================
+
+def distancias_codificadas(nombres, codigos, modelo='k2p', procesos=1):
+    """
+    Matriz de distancias de un alineamiento codificado: se excluyen los
+    taxones sin bases y las distancias saturadas o sin sitios comparables
+    se reemplazan por el máximo finito
+
+    Returns:
+        (nombres con datos, distancias)
+    """
+    from alineamientos import BASES
+    from matriz_distancias import matriz_distancias
+    con_datos = np.isin(codigos, BASES).any(axis=1)
+    nombres = [n for n, ok in zip(nombres, con_datos) if ok]
+    distancias = matriz_distancias(codigos[con_datos], modelo, procesos=procesos)
+    finitas = np.isfinite(distancias)
+    if not finitas.all():
+        distancias = np.where(finitas, distancias, distancias[finitas].max(initial=1.0))
+    return nombres, distancias
+
+
+def arbol_alineamiento(ruta, metodo='nj', modelo='k2p', procesos=1, clado=None):
+    """
+    Árbol de distancias de un alineamiento (ver distancias_codificadas);
+    `clado` como en upgma()
+
+    Returns:
+        (raiz, nombres, distancias)
+    """
+    from alineamientos import leer_codificado
+    nombres, distancias = distancias_codificadas(*leer_codificado(ruta), modelo, procesos)
+    return arbol_distancias(distancias, nombres, metodo, clado), nombres, distancias
+
+
+def escribir_newick(ruta, raiz):
+    from archivos import abrir
+    with abrir(ruta, 'w') as f:
+        f.write(a_newick(raiz) + '\n')
+
+
+# ============================================================================
+# ÁRBOLES INICIALES (BEAST / MRBAYES)
+# ============================================================================
+
+def alturas(raiz):
+    """{nodo: altura} (distancia máxima hasta sus hojas)"""
+    altura = {}
+    for nodo in raiz.postorden():
+        altura[nodo] = max((altura[h] + (h.longitud or 0.0) for h in nodo.hijos), default=0.0)
+    return altura
+
+
+def _mrca(hojas):
+    ancestros = []
+    nodo = hojas[0]
+    while nodo is not None:
+        ancestros.append(nodo)
+        nodo = nodo.padre
+    profundidad = {n: k for k, n in enumerate(ancestros)}
+    mas_alto = 0
+    for hoja in hojas[1:]:
+        nodo = hoja
+        while nodo not in profundidad:
+            nodo = nodo.padre
+        mas_alto = max(mas_alto, profundidad[nodo])
+    return ancestros[mas_alto]
+
+
+def calibrar(raiz, taxones, edad):
+    """
+    Escala las ramas de un árbol ultramétrico para que el MRCA de `taxones`
+    (o la raíz, si hay menos de dos presentes) quede a altura `edad`: el
+    árbol inicial ya cumple la calibración fósil y BEAST no arranca con
+    posterior -inf. El MRCAPrior es monophyletic='true': si los taxones no
+    forman un clado se lanza ValueError (usar upgma(..., clado=taxones))
+    """
+    taxones = set(taxones)
+    presentes = [h for h in raiz.hojas() if h.nombre in taxones]
+    nodo = _mrca(presentes) if len(presentes) > 1 else raiz
+    if len(presentes) > 1:
+        intrusos = sorted(h.nombre for h in nodo.hojas() if h.nombre not in taxones)
+        if intrusos:
+            raise ValueError(f"Los taxones de calibración no son monofiléticos en el árbol "
+                             f"(su MRCA incluye {', '.join(intrusos[:5])}); "
+                             f"construir el UPGMA con clado=taxones")
+    altura = alturas(raiz)[nodo]
+    if altura <= 0:
+        raise ValueError("El árbol no tiene longitudes de rama para calibrar")
+    factor = edad / altura
+    for n in raiz.preorden():
+        if n.longitud is not None:
+            n.longitud *= factor
+    return raiz
+
+
+def newick_beast(ruta, taxones, edad, modelo='k2p', procesos=1):
+    """Newick UPGMA calibrado de un alineamiento (con `taxones` monofiléticos), para TreeParser de BEAST"""
+    raiz, _, _ = arbol_alineamiento(ruta, 'upgma', modelo, procesos, clado=taxones)
+    return a_newick(calibrar(raiz, taxones, edad))
+
+
+def escribir_arbol_mrbayes(ruta, raiz):
+    """Bloque trees solo (sin bloque taxa): se ejecuta después de los datos"""
+    with open(ruta, 'w') as f:
+        f.write(f"#NEXUS\n\nbegin trees;\n\ttree {ARBOL_MRBAYES} = [&U] {a_newick(raiz)}\nend;\n")
+
+
+def fijar_arbol_mrbayes(comandos, arbol):
+    """
+    Agrega a mrbayes_commands.nex 'execute <arbol>' + 'startvals' antes de
+    [Run the analysis] (reemplaza un árbol fijado antes)
+    """
+    with open(comandos, 'r') as f:
+        texto = f.read()
+
+    texto = re.sub(r"^[ \t]*\[Fixed starting tree[^\]]*\]\n(?:[^\n]*\n){2}\n", '', texto,
+                   flags=re.M)
+    archivo = os.path.basename(arbol)
+    texto, n = re.subn(r"^([ \t]*)(\[Run the analysis\])",
+                       lambda m: (f"{m.group(1)}[Fixed starting tree (arboles_rapidos.py)]\n"
+                                  f"{m.group(1)}execute {archivo};\n"
+                                  f"{m.group(1)}startvals tau={ARBOL_MRBAYES} V={ARBOL_MRBAYES};\n\n"
+                                  f"{m.group(1)}{m.group(2)}"),
+                       texto, flags=re.M)
+    if n == 0:
+        raise ValueError(f"No se encontró [Run the analysis] en {comandos}")
+
+    with open(comandos, 'w') as f:
+        f.write(texto)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Árboles NJ / UPGMA rápidos y control por marcador")
+    parser.add_argument("alineamientos", nargs='+', help="Supermatriz o alineamientos por marcador")
+    parser.add_argument("--metodo", choices=METODOS, default='nj')
+    parser.add_argument("--modelo", choices=('p', 'jc69', 'k2p'), default='k2p')
+    parser.add_argument("--grupo-externo", help="Enraizar NJ en este taxón")
+    parser.add_argument("--salida", help="Newick (con un solo alineamiento)")
+    parser.add_argument("--carpeta", default="arboles_rapidos",
+                        help="Carpeta de Newick (con varios alineamientos)")
+    parser.add_argument("--referencia", help="Alineamiento de referencia (p. ej. supermatriz) para RF")
+    parser.add_argument("--tabla", help="TSV de vecinos más cercanos por marcador")
+    parser.add_argument("--procesos", type=int, default=1)
+    args = parser.parse_args()
+
+    from archivos import abrir, nombre_base
+
+    print("=" * 80)
+    print(f"🌳 ÁRBOLES RÁPIDOS ({args.metodo.upper()}, {args.modelo})")
+    print("=" * 80 + "\n")
+
+    referencia = None
+    if args.referencia:
+        referencia, nombres, _ = arbol_alineamiento(args.referencia, args.metodo, args.modelo,
+                                                    args.procesos)
+        print(f"📐 Referencia: {args.referencia} ({len(nombres)} taxones)\n")
+
+    varios = len(args.alineamientos) > 1 or not args.salida
+    if varios:
+        os.makedirs(args.carpeta, exist_ok=True)
+
+    filas = []
+    for ruta in args.alineamientos:
+        inicio = time.perf_counter()
+        raiz, nombres, distancias = arbol_alineamiento(ruta, args.metodo, args.modelo,
+                                                       args.procesos)
+        segundos = time.perf_counter() - inicio
+        marcador = nombre_base(ruta)
+        if args.grupo_externo and args.metodo == 'nj':
+            if args.grupo_externo in nombres:
+                raiz = enraizar(raiz, args.grupo_externo)
+            else:
+                print(f"   ⚠️  {marcador}: sin {args.grupo_externo}, el árbol queda sin enraizar")
+        salida = os.path.join(args.carpeta, f"{marcador}.nwk") if varios else args.salida
+        escribir_newick(salida, raiz)
+
+        vecinos = vecinos_cercanos(distancias, nombres)
+        sospechosos = [v for v in vecinos if v[3]]
+        filas += [(marcador,) + v for v in vecinos]
+        rf = f"  RF {robinson_foulds(raiz, referencia):.2f}" if referencia is not None else ""
+        print(f"✅ {marcador:14} {len(nombres):5} taxones {segundos:6.2f} s{rf}  → {salida}")
+        for taxon, vecino, distancia, _ in sospechosos:
+            print(f"   ⚠️  {taxon} más cerca de {vecino} ({distancia:.4f}) que de sus congéneres")
+
+    if args.tabla:
+        with abrir(args.tabla, 'w') as f:
+            f.write("marcador\ttaxon\tvecino\tdistancia\tsospechoso\n")
+            for marcador, taxon, vecino, distancia, sospechoso in filas:
+                f.write(f"{marcador}\t{taxon}\t{vecino}\t{distancia:.6f}\t"
+                        f"{'si' if sospechoso else 'no'}\n")
+        print(f"\n✅ Tabla: {args.tabla}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+"""
+E/S COMPRIMIDA TRANSPARENTE (gzip / BGZF) - PROYECTO MANGLARES COMBRETACEAE
+===========================================================================
+Propósito: Que todos los lectores y escritores del proyecto (FASTA,
+          alineamientos, árboles, trazas) acepten archivos .gz sin
+          descomprimirlos a disco: las descargas de NCBI, los .trees de
+          BEAST y los .p de MrBayes ocupan varias veces menos.
+
+Lectura:   abrir(ruta) detecta gzip por los bytes mágicos (no por la
+           extensión) y descomprime en streaming; BGZF es gzip multi-miembro,
+           así que se lee igual.
+Escritura: con extensión .gz / .bgz (o comprimir=True) se escribe BGZF
+           (bloques gzip independientes de <= 64 KB, como bgzip / samtools),
+           que cualquier lector gzip entiende y además permite acceso
+           aleatorio.
+
+Acceso aleatorio: LectorBGZF usa desplazamientos virtuales
+(inicio_bloque_comprimido << 16 | posición_en_bloque); indexar_lineas()
+devuelve esos desplazamientos (o los de byte, en texto plano) para los
+registros de un FASTA ('>') o los árboles de un NEXUS ('tree '), y
+leer_desde() retoma la lectura en cualquiera de ellos. Un gzip común no
+admite acceso aleatorio: hay que recomprimirlo (python archivos.py archivo).
+
+Uso:
+    python archivos.py beast/combretaceae.trees            # → .trees.gz (BGZF)
+    python archivos.py descargas/*.fasta --nivel 9
+    python archivos.py ITS_all.fasta.gz --descomprimir
+    python archivos.py beast/combretaceae.trees --indexar-arboles   # + índice de árboles
+"""
+
+import argparse
+import gzip
+import io
+import os
+import struct
+import zlib
+
+# ============================================================================
+# CONFIGURACIÓN
+# ============================================================================
+
+EXTENSIONES = ('.gz', '.bgz')
+MAGICO = b'\x1f\x8b'
+NIVEL = 6
+
+# Cabecera BGZF: gzip con FEXTRA y el subcampo 'BC' (BSIZE = tamaño del bloque - 1)
+_CABECERA = struct.Struct('<4BI2BH2BHH')
+_BLOQUE_MAXIMO = 0x10000
+_DATOS_BLOQUE = 0xff00          # datos sin comprimir por bloque (como htslib)
+_EOF = bytes.fromhex('1f8b08040000000000ff0600424302001b0003000000000000000000')
+
+# ============================================================================
+# DETECCIÓN
+# ============================================================================
+
+def comprimido(ruta):
+    """True si el archivo empieza con los bytes mágicos de gzip"""
+    with open(ruta, 'rb') as f:
+        return f.read(2) == MAGICO
+
+
+def es_bgzf(ruta):
+    """True si el primer bloque tiene el subcampo extra 'BC' de BGZF"""
+    with open(ruta, 'rb') as f:
+        cabecera = f.read(_CABECERA.size)
+    if len(cabecera) < _CABECERA.size:
+        return False
+    id1, id2, _, flg, _, _, _, xlen, si1, si2, _, _ = _CABECERA.unpack(cabecera)
+    return (id1, id2) == (0x1f, 0x8b) and flg & 4 and si1 == 66 and si2 == 67
+
+
+def sin_compresion(ruta):
+    """Ruta sin la extensión de compresión (para decidir el formato por extensión)"""
+    ruta = str(ruta)
+    for extension in EXTENSIONES:
+        if ruta.lower().endswith(extension):
+            return ruta[:-len(extension)]
+    return ruta
+
+
+def listar(carpeta, patron):
+    """Archivos de la carpeta que coinciden con el patrón, comprimidos o no (ordenados)"""
+    from pathlib import Path
+    carpeta = Path(carpeta)
+    archivos = set(carpeta.glob(patron))
+    for extension in EXTENSIONES:
+        archivos.update(carpeta.glob(patron + extension))
+    return sorted(archivos)
+
+
+def nombre_base(ruta):
+    """Nombre sin carpeta, sin compresión y sin extensión (ITS_all.fasta.gz → ITS_all)"""
+    return os.path.splitext(os.path.basename(sin_compresion(ruta)))[0]
+
+
+# ============================================================================
+# ESCRITURA BGZF
+# ============================================================================
+
+def _bloque(datos, nivel):
+    """Un bloque BGZF completo con los datos dados"""
+    compresor = zlib.compressobj(nivel, zlib.DEFLATED, -15)
+    cuerpo = compresor.compress(datos) + compresor.flush()
+    tamano = _CABECERA.size + len(cuerpo) + 8
+    cabecera = _CABECERA.pack(0x1f, 0x8b, 8, 4, 0, 0, 0xff, 6, 66, 67, 2, tamano - 1)
+    return cabecera + cuerpo + struct.pack('<II', zlib.crc32(datos), len(datos))
+
+
+class EscritorBGZF(io.RawIOBase):
+    """Archivo binario de escritura en formato BGZF"""
+
+    def __init__(self, ruta, modo='wb', nivel=NIVEL):
+        self._f = open(ruta, modo.replace('t', '').replace('b', '') + 'b')
+        self.nivel = nivel
+        self._buffer = bytearray()
+
+    def writable(self):
+        return True
+
+    def write(self, datos):
+        self._buffer.extend(datos)
+        while len(self._buffer) >= _DATOS_BLOQUE:
+            self._volcar(bytes(self._buffer[:_DATOS_BLOQUE]))
+            del self._buffer[:_DATOS_BLOQUE]
+        return len(datos)
+
+    def _volcar(self, datos):
+        bloque = _bloque(datos, self.nivel)
+        if len(bloque) > _BLOQUE_MAXIMO:
+            # Datos incompresibles: partir en dos bloques
+            mitad = len(datos) // 2
+            self._volcar(datos[:mitad])
+            self._volcar(datos[mitad:])
+            return
+        self._f.write(bloque)
+
+    def flush(self):
+        if self._buffer:
+            self._volcar(bytes(self._buffer))
+            self._buffer.clear()
+        if not self._f.closed:
+            self._f.flush()
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            self.flush()
+            self._f.write(_EOF)
+        finally:
+            self._f.close()
+            super().close()
+
+
+# ============================================================================
+# LECTURA BGZF CON ACCESO ALEATORIO
+# ============================================================================
+
+class LectorBGZF:
+    """
+    Lectura binaria de un BGZF por líneas, con tell() / seek() sobre
+    desplazamientos virtuales
+    """
+
+    def __init__(self, ruta):
+        self._f = open(ruta, 'rb')
+        self._inicio = 0        # desplazamiento comprimido del bloque actual
+        self._siguiente = 0     # desplazamiento comprimido del bloque siguiente
+        self._datos = b''
+        self._pos = 0
+        self._cargar(0)
+
+    def _cargar(self, inicio):
+        self._f.seek(inicio)
+        cabecera = self._f.read(_CABECERA.size)
+        self._inicio = inicio
+        self._pos = 0
+        if not cabecera:
+            self._datos = b''
+            self._siguiente = inicio
+            return
+        if len(cabecera) < _CABECERA.size:
+            raise ValueError(f"Bloque BGZF truncado en {inicio}")
+        id1, id2, _, flg, _, _, _, xlen, si1, si2, _, bsize = _CABECERA.unpack(cabecera)
+        if (id1, id2) != (0x1f, 0x8b) or not flg & 4 or (si1, si2) != (66, 67):
+            raise ValueError(f"No es un bloque BGZF en {inicio} (¿gzip común? recomprimir)")
+        resto = self._f.read(bsize + 1 - _CABECERA.size)
+        cuerpo = resto[xlen - 6:-8]
+        self._datos = zlib.decompress(cuerpo, -15)
+        self._siguiente = inicio + bsize + 1
+
+    def _avanzar(self):
+        """Pasa al siguiente bloque con datos; False al final del archivo"""
+        while self._pos >= len(self._datos):
+            if self._siguiente == self._inicio:
+                return False
+            self._cargar(self._siguiente)
+        return True
+
+    def tell(self):
+        self._avanzar()
+        return (self._inicio << 16) | self._pos
+
+    def seek(self, virtual):
+        inicio, pos = virtual >> 16, virtual & 0xffff
+        if inicio != self._inicio or not self._datos:
+            self._cargar(inicio)
+        self._pos = pos
+
+    def readline(self):
+        partes = []
+        while self._avanzar():
+            fin = self._datos.find(b'\n', self._pos)
+            if fin >= 0:
+                partes.append(self._datos[self._pos:fin + 1])
+                self._pos = fin + 1
+                break
+            partes.append(self._datos[self._pos:])
+            self._pos = len(self._datos)
+        return b''.join(partes)
+
+    def __iter__(self):
+        return iter(self.readline, b'')
+
+    def close(self):
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# ============================================================================
+# API
+# ============================================================================
+
+def abrir(ruta, modo='r', comprimir=None, nivel=NIVEL, encoding=None, errors=None,
+          newline=None):
+    """
+    open() con compresión transparente
+
+    Args:
+        modo: 'r', 'rt', 'rb', 'w', 'wt', 'wb', 'a', ...
+        comprimir: al escribir, True / False fuerzan BGZF / texto plano;
+            None decide por la extensión (.gz, .bgz)
+        nivel: nivel de compresión zlib (1-9)
+    """
+    binario = 'b' in modo
+    if 'r' in modo:
+        if comprimido(ruta):
+            if binario:
+                return gzip.open(ruta, 'rb')
+            return gzip.open(ruta, 'rt', encoding=encoding, errors=errors, newline=newline)
+        return open(ruta, modo, encoding=encoding, errors=errors, newline=newline)
+
+    if comprimir is None:
+        comprimir = str(ruta).lower().endswith(EXTENSIONES)
+    if not comprimir:
+        return open(ruta, modo, encoding=encoding, errors=errors, newline=newline)
+    escritor = EscritorBGZF(ruta, modo, nivel)
+    if binario:
+        return io.BufferedWriter(escritor)
+    return io.TextIOWrapper(io.BufferedWriter(escritor), encoding=encoding or 'utf-8',
+                            errors=errors, newline=newline)
+
+
+def indexar_lineas(ruta, prefijos=('>',)):
+    """
+    Desplazamientos de las líneas que empiezan con alguno de los prefijos
+    (sin distinguir mayúsculas ni espacios iniciales)
+
+    Returns:
+        [(desplazamiento, línea)]: virtual en BGZF, de byte en texto plano
+    """
+    prefijos = tuple(p.lower().encode() for p in prefijos)
+    resultado = []
+    if comprimido(ruta):
+        lector = LectorBGZF(ruta)
+    else:
+        lector = open(ruta, 'rb')
+    with lector:
+        while True:
+            desplazamiento = lector.tell()
+            linea = lector.readline()
+            if not linea:
+                break
+            if linea.lstrip().lower().startswith(prefijos):
+                resultado.append((desplazamiento, linea.decode('utf-8', 'replace').strip()))
+    return resultado
+
+
+def leer_desde(ruta, desplazamiento, encoding='utf-8'):
+    """Itera las líneas (texto) a partir de un desplazamiento de indexar_lineas()"""
+    if comprimido(ruta):
+        lector = LectorBGZF(ruta)
+    else:
+        lector = open(ruta, 'rb')
+    with lector:
+        lector.seek(desplazamiento)
+        for linea in lector:
+            yield linea.decode(encoding, 'replace')
+
+
+def comprimir_archivo(entrada, salida=None, nivel=NIVEL, descomprimir=False):
+    """Recomprime a BGZF (o descomprime) de archivo a archivo, en streaming"""
+    if salida is None:
+        salida = sin_compresion(entrada) if descomprimir else f"{sin_compresion(entrada)}.gz"
+    temporal = f"{salida}.{os.getpid()}.tmp"
+    with abrir(entrada, 'rb') as f, abrir(temporal, 'wb', comprimir=not descomprimir,
+                                          nivel=nivel) as g:
+        for bloque in iter(lambda: f.read(1 << 20), b''):
+            g.write(bloque)
+    os.replace(temporal, salida)
+    return salida
+
+
+def _indexar_arboles(ruta):
+    from arboles_nexus import posiciones_arboles
+    posiciones = posiciones_arboles(ruta, construir=True)
+    if posiciones is None:
+        print(f"   {ruta}: sin índice de árboles (no es NEXUS)")
+    else:
+        print(f"   {ruta}: índice de {len(posiciones)} árboles en caché")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Comprimir a BGZF o descomprimir archivos")
+    parser.add_argument("archivos", nargs='+')
+    parser.add_argument("--nivel", type=int, default=NIVEL)
+    parser.add_argument("--descomprimir", action="store_true")
+    parser.add_argument("--conservar", action="store_true", help="No borrar el original")
+    parser.add_argument("--indexar-arboles", action="store_true",
+                        help="Guardar en caché el índice de árboles del NEXUS resultante "
+                             "(para saltar el burn-in sin releerlo)")
+    args = parser.parse_args()
+
+    for entrada in args.archivos:
+        if not args.descomprimir and es_bgzf(entrada):
+            print(f"   {entrada}: ya es BGZF")
+            if args.indexar_arboles:
+                _indexar_arboles(entrada)
+            continue
+        antes = os.path.getsize(entrada)
+        salida = comprimir_archivo(entrada, nivel=args.nivel, descomprimir=args.descomprimir)
+        despues = os.path.getsize(salida)
+        if salida != entrada and not args.conservar:
+            os.remove(entrada)
+        print(f"✅ {entrada} → {salida}  ({antes / 1e6:.2f} → {despues / 1e6:.2f} MB)")
+        if args.indexar_arboles:
+            _indexar_arboles(salida)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+PARTICIONES DE ESPECIES ESTILO ASAP - PROYECTO MANGLARES COMBRETACEAE
+======================================================================
+Propósito: Delimitación de especies dentro del pipeline, sin la herramienta
+          web/CLI de ASAP (Puillandre et al. 2021).
+
+Método:
+  - Las aristas (pares de secuencias) se ordenan UNA vez por distancia y se
+    recorren con union-find (single linkage): cada unión produce la siguiente
+    partición, así que el barrido completo de umbrales cuesta O(E log E) en
+    lugar de re-agrupar para cada umbral.
+  - Cada par de secuencias pasa de "inter" a "intra" exactamente en la unión
+    que junta sus grupos, de modo que las sumas de distancias inter/intra se
+    actualizan incrementalmente con trabajo total O(n²).
+  - Para cada partición se calcula:
+      dist       distancia de la unión que cierra la partición
+      Pi_inter   distancia media entre los dos grupos que se unen (0 en la
+                 primera partición, sin pares intra-grupo, igual que ASAP;
+                 Pi_i/Pi_a sí usa la distancia de esa unión)
+      Pi_intra   distancia media intra-grupo de toda la partición
+      pval       prueba de permutación: ¿es Pi_inter mayor de lo esperado si
+                 los dos grupos fueran una sola población?
+      pente      ancho relativo del intervalo de umbrales (barcode gap)
+      asap-score promedio del rango de pval y del rango de pente
+                 (menor = mejor)
+
+Input:  matriz de distancias PHYLIP (matriz_distancias.py) o alineamiento
+Output: <prefijo>.scores.tab y <prefijo>.partitions.tab con el formato de
+        ASAP, y <prefijo>.groups.tab con los grupos de las mejores particiones
+
+"#subsets w/rec" se reporta igual a "#subsets" (no se hace la partición
+recursiva de ASAP).
+
+Uso: python asap_particiones.py supermatriz.fasta ASAP-conocarpus --modelo k2p
+"""
+
+import argparse
+
+import numpy as np
+
+from archivos import abrir, sin_compresion
+
+# ============================================================================
+# CONFIGURACIÓN
+# ============================================================================
+
+N_MEJORES = 10
+REPLICAS = 100        # permutaciones por unión para el p-valor
+MAX_MUESTRA = 100     # secuencias máximas de la unión usadas en la permutación
+UMBRAL_PVALOR = 0.01  # particiones marcadas con '*' en scores.tab
+SEMILLA = 1
+
+# ============================================================================
+# UNION-FIND
+# ============================================================================
+
+class UnionFind:
+    """Union-find con unión por tamaño y compresión de caminos"""
+
+    def __init__(self, n):
+        self.padre = list(range(n))
+        self.miembros = [[i] for i in range(n)]
+
+    def raiz(self, x):
+        padre = self.padre
+        while padre[x] != x:
+            padre[x] = padre[padre[x]]
+            x = padre[x]
+        return x
+
+    def unir(self, a, b):
+        """Une los grupos de raíces a y b; retorna la raíz resultante"""
+        if len(self.miembros[a]) < len(self.miembros[b]):
+            a, b = b, a
+        self.padre[b] = a
+        self.miembros[a].extend(self.miembros[b])
+        self.miembros[b] = None
+        return a
+
+
+# ============================================================================
+# BARRIDO DE UMBRALES
+# ============================================================================
+
+def _pvalor_permutacion(distancias, grupo_a, grupo_b, replicas, max_muestra, rng):
+    """P(Pi_inter - Pi_intra local >= observado) permutando etiquetas A/B"""
+    if len(grupo_a) < 2 and len(grupo_b) < 2:
+        return 1.0  # sin distancias intra no hay con qué comparar
+
+    if len(grupo_a) + len(grupo_b) > max_muestra:
+        proporcion = max_muestra / (len(grupo_a) + len(grupo_b))
+        grupo_a = rng.choice(grupo_a, max(1, round(len(grupo_a) * proporcion)), replace=False)
+        grupo_b = rng.choice(grupo_b, max(1, round(len(grupo_b) * proporcion)), replace=False)
+
+    union = np.concatenate([grupo_a, grupo_b])
+    sub = distancias[np.ix_(union, union)]
+    etiquetas = np.zeros((replicas + 1, len(union)), dtype=np.float64)
+    etiquetas[0, :len(grupo_a)] = 1.0
+    for r in range(1, replicas + 1):
+        etiquetas[r, rng.permutation(len(union))[:len(grupo_a)]] = 1.0
+
+    n_a = len(grupo_a)
+    n_b = len(union) - n_a
+    total = sub.sum() / 2.0
+    inter = np.einsum('ri,ij,rj->r', etiquetas, sub, 1.0 - etiquetas)
+    pares_intra = n_a * (n_a - 1) / 2 + n_b * (n_b - 1) / 2
+    estadistico = inter / (n_a * n_b) - (total - inter) / pares_intra
+    return float(np.mean(estadistico[1:] >= estadistico[0]))
+
+
+def barrer_umbrales(distancias, replicas=REPLICAS, max_muestra=MAX_MUESTRA, semilla=SEMILLA):
+    """
+    Construye todas las particiones single-linkage en una sola pasada
+
+    Returns:
+        (particiones, uniones): lista de dicts con las estadísticas de cada
+        partición y lista de uniones (raiz_a, raiz_b) para reconstruirlas
+    """
+    n = distancias.shape[0]
+    rng = np.random.default_rng(semilla)
+    filas, columnas = np.triu_indices(n, 1)
+    pesos = distancias[filas, columnas]
+    validos = ~np.isnan(pesos)
+    filas, columnas, pesos = filas[validos], columnas[validos], pesos[validos]
+    orden = np.argsort(pesos, kind='stable')
+
+    uf = UnionFind(n)
+    suma_intra = 0.0
+    pares_intra = 0
+    particiones = []
+    uniones = []
+
+    for arista in orden:
+        a = uf.raiz(int(filas[arista]))
+        b = uf.raiz(int(columnas[arista]))
+        if a == b:
+            continue
+
+        grupo_a = np.asarray(uf.miembros[a])
+        grupo_b = np.asarray(uf.miembros[b])
+        suma_inter = float(distancias[np.ix_(grupo_a, grupo_b)].sum())
+        n_inter = len(grupo_a) * len(grupo_b)
+        pi_inter = suma_inter / n_inter
+        pi_intra = suma_intra / pares_intra if pares_intra else 0.0
+
+        particiones.append({
+            'subsets': n - len(uniones),
+            'dist': float(pesos[arista]),
+            'ratio': pi_inter / pi_intra if pi_intra > 0 else pi_inter,
+            # Como ASAP: sin pares intra-grupo (primera unión) Pi_inter vale 0
+            'pi_inter': pi_inter if pares_intra else 0.0,
+            'pi_intra': pi_intra,
+            'n_inter': n_inter,
+            'n_intra': pares_intra,
+            'pval': _pvalor_permutacion(distancias, grupo_a, grupo_b,
+                                        replicas, max_muestra, rng),
+        })
+
+        uniones.append((a, b))
+        uf.unir(a, b)
+        suma_intra += suma_inter
+        pares_intra += n_inter
+        if len(uniones) == n - 1:
+            break
+
+    _puntuar(particiones)
+    return particiones, uniones
+
+
+def _rangos(valores):
+    """Rangos 1..n con empates promediados"""
+    valores = np.asarray(valores)
+    orden = np.argsort(valores, kind='stable')
+    rangos = np.empty(len(valores))
+    i = 0
+    while i < len(orden):
+        j = i
+        while j + 1 < len(orden) and valores[orden[j + 1]] == valores[orden[i]]:
+            j += 1
+        rangos[orden[i:j + 1]] = (i + j) / 2 + 1
+        i = j + 1
+    return rangos
+
+
+def _puntuar(particiones):
+    anterior = 0.0
+    for particion in particiones:
+        # La partición vale para umbrales en [anterior, dist)
+        particion['umbral'] = (anterior + particion['dist']) / 2
+        particion['pente'] = (particion['dist'] - anterior) / particion['dist'] if particion['dist'] > 0 else 0.0
+        anterior = particion['dist']
+
+    rango_p = _rangos([p['pval'] for p in particiones])
+    rango_pente = _rangos([-p['pente'] for p in particiones])
+    for particion, rp, rg in zip(particiones, rango_p, rango_pente):
+        particion['score'] = (rp + rg) / 2
+
+
+def grupos_particion(n, uniones, indice):
+    """Grupo (0..k-1) de cada secuencia en la partición `indice` del barrido"""
+    uf = UnionFind(n)
+    for a, b in uniones[:indice]:
+        uf.unir(uf.raiz(a), uf.raiz(b))
+    etiquetas = {}
+    return [etiquetas.setdefault(uf.raiz(i), len(etiquetas)) for i in range(n)]
+
+
+# ============================================================================
+# ESCRITURA (FORMATO ASAP)
+# ============================================================================
+
+def mejores_particiones(particiones, n_mejores=N_MEJORES):
+    return sorted(range(len(particiones)),
+                  key=lambda i: (particiones[i]['score'], -particiones[i]['subsets']))[:n_mejores]
+
+
+def escribir_scores(ruta, particiones, mejores, longitud, umbral_pvalor=UMBRAL_PVALOR):
+    with abrir(ruta, 'w') as f:
+        f.write(f"\n> {len(mejores)} Best asap scores "
+                f"(probabilities evaluated with seq length:{longitud})\n")
+        f.write("  distance  #species   #spec w/rec  p-value pente asap-score\n")
+        for i in mejores:
+            p = particiones[i]
+            marca = '*' if p['pval'] <= umbral_pvalor else ' '
+            f.write(f"{marca}  {p['umbral']:.4f}   {p['subsets']:6d}        {p['subsets']:6d}  "
+                    f"{p['pval']:.3e} {p['pente']:.6e} \t{p['score']:.6f} \n")
+
+
+def escribir_particiones(ruta, particiones):
+    # Igual que ASAP, la columna "#inter" lleva los pares intra-grupo de la
+    # partición (nb_ra) y "#intra" los pares entre los grupos que se unen (nb_er)
+    with abrir(ruta, 'w') as f:
+        f.write("#pi_inter=pi pi_intra=pa nb_ra=nb_intra nb_er=nb_inter\n")
+        f.write("#ID   \t#subsets \t#subsets w/rec\tdist     \tPi_i/Pi_a\t"
+                "Pi_inter\tPi_intra\t#inter\t#intra\tpval\n")
+        for i, p in enumerate(particiones):
+            f.write(f"{i:<5}\t{p['subsets']:<5}\t{p['subsets']:<5}\t{p['dist']:.6f}\t"
+                    f"{p['ratio']:.6f}\t{p['pi_inter']:.6f}\t{p['pi_intra']:.6f}\t"
+                    f"{p['n_intra']}\t{p['n_inter']}\t{p['pval']:.6e}\n")
+
+
+def escribir_grupos(ruta, nombres, particiones, uniones, mejores):
+    columnas = [grupos_particion(len(nombres), uniones, i) for i in mejores]
+    with abrir(ruta, 'w') as f:
+        f.write("#sequence\t" + '\t'.join(f"{particiones[i]['subsets']}sp" for i in mejores) + '\n')
+        for k, nombre in enumerate(nombres):
+            f.write(nombre + '\t' + '\t'.join(str(col[k] + 1) for col in columnas) + '\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Particiones de especies estilo ASAP")
+    parser.add_argument("entrada", help="Matriz PHYLIP (.phy/.dist) o alineamiento")
+    parser.add_argument("prefijo", help="Prefijo de salida (p. ej. ASAP-conocarpus)")
+    parser.add_argument("--modelo", default='k2p', help="Distancia si la entrada es un alineamiento")
+    parser.add_argument("--replicas", type=int, default=REPLICAS)
+    parser.add_argument("--max-muestra", type=int, default=MAX_MUESTRA)
+    parser.add_argument("--semilla", type=int, default=SEMILLA)
+    parser.add_argument("--mejores", type=int, default=N_MEJORES)
+    args = parser.parse_args()
+
+    if sin_compresion(args.entrada).lower().endswith(('.phy', '.dist', '.phylip')):
+        from matriz_distancias import leer_phylip
+        nombres, distancias = leer_phylip(args.entrada)
+        longitud = 0
+    else:
+        from alineamientos import leer_codificado
+        from matriz_distancias import matriz_distancias
+        nombres, codigos = leer_codificado(args.entrada)
+        distancias = matriz_distancias(codigos, args.modelo)
+        longitud = codigos.shape[1]
+
+    print(f"🧬 {len(nombres)} secuencias: construyendo y evaluando particiones")
+    particiones, uniones = barrer_umbrales(distancias, args.replicas,
+                                           args.max_muestra, args.semilla)
+    mejores = mejores_particiones(particiones, args.mejores)
+
+    escribir_scores(f"{args.prefijo}.scores.tab", particiones, mejores, longitud)
+    escribir_particiones(f"{args.prefijo}.partitions.tab", particiones)
+    escribir_grupos(f"{args.prefijo}.groups.tab", nombres, particiones, uniones, mejores)
+
+    mejor = particiones[mejores[0]]
+    print(f"✅ Mejor partición: {mejor['subsets']} especies "
+          f"(umbral {mejor['umbral']:.4f}, asap-score {mejor['score']:.1f})")
+    print(f"📁 {args.prefijo}.scores.tab / .partitions.tab / .groups.tab")
+
+
+if __name__ == "__main__":
+    main()
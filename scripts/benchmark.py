@@ -0,0 +1,472 @@
+#!/usr/bin/env python3
+"""
+BENCHMARKS DE ESCALABILIDAD - PROYECTO MANGLARES COMBRETACEAE
+=============================================================
+Propósito: Medir tiempo y memoria de las rutas calientes del flujo sobre
+          datos sintéticos con la forma de los nuestros, a 20 / 200 /
+          2.000 / 20.000 taxones, y comparar contra una línea base.
+
+Datos sintéticos (bench_datos/n<taxones>_s<semilla>/, se generan una vez):
+  - descargas/Especie_marcador.fasta: varios registros por especie y
+    marcador con longitudes alrededor del óptimo de LONGITUD_CONFIG,
+    registros con >20% de ambigüedades y plastomas completos (~160 kb,
+    "chloroplast, complete genome") en un 2% de las especies
+  - supermatriz.fasta / .nex: taxones × 2.819 sitios con gaps y marcadores
+    faltantes
+  - arboles.trees: 101 árboles NEXUS con translate y anotaciones [&rate=]
+  - traza.log: traza BEAST de 10.001 muestras
+
+Casos: leer_fasta, calcular_score, consolidacion, fasta_to_tnt,
+       beast_xml (requiere Biopython), traza, arboles
+
+Cada caso corre en un proceso nuevo: tiempo mínimo y mediana de N
+repeticiones, pico de memoria Python (tracemalloc) y aumento del RSS
+máximo del proceso durante las repeticiones.
+
+Uso:
+    python benchmark.py correr --tamanos 20 200 2000 --salida base.json
+    python benchmark.py correr --salida nuevo.json
+    python benchmark.py comparar base.json nuevo.json --umbral 0.10
+"""
+
+import argparse
+import io
+import json
+import multiprocessing
+import platform
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+# ============================================================================
+# CONFIGURACIÓN
+# ============================================================================
+
+RAIZ_PROYECTO = Path(__file__).resolve().parent.parent
+TAMANOS = [20, 200, 2000, 20000]
+VERSION_DATOS = 1
+
+GENEROS = ['Terminalia', 'Combretum', 'Conocarpus', 'Laguncularia', 'Lumnitzera',
+           'Buchenavia', 'Bucida', 'Quisqualis', 'Calycopteris', 'Punica',
+           'Lagerstroemia', 'Trapa', 'Lawsonia']
+MARCADORES_CLOROPLASTO = ['matK', 'rbcL', 'psaA-ycf3', 'trnH-psbA']
+LONGITUD_SUPERMATRIZ = {'ITS': 650, 'matK': 850, 'rbcL': 600, 'psaA-ycf3': 400,
+                        'trnH-psbA': 319}    # 2.819 sitios
+N_ARBOLES = 101
+N_MUESTRAS_TRAZA = 10001
+LONGITUD_PLASTOMA = 160000
+P_PLASTOMA = 0.02
+P_AMBIGUA = 0.05
+
+CASOS = ['leer_fasta', 'calcular_score', 'consolidacion', 'fasta_to_tnt',
+         'beast_xml', 'traza', 'arboles']
+
+# ============================================================================
+# DATOS SINTÉTICOS
+# ============================================================================
+
+def _secuencia(rng, longitud):
+    return np.frombuffer(b'ACGT', dtype=np.uint8)[
+        rng.integers(0, 4, longitud)].tobytes().decode('ascii')
+
+
+def _escribir_registros(ruta, registros):
+    with open(ruta, 'w') as f:
+        for encabezado, seq in registros:
+            f.write(f">{encabezado}\n")
+            for i in range(0, len(seq), 70):
+                f.write(seq[i:i + 70] + '\n')
+
+
+def _generar_descargas(carpeta, especies, rng):
+    from limpiar_fastas_v3_CORREGIDO import LONGITUD_CONFIG
+
+    carpeta.mkdir(parents=True, exist_ok=True)
+    acceso = 100000
+    for especie in especies:
+        plastoma = _secuencia(rng, LONGITUD_PLASTOMA) if rng.random() < P_PLASTOMA else None
+        for marcador, config in LONGITUD_CONFIG.items():
+            registros = []
+            for _ in range(1 + rng.poisson(2)):
+                acceso += 1
+                longitud = max(50, int(rng.normal(config['optimo'], 0.15 * config['optimo'])))
+                seq = _secuencia(rng, longitud)
+                if rng.random() < P_AMBIGUA:
+                    seq = ''.join('N' if rng.random() < 0.3 else b for b in seq)
+                registros.append((f"MN{acceso}.1 {especie.replace('_', ' ')} "
+                                   f"{marcador} gene, partial sequence", seq))
+            if plastoma and marcador in MARCADORES_CLOROPLASTO:
+                acceso += 1
+                registros.append((f"NC_{acceso}.1 {especie.replace('_', ' ')} "
+                                  f"chloroplast, complete genome", plastoma))
+            _escribir_registros(carpeta / f"{especie}_{marcador}.fasta", registros)
+
+
+def _generar_supermatriz(carpeta, especies, rng):
+    from alineamientos import escribir_fasta, escribir_nexus
+
+    n = len(especies)
+    total = sum(LONGITUD_SUPERMATRIZ.values())
+    ancestro = rng.integers(0, 4, total)
+    mutadas = rng.random((n, total)) < rng.uniform(0.02, 0.15, (n, 1))
+    estados = np.where(mutadas, rng.integers(0, 4, (n, total)), ancestro)
+    letras = np.frombuffer(b'ACGT', dtype=np.uint8)[estados]
+
+    # Indels cortos y marcadores faltantes (10% de los taxones por marcador)
+    for i in range(n):
+        for _ in range(rng.poisson(3)):
+            inicio = rng.integers(0, total)
+            letras[i, inicio:inicio + rng.integers(1, 12)] = ord('-')
+    particiones = []
+    inicio = 0
+    for marcador, longitud in LONGITUD_SUPERMATRIZ.items():
+        faltan = rng.random(n) < 0.10
+        letras[faltan, inicio:inicio + longitud] = ord('-')
+        particiones.append((marcador, inicio + 1, inicio + longitud))
+        inicio += longitud
+
+    secuencias = [fila.tobytes().decode('ascii') for fila in letras]
+    escribir_fasta(carpeta / 'supermatriz.fasta', especies, secuencias)
+    escribir_nexus(carpeta / 'supermatriz.nex', especies, secuencias, particiones)
+
+
+def _arbol_aleatorio(especies, rng):
+    from arboles_nexus import Nodo
+
+    nodos = []
+    for nombre in especies:
+        hoja = Nodo()
+        hoja.nombre = nombre
+        hoja.longitud = float(rng.exponential(0.05))
+        nodos.append(hoja)
+    while len(nodos) > 1:
+        i = int(rng.integers(len(nodos)))
+        j = int(rng.integers(len(nodos) - 1))
+        j += j >= i
+        padre = Nodo()
+        for k in (i, j):
+            nodos[k].padre = padre
+            padre.hijos.append(nodos[k])
+        padre.longitud = float(rng.exponential(0.05))
+        for k in sorted((i, j), reverse=True):
+            nodos[k] = nodos[-1]
+            nodos.pop()
+        nodos.append(padre)
+    raiz = nodos[0]
+    raiz.longitud = None
+    return raiz
+
+
+def _generar_arboles(carpeta, especies, rng):
+    from arboles_nexus import escribir_nexus
+
+    def anotar(nodo):
+        return f"rate={rng.lognormal(-6.5, 0.5)!r}"
+
+    arboles = ((f"STATE_{i * 50000}", _arbol_aleatorio(especies, rng))
+               for i in range(N_ARBOLES))
+    escribir_nexus(carpeta / 'arboles.trees', especies, arboles, anotar, formato='{!r}')
+
+
+def _generar_traza(carpeta, n, rng):
+    from trazas import escribir_traza
+
+    alturas = [f"height.{i}" for i in range(min(n, 500))]
+    columnas = ['Sample', 'posterior', 'likelihood', 'prior', 'birthDeath', 'clockRate'] + alturas
+    valores = rng.normal(size=(N_MUESTRAS_TRAZA, len(columnas)))
+    valores[:, 0] = np.arange(N_MUESTRAS_TRAZA) * 50000
+    escribir_traza(carpeta / 'traza.log', columnas, valores)
+
+
+def generar(base, n_taxones, semilla=1):
+    """Genera (si no existe) el conjunto sintético de n_taxones y retorna su carpeta"""
+    carpeta = Path(base) / f"n{n_taxones}_s{semilla}"
+    marca = carpeta / '.completo'
+    if marca.exists() and json.loads(marca.read_text()).get('version') == VERSION_DATOS:
+        return carpeta
+
+    rng = np.random.default_rng([semilla, n_taxones])
+    especies = [f"{GENEROS[i % len(GENEROS)]}_sp{i:05d}" for i in range(n_taxones)]
+    carpeta.mkdir(parents=True, exist_ok=True)
+
+    inicio = time.perf_counter()
+    _generar_descargas(carpeta / 'descargas', especies, rng)
+    _generar_supermatriz(carpeta, especies, rng)
+    _generar_arboles(carpeta, especies, rng)
+    _generar_traza(carpeta, n_taxones, rng)
+    marca.write_text(json.dumps({'version': VERSION_DATOS, 'taxones': n_taxones,
+                                 'semilla': semilla,
+                                 'segundos': round(time.perf_counter() - inicio, 1)}))
+    return carpeta
+
+
+# ============================================================================
+# CASOS
+# ============================================================================
+
+def preparar_caso(nombre, carpeta, temporal):
+    """
+    Prepara un caso (fuera de la medición)
+
+    Returns:
+        función sin argumentos que ejecuta la ruta caliente
+    """
+    import limpiar_fastas_v3_CORREGIDO as limpiar
+
+    descargas = carpeta / 'descargas'
+
+    if nombre == 'leer_fasta':
+        archivos = sorted(descargas.glob('*.fasta'))
+
+        def leer():
+            for archivo in archivos:
+                limpiar.leer_fasta(archivo)
+        return leer
+
+    if nombre == 'calcular_score':
+        entradas = []
+        for archivo in sorted(descargas.glob('*.fasta')):
+            marcador = archivo.stem.split('_')[-1]
+            for seq in limpiar.leer_fasta(archivo):
+                entradas.append(({'header': seq['header'], 'length': seq['length']}, marcador))
+        return lambda: [limpiar.calcular_score(s, m) for s, m in entradas]
+
+    if nombre == 'consolidacion':
+        import consolidar_fastas
+        curados = temporal / 'curados'
+        with redirect_stdout(io.StringIO()):
+            limpiar.main(descargas, curados)
+        return lambda: consolidar_fastas.main(curados, temporal / 'alineamiento_input')
+
+    if nombre == 'fasta_to_tnt':
+        from convertidor_fasta_corregido import fasta_to_tnt
+        return lambda: fasta_to_tnt(carpeta / 'supermatriz.fasta', temporal / 'supermatriz.tnt')
+
+    if nombre == 'beast_xml':
+        import Bio  # beast_thesis_config importa Bio recién al generar: sin él se omite
+        sys.path.insert(0, str(RAIZ_PROYECTO / 'analyses' / 'beast'))
+        from beast_thesis_config import generate_beast_xml_thesis
+        return lambda: generate_beast_xml_thesis(str(carpeta / 'supermatriz.nex'),
+                                                 output_file=str(temporal / 'thesis.xml'))
+
+    if nombre == 'traza':
+        from trazas import leer_traza
+        return lambda: leer_traza(carpeta / 'traza.log')
+
+    if nombre == 'arboles':
+        from arboles_nexus import iterar_arboles, parsear_newick
+        ruta = carpeta / 'arboles.trees'
+
+        def parsear():
+            for _, newick, traduccion in iterar_arboles(ruta):
+                parsear_newick(newick, traduccion)
+        return parsear
+
+    raise ValueError(f"Caso desconocido: {nombre} (opciones: {', '.join(CASOS)})")
+
+
+def _memoria_proceso(campo):
+    """VmRSS / VmHWM en MB desde /proc (Linux); None si no está disponible"""
+    try:
+        with open('/proc/self/status') as f:
+            for linea in f:
+                if linea.startswith(campo + ':'):
+                    return int(linea.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def _reiniciar_pico():
+    # En Linux el pico (VmHWM) se reinicia escribiendo 5 en clear_refs;
+    # ru_maxrss no sirve porque se hereda a través de fork/exec
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+    actual = _memoria_proceso('VmRSS')
+    return actual if actual is not None else _pico_rss_mb()
+
+
+def _pico_rss_mb():
+    pico = _memoria_proceso('VmHWM')
+    if pico is not None:
+        return pico
+    # ru_maxrss: KB en Linux, bytes en macOS
+    escala = 1 if sys.platform == 'darwin' else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * escala / 2**20
+
+
+def _medir(nombre, carpeta, repeticiones):
+    """Se ejecuta en un proceso nuevo: prepara, mide tiempo y memoria"""
+    import tempfile
+
+    sys.path.insert(0, str(Path(__file__).resolve().parent))
+    with tempfile.TemporaryDirectory() as temporal:
+        try:
+            funcion = preparar_caso(nombre, Path(carpeta), Path(temporal))
+        except ImportError as error:
+            return {'omitido': str(error)}
+
+        rss_inicial = _reiniciar_pico()
+        tiempos = []
+        with redirect_stdout(io.StringIO()):
+            for _ in range(repeticiones):
+                inicio = time.perf_counter()
+                funcion()
+                tiempos.append(time.perf_counter() - inicio)
+            rss_final = _pico_rss_mb()
+
+            tracemalloc.start()
+            funcion()
+            _, pico = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+    return {
+        'segundos': min(tiempos),
+        'mediana': float(np.median(tiempos)),
+        'repeticiones': repeticiones,
+        'memoria_pico_mb': pico / 2**20,
+        'rss_aumento_mb': max(0.0, rss_final - rss_inicial),
+    }
+
+
+def _metadatos():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=RAIZ_PROYECTO,
+                                capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ''
+    return {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'plataforma': platform.platform(),
+        'procesador': platform.processor() or platform.machine(),
+    }
+
+
+def correr(tamanos, casos, repeticiones=3, datos='bench_datos', semilla=1):
+    """Genera los datos que falten y mide cada caso × tamaño en un proceso nuevo"""
+    contexto = multiprocessing.get_context('spawn')
+    resultados = []
+    for n in tamanos:
+        inicio = time.perf_counter()
+        carpeta = generar(datos, n, semilla)
+        print(f"\n📁 {n} taxones: {carpeta} ({time.perf_counter() - inicio:.1f} s)")
+        for caso in casos:
+            with ProcessPoolExecutor(1, mp_context=contexto) as pool:
+                medida = pool.submit(_medir, caso, str(carpeta), repeticiones).result()
+            resultados.append({'caso': caso, 'taxones': n, **medida})
+            if 'omitido' in medida:
+                print(f"   ⏭️  {caso:15} omitido: {medida['omitido']}")
+            else:
+                print(f"   ⏱️  {caso:15} {medida['segundos']:10.4f} s  "
+                      f"(mediana {medida['mediana']:.4f})  "
+                      f"pico {medida['memoria_pico_mb']:9.1f} MB  "
+                      f"RSS +{medida['rss_aumento_mb']:.1f} MB")
+    return {'meta': _metadatos(), 'semilla': semilla, 'resultados': resultados}
+
+
+# ============================================================================
+# COMPARACIÓN
+# ============================================================================
+
+def comparar(base, nuevo, umbral=0.10, minimo_segundos=0.005, minimo_mb=1.0):
+    """
+    Compara dos resultados; regresión = empeora más que `umbral` (relativo)
+    y más que el mínimo absoluto (ruido)
+
+    Returns:
+        lista de (caso, taxones, métrica, valor_base, valor_nuevo)
+    """
+    previos = {(r['caso'], r['taxones']): r for r in base['resultados'] if 'omitido' not in r}
+    regresiones = []
+
+    print(f"{'Caso':<16} {'Taxones':>8} {'Base (s)':>10} {'Nuevo (s)':>10} {'Δ':>8}"
+          f" {'Base MB':>9} {'Nuevo MB':>9}")
+    print("-" * 80)
+    for r in nuevo['resultados']:
+        clave = (r['caso'], r['taxones'])
+        if 'omitido' in r or clave not in previos:
+            continue
+        b = previos[clave]
+        cambio = r['segundos'] / b['segundos'] - 1 if b['segundos'] else 0.0
+        marcas = []
+        if r['segundos'] > b['segundos'] * (1 + umbral) and \
+                r['segundos'] - b['segundos'] > minimo_segundos:
+            regresiones.append((*clave, 'segundos', b['segundos'], r['segundos']))
+            marcas.append('⚠️ tiempo')
+        if r['memoria_pico_mb'] > b['memoria_pico_mb'] * (1 + umbral) and \
+                r['memoria_pico_mb'] - b['memoria_pico_mb'] > minimo_mb:
+            regresiones.append((*clave, 'memoria_pico_mb', b['memoria_pico_mb'],
+                                r['memoria_pico_mb']))
+            marcas.append('⚠️ memoria')
+        print(f"{r['caso']:<16} {r['taxones']:>8} {b['segundos']:10.4f} {r['segundos']:10.4f} "
+              f"{cambio:+8.1%} {b['memoria_pico_mb']:9.1f} {r['memoria_pico_mb']:9.1f}  "
+              + ' '.join(marcas))
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks de escalabilidad con datos sintéticos")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p = sub.add_parser("generar", help="Solo genera los datos sintéticos")
+    p.add_argument("--tamanos", type=int, nargs='+', default=TAMANOS)
+    p.add_argument("--datos", default="bench_datos")
+    p.add_argument("--semilla", type=int, default=1)
+
+    p = sub.add_parser("correr", help="Mide los casos y guarda JSON")
+    p.add_argument("--tamanos", type=int, nargs='+', default=TAMANOS)
+    p.add_argument("--casos", nargs='+', choices=CASOS, default=CASOS)
+    p.add_argument("--repeticiones", type=int, default=3)
+    p.add_argument("--datos", default="bench_datos")
+    p.add_argument("--semilla", type=int, default=1)
+    p.add_argument("--salida", default="benchmark.json")
+
+    p = sub.add_parser("comparar", help="Compara contra una línea base")
+    p.add_argument("base")
+    p.add_argument("nuevo")
+    p.add_argument("--umbral", type=float, default=0.10,
+                   help="Empeoramiento relativo tolerado (defecto: 0.10)")
+
+    args = parser.parse_args()
+
+    if args.comando == "generar":
+        for n in args.tamanos:
+            print(f"📁 {generar(args.datos, n, args.semilla)}")
+
+    elif args.comando == "correr":
+        print("=" * 80)
+        print("⏱️  BENCHMARKS DE ESCALABILIDAD")
+        print("=" * 80)
+        resultado = correr(args.tamanos, args.casos, args.repeticiones, args.datos, args.semilla)
+        with open(args.salida, 'w') as f:
+            json.dump(resultado, f, indent=2)
+        print(f"\n✅ Resultados: {args.salida}")
+
+    else:
+        with open(args.base) as f:
+            base = json.load(f)
+        with open(args.nuevo) as f:
+            nuevo = json.load(f)
+        regresiones = comparar(base, nuevo, args.umbral)
+        if regresiones:
+            print(f"\n❌ {len(regresiones)} regresión(es) sobre el umbral de {args.umbral:.0%}")
+            sys.exit(1)
+        print(f"\n✅ Sin regresiones sobre el umbral de {args.umbral:.0%}")
+
+
+if __name__ == "__main__":
+    main()
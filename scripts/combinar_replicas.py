@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+COMBINAR RÉPLICAS DE BEAST - PROYECTO MANGLARES COMBRETACEAE
+============================================================
+Propósito: Unir las N cadenas cortas de generate_replicates()
+          (beast_thesis_config.py) en una sola muestra posterior, después
+          de verificar que las réplicas exploran la misma distribución.
+
+Verificaciones (después del burn-in de cada réplica):
+  - PSRF de Gelman-Rubin por parámetro de la traza (todas las réplicas
+    recortadas a la misma longitud); ~1.0 si coinciden.
+  - Frecuencias de splits: desviación estándar de la frecuencia de cada
+    split entre réplicas, promediada sobre los splits con frecuencia
+    >= 10% en alguna réplica (ASDSF, como MrBayes) y su máximo.
+
+Salida:
+  - Traza unida (.log) con la columna Sample renumerada de forma continua.
+  - Árboles unidos (.trees) con el texto original de cada árbol (se
+    conservan las anotaciones de BEAST); si las tablas translate de las
+    réplicas difieren, los árboles se reescriben con una tabla común.
+Ambas ya sin burn-in: resumir_edades_nodos.py se corre con --burnin 0.
+
+Uso:
+    python combinar_replicas.py beast/ --salida beast/thesis_beast_combinado
+    python combinar_replicas.py --logs r1.log r2.log --arboles r1.trees r2.trees --burnin 25
+"""
+
+import argparse
+import os
+
+import numpy as np
+
+from archivos import abrir
+from arboles_nexus import (
+    a_newick,
+    biparticiones,
+    contar_arboles,
+    iterar_arboles,
+    parsear_newick,
+    posiciones_arboles,
+)
+from trazas import escribir_traza, leer_traza
+
+# ============================================================================
+# CONFIGURACIÓN
+# ============================================================================
+
+BURNIN_DEFECTO = 10.0   # % descartado al comienzo de cada réplica
+PSRF_MAXIMO = 1.01
+ASDSF_MAXIMO = 0.01
+FRECUENCIA_MINIMA = 0.10   # splits considerados en el ASDSF
+
+# ============================================================================
+# RÉPLICAS
+# ============================================================================
+
+def leer_replicas(carpeta):
+    """[(log, trees)] según replicas.tsv de generate_replicates()"""
+    pares = []
+    with open(os.path.join(carpeta, 'replicas.tsv')) as f:
+        next(f)
+        for linea in f:
+            campos = linea.rstrip('\n').split('\t')
+            if len(campos) >= 5:
+                pares.append((os.path.join(carpeta, campos[3]), os.path.join(carpeta, campos[4])))
+    return pares
+
+
+def _descarte(total, burnin):
+    return int(total * burnin / 100)
+
+
+# ============================================================================
+# TRAZAS
+# ============================================================================
+
+def psrf(cadenas):
+    """
+    PSRF de Gelman-Rubin de cada columna
+
+    Args:
+        cadenas: array (réplicas × muestras × parámetros)
+
+    Returns:
+        array (parámetros,); NaN para parámetros constantes
+    """
+    m, n, _ = cadenas.shape
+    medias = cadenas.mean(axis=1)
+    w = cadenas.var(axis=1, ddof=1).mean(axis=0)
+    b = n * medias.var(axis=0, ddof=1)
+    varianza = (n - 1) / n * w + (b / n) * (m + 1) / m
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.sqrt(np.where(w > 0, varianza / w, np.nan))
+
+
+def combinar_trazas(rutas, burnin):
+    """
+    Returns:
+        (columnas, valores unidos, psrf por columna salvo la primera)
+    """
+    columnas = None
+    recortadas = []
+    for ruta in rutas:
+        cols, valores = leer_traza(ruta)
+        if columnas is None:
+            columnas = cols
+        elif cols != columnas:
+            raise ValueError(f"{ruta}: columnas distintas a las de {rutas[0]}")
+        recortadas.append(valores[_descarte(len(valores), burnin):])
+
+    n = min(len(v) for v in recortadas)
+    if n < 2:
+        raise ValueError("Menos de 2 muestras por réplica después del burn-in")
+    factores = psrf(np.stack([v[:n, 1:] for v in recortadas]))
+
+    unidos = np.concatenate(recortadas)
+    primera = recortadas[0][:, 0]
+    paso = primera[1] - primera[0] if len(primera) > 1 else 1
+    unidos[:, 0] = np.arange(len(unidos)) * paso
+    return columnas, unidos, factores
+
+
+# ============================================================================
+# ÁRBOLES
+# ============================================================================
+
+def _arboles_post_burnin(ruta, burnin):
+    posiciones = posiciones_arboles(ruta)
+    total = len(posiciones) if posiciones is not None else contar_arboles(ruta)
+    return iterar_arboles(ruta, saltar=_descarte(total, burnin), posiciones=posiciones)
+
+
+def frecuencias_splits(rutas, burnin):
+    """
+    Returns:
+        (taxa, [{split: frecuencia}] por réplica, [traducción] por réplica)
+    """
+    indice = None
+    frecuencias = []
+    traducciones = []
+    for ruta in rutas:
+        conteos = {}
+        n_arboles = 0
+        traduccion = None
+        for _, newick, traduccion in _arboles_post_burnin(ruta, burnin):
+            raiz = parsear_newick(newick, traduccion)
+            if indice is None:
+                indice = {nombre: i for i, nombre in
+                          enumerate(sorted(h.nombre for h in raiz.hojas()))}
+            for split in biparticiones(raiz, indice):
+                conteos[split] = conteos.get(split, 0) + 1
+            n_arboles += 1
+        if not n_arboles:
+            raise ValueError(f"{ruta}: sin árboles después del burn-in")
+        frecuencias.append({s: c / n_arboles for s, c in conteos.items()})
+        traducciones.append(traduccion)
+    return sorted(indice, key=indice.get), frecuencias, traducciones
+
+
+def desviacion_splits(frecuencias, minima=FRECUENCIA_MINIMA):
+    """(ASDSF, máxima desviación) entre réplicas"""
+    splits = [s for s in set().union(*frecuencias)
+              if max(f.get(s, 0.0) for f in frecuencias) >= minima]
+    if not splits:
+        return 0.0, 0.0
+    tabla = np.array([[f.get(s, 0.0) for s in splits] for f in frecuencias])
+    desviaciones = tabla.std(axis=0, ddof=1)
+    return float(desviaciones.mean()), float(desviaciones.max())
+
+
+def escribir_arboles(ruta, rutas, burnin, taxa, traducciones, paso):
+    """
+    Une los árboles post burn-in; con la misma tabla translate en todas las
+    réplicas se copia el texto de cada árbol tal cual
+    """
+    comun = all(t == traducciones[0] for t in traducciones) and traducciones[0]
+    numeros = {nombre: numero for numero, nombre in traducciones[0].items()} if comun else \
+        {nombre: str(i) for i, nombre in enumerate(taxa, 1)}
+    orden = list(numeros)
+
+    n_arboles = 0
+    with abrir(ruta, 'w') as f:
+        f.write("#NEXUS\n\nBegin taxa;\n")
+        f.write(f"\tDimensions ntax={len(orden)};\n\t\tTaxlabels\n")
+        for nombre in orden:
+            f.write(f"\t\t\t{nombre}\n")
+        f.write("\t\t\t;\nEnd;\nBegin trees;\n\tTranslate\n")
+        f.write(',\n'.join(f"\t\t{numeros[nombre]:>6} {nombre}" for nombre in orden))
+        f.write("\n;\n")
+        for ruta_replica in rutas:
+            for _, newick, traduccion in _arboles_post_burnin(ruta_replica, burnin):
+                if not comun:
+                    raiz = parsear_newick(newick, traduccion)
+                    for hoja in raiz.hojas():
+                        hoja.nombre = numeros[hoja.nombre]
+                    newick = a_newick(raiz)
+                f.write(f"tree STATE_{n_arboles * paso} = {newick.strip()}\n")
+                n_arboles += 1
+        f.write("End;\n")
+    return n_arboles, bool(comun)
+
+
+# ============================================================================
+# COMBINAR
+# ============================================================================
+
+def combinar(logs, arboles, salida, burnin=BURNIN_DEFECTO):
+    """
+    Verifica y une las réplicas
+
+    Returns:
+        dict con psrf {parámetro: valor}, asdsf, sdsf_max, muestras, arboles
+    """
+    resultado = {}
+    paso = 1
+    if logs:
+        columnas, valores, factores = combinar_trazas(logs, burnin)
+        escribir_traza(f"{salida}.log", columnas, valores)
+        resultado['psrf'] = dict(zip(columnas[1:], factores.tolist()))
+        resultado['muestras'] = len(valores)
+        if len(valores) > 1:
+            paso = int(valores[1, 0])
+    if arboles:
+        taxa, frecuencias, traducciones = frecuencias_splits(arboles, burnin)
+        resultado['asdsf'], resultado['sdsf_max'] = desviacion_splits(frecuencias)
+        resultado['arboles'], resultado['texto_original'] = escribir_arboles(
+            f"{salida}.trees", arboles, burnin, taxa, traducciones, paso)
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verifica y une réplicas de BEAST")
+    parser.add_argument("carpeta", nargs='?', help="Carpeta con replicas.tsv (generate_replicates)")
+    parser.add_argument("--logs", nargs='+', default=[], help="Trazas .log de las réplicas")
+    parser.add_argument("--arboles", nargs='+', default=[], help="Árboles .trees de las réplicas")
+    parser.add_argument("--burnin", type=float, default=BURNIN_DEFECTO,
+                        help="Porcentaje de burn-in por réplica (defecto: 10)")
+    parser.add_argument("--salida", help="Prefijo de salida (defecto: <carpeta>/thesis_beast_combinado)")
+    args = parser.parse_args()
+
+    logs, arboles = list(args.logs), list(args.arboles)
+    if args.carpeta:
+        for log, trees in leer_replicas(args.carpeta):
+            logs.append(log)
+            arboles.append(trees)
+    if len(logs) < 2 and len(arboles) < 2:
+        parser.error("se necesitan al menos 2 réplicas (carpeta con replicas.tsv o --logs/--arboles)")
+    salida = args.salida or os.path.join(args.carpeta or '.', 'thesis_beast_combinado')
+
+    print("=" * 80)
+    print(f"🔗 COMBINAR RÉPLICAS DE BEAST ({max(len(logs), len(arboles))} réplicas, "
+          f"burn-in {args.burnin:g}%)")
+    print("=" * 80 + "\n")
+
+    resultado = combinar(logs, arboles, salida, args.burnin)
+
+    if 'psrf' in resultado:
+        altos = {p: v for p, v in resultado['psrf'].items() if v > PSRF_MAXIMO}
+        peor = max((v for v in resultado['psrf'].values() if np.isfinite(v)), default=float('nan'))
+        print(f"📈 PSRF máximo: {peor:.4f} ({len(resultado['psrf'])} parámetros)")
+        for parametro, valor in sorted(altos.items(), key=lambda x: -x[1]):
+            print(f"   ⚠️  {parametro}: PSRF {valor:.4f} > {PSRF_MAXIMO}")
+        print(f"✅ Traza unida: {salida}.log ({resultado['muestras']} muestras)")
+    if 'asdsf' in resultado:
+        marca = "⚠️ " if resultado['asdsf'] > ASDSF_MAXIMO else "🌳"
+        print(f"{marca} ASDSF {resultado['asdsf']:.4f} (máximo {resultado['sdsf_max']:.4f}, "
+              f"umbral {ASDSF_MAXIMO})")
+        copia = "" if resultado['texto_original'] else " (translate reescrito)"
+        print(f"✅ Árboles unidos: {salida}.trees ({resultado['arboles']} árboles){copia}")
+
+
+if __name__ == "__main__":
+    main()
@@ -21,6 +21,9 @@ from Bio import Entrez
 import time, os, re, csv
 from datetime import datetime
 
+import instrumentacion as inst
+from archivos import abrir
+
 # ══════════════════════════════════════════════════════════════
 # CONFIGURACIÓN
 # ══════════════════════════════════════════════════════════════
@@ -195,6 +198,7 @@ MARCADORES = {
 }
 
 CARPETA_SALIDA = "combretaceae_sequences_final"
+COMPRIMIR = False   # True: guarda Especie_marcador.fasta.gz (BGZF, ver archivos.py)
 PAUSA = 0.35 if NCBI_API_KEY else 0.5
 
 # ══════════════════════════════════════════════════════════════
@@ -213,16 +217,20 @@ def construir_queries(especie, marcador_queries):
 
 def buscar_ids(queries, retmax=100):
     """Prueba queries hasta encontrar hits"""
-    for query in queries:
+    for i, query in enumerate(queries):
+        if i:
+            inst.incrementar('ncbi_reintentos', operacion='esearch')
         try:
-            handle = Entrez.esearch(
-                db="nucleotide",
-                term=query,
-                retmax=retmax,
-                api_key=NCBI_API_KEY,
-            )
-            record = Entrez.read(handle)
-            handle.close()
+            inst.incrementar('ncbi_solicitudes', operacion='esearch')
+            with inst.temporizador('ncbi_llamada', operacion='esearch'):
+                handle = Entrez.esearch(
+                    db="nucleotide",
+                    term=query,
+                    retmax=retmax,
+                    api_key=NCBI_API_KEY,
+                )
+                record = Entrez.read(handle)
+                handle.close()
             
             ids = record["IdList"]
             total = int(record["Count"])
@@ -232,6 +240,7 @@ def buscar_ids(queries, retmax=100):
             
             time.sleep(PAUSA)
         except Exception as e:
+            inst.incrementar('ncbi_errores', operacion='esearch')
             print(f"      [ERROR búsqueda] {e}")
             continue
     
@@ -244,23 +253,28 @@ def descargar_fasta(ids):
         return ""
     
     try:
-        handle = Entrez.efetch(
-            db="nucleotide",
-            id=ids,
-            rettype="fasta",
-            retmode="text",
-            api_key=NCBI_API_KEY,
-        )
-        fasta_text = handle.read()
-        handle.close()
+        inst.incrementar('ncbi_solicitudes', operacion='efetch')
+        with inst.temporizador('ncbi_llamada', operacion='efetch'):
+            handle = Entrez.efetch(
+                db="nucleotide",
+                id=ids,
+                rettype="fasta",
+                retmode="text",
+                api_key=NCBI_API_KEY,
+            )
+            fasta_text = handle.read()
+            handle.close()
+        inst.incrementar('bytes_descargados', len(fasta_text.encode('utf-8')))
         return fasta_text
     except Exception as e:
+        inst.incrementar('ncbi_errores', operacion='efetch')
         print(f"      [ERROR descarga] {e}")
         return ""
 
 
-def main():
-    os.makedirs(CARPETA_SALIDA, exist_ok=True)
+@inst.etapa('descarga')
+def main(carpeta_salida=CARPETA_SALIDA):
+    os.makedirs(carpeta_salida, exist_ok=True)
     
     # Timestamp
     inicio = datetime.now()
@@ -298,6 +312,7 @@ def main():
             
             for nombre in nombres_a_intentar:
                 if nombre != especie_principal:
+                    inst.incrementar('sinonimos_intentados', marcador=marcador_key)
                     print(f"      → Intentando sinónimo: {nombre}")
                 
                 queries = construir_queries(nombre, marcador_queries)
@@ -333,12 +348,16 @@ def main():
                 
                 # Guardar
                 nombre_archivo = f"{sanitize(especie_principal)}_{marcador_key}.fasta"
-                ruta = os.path.join(CARPETA_SALIDA, nombre_archivo)
+                if COMPRIMIR:
+                    nombre_archivo += ".gz"
+                ruta = os.path.join(carpeta_salida, nombre_archivo)
                 
-                with open(ruta, "w") as f:
+                with abrir(ruta, "w") as f:
                     f.write(fasta_text)
                 
                 n_seqs = fasta_text.count(">")
+                inst.incrementar('secuencias_escritas', n_seqs, etapa='descarga',
+                                 marcador=marcador_key)
                 estado = "OK" if nombre == especie_principal else f"Sinónimo: {nombre}"
                 
                 print(f"      💾 {nombre_archivo} ({n_seqs} seqs)")
@@ -397,7 +416,7 @@ def main():
     print(f"  Combinaciones sin datos: {sin_datos}")
     print(f"  Cobertura: {(archivos_ok/total_combinaciones)*100:.1f}%")
     print(f"  Duración: {duracion:.1f} minutos")
-    print(f"\n  📁 Carpeta: ./{CARPETA_SALIDA}/\n")
+    print(f"\n  📁 Carpeta: ./{carpeta_salida}/\n")
     
     # Estadísticas por grupo
     print("\n" + "─" * 80)
@@ -437,7 +456,7 @@ def main():
         print("  → O considerar excluirlas del análisis final")
     
     # ── EXPORTAR CSV DETALLADO ───────────────────────────────
-    csv_path = os.path.join(CARPETA_SALIDA, "resumen_descarga.csv")
+    csv_path = os.path.join(carpeta_salida, "resumen_descarga.csv")
     with open(csv_path, "w", newline="", encoding="utf-8") as csvfile:
         fieldnames = ["especie", "grupo", "marcador", "n_seqs", "estado", "nombre_usado"]
         writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
@@ -447,7 +466,7 @@ def main():
     print(f"\n  📊 Resumen CSV: {csv_path}")
     
     # ── METADATA ──────────────────────────────────────────────
-    metadata_path = os.path.join(CARPETA_SALIDA, "metadata.txt")
+    metadata_path = os.path.join(carpeta_salida, "metadata.txt")
     with open(metadata_path, "w") as f:
         f.write("COMBRETACEAE PHYLOGENY - METADATA\n")
         f.write("═" * 80 + "\n\n")
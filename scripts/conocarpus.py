@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+CLI CONOCARPUS - PROYECTO MANGLARES COMBRETACEAE
+================================================
+Propósito: Un solo comando para todas las etapas del flujo, con las rutas
+          configurables (argumentos o --config JSON con las mismas claves
+          que pipeline.py) en lugar de las rutas fijas de cada script.
+
+Arranque: este módulo solo importa argparse, json, os y sys; cada
+subcomando importa su script (y NumPy o Biopython, si los usa) recién
+cuando se ejecuta, así que los subcomandos livianos (clean, consolidate,
+convert a TNT, diagnose) arrancan en pocas decenas de ms.
+
+Subcomandos propios (rutas configurables):
+    download      descarga de NCBI (Biopython)
+    clean         limpieza y curación por marcador
+    consolidate   multi-FASTA por marcador para MAFFT
+    supermatrix   concatenación de alineamientos (FASTA + NEXUS con charsets)
+    convert       FASTA/NEXUS/TNT → FASTA, NEXUS o TNT (según la extensión;
+                  con .gz se lee / escribe comprimido)
+    beast-xml     XML de BEAST 2 (Biopython); --replicas N para cadenas paralelas
+    diagnose      ESS de una traza de BEAST (04_diagnose_convergence.R)
+
+Subcomandos delegados (mismos argumentos que el script):
+    align, trim, fitch, resample, models, distances, asap, trees,
+    quick-trees, node-ages, combine, concordance, compress, bench, pipeline
+
+Uso:
+    python conocarpus.py clean --entrada descargas/ --salida curados/ --marcador ITS
+    python conocarpus.py --config proyecto.json consolidate
+    python conocarpus.py convert supermatriz.fasta supermatriz.tnt
+    python conocarpus.py fitch supermatriz.tnt arboles.trees --resumen
+"""
+
+import argparse
+import json
+import os
+import sys
+
+# ============================================================================
+# CONFIGURACIÓN
+# ============================================================================
+
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+RAIZ_PROYECTO = os.path.dirname(DIRECTORIO)
+
+# Mismas claves que pipeline.CONFIG (se copian para no importar pipeline.py)
+RUTAS = {
+    'trabajo': '.',
+    'descargas': 'combretaceae_sequences_final',
+    'curados': 'fastas_individuales_curados',
+    'entrada_mafft': 'alineamiento_input',
+    'alineamientos': 'alineamientos',
+    'supermatriz': 'supermatriz',
+    'beast': 'beast',
+    'marcadores': ['ITS', 'matK', 'rbcL', 'psaA-ycf3', 'trnH-psbA'],
+}
+
+# subcomando -> (módulo, descripción); reciben el resto de la línea de comandos
+DELEGADOS = {
+    'align': ('alinear_marcadores', "Alineamiento MAFFT paralelo por marcador"),
+    'trim': ('recortar_alineamientos', "Recorte de columnas (trimAl / Gblocks)"),
+    'fitch': ('parsimonia_fitch', "Longitud de Fitch, CI y RI de árboles"),
+    'resample': ('remuestreo', "Réplicas de remuestreo como vectores de pesos"),
+    'models': ('seleccion_modelos', "Selección de modelos de sustitución"),
+    'distances': ('matriz_distancias', "Matriz de distancias p / JC69 / K2P"),
+    'asap': ('asap_particiones', "Particiones de especies estilo ASAP"),
+    'trees': ('almacen_arboles', "Almacén binario deduplicado de árboles"),
+    'quick-trees': ('arboles_rapidos', "Árboles NJ / UPGMA rápidos y control por marcador"),
+    'node-ages': ('resumir_edades_nodos', "Edades de nodos y árbol MCC"),
+    'combine': ('combinar_replicas', "Verificar (PSRF, ASDSF) y unir réplicas de BEAST"),
+    'concordance': ('factores_concordancia', "Factores de concordancia gCF / sCF por rama"),
+    'compress': ('archivos', "Comprimir a BGZF (o descomprimir) archivos de datos"),
+    'bench': ('benchmark', "Benchmarks con datos sintéticos"),
+    'pipeline': ('pipeline', "Pipeline incremental (descarga → BEAST)"),
+}
+
+
+def cargar_rutas(ruta=None):
+    """RUTAS con las claves del JSON de configuración (se ignoran las ajenas)"""
+    rutas = dict(RUTAS)
+    if ruta:
+        with open(ruta) as f:
+            usuario = json.load(f)
+        rutas.update({k: v for k, v in usuario.items() if k in RUTAS})
+    return rutas
+
+
+def _ruta(rutas, clave, *partes):
+    return os.path.join(rutas['trabajo'], rutas[clave], *partes)
+
+
+# ============================================================================
+# SUBCOMANDOS
+# ============================================================================
+
+def cmd_download(args, rutas):
+    import combretaceae_download_v4_final as descarga
+    if args.email:
+        descarga.Entrez.email = args.email
+    if args.api_key:
+        descarga.NCBI_API_KEY = args.api_key
+        descarga.PAUSA = 0.35
+    descarga.COMPRIMIR = args.gz
+    descarga.main(args.salida or _ruta(rutas, 'descargas'))
+
+
+def cmd_clean(args, rutas):
+    import limpiar_fastas_v3_CORREGIDO as limpieza
+    limpieza.main(args.entrada or _ruta(rutas, 'descargas'),
+                  args.salida or _ruta(rutas, 'curados'),
+                  args.marcador or rutas['marcadores'])
+
+
+def cmd_consolidate(args, rutas):
+    import consolidar_fastas
+    consolidar_fastas.main(args.entrada or _ruta(rutas, 'curados'),
+                           args.salida or _ruta(rutas, 'entrada_mafft'),
+                           args.marcador or rutas['marcadores'])
+
+
+def cmd_supermatrix(args, rutas):
+    from alineamientos import concatenar, escribir_fasta, escribir_nexus
+    carpeta = args.entrada or _ruta(rutas, 'alineamientos')
+    alineamientos = {}
+    for marcador in args.marcador or rutas['marcadores']:
+        ruta = os.path.join(carpeta, f'{marcador}{args.sufijo}')
+        if os.path.exists(ruta):
+            alineamientos[marcador] = ruta
+        else:
+            print(f"⚠️  {marcador:12} sin alineamiento ({ruta})")
+    if not alineamientos:
+        sys.exit(f"❌ No hay alineamientos en {carpeta}")
+
+    salida = args.salida or _ruta(rutas, 'supermatriz')
+    os.makedirs(salida, exist_ok=True)
+    nombres, secuencias, particiones = concatenar(alineamientos)
+    escribir_fasta(os.path.join(salida, 'supermatriz.fasta'), nombres, secuencias)
+    escribir_nexus(os.path.join(salida, 'supermatriz.nex'), nombres, secuencias, particiones)
+    print(f"✅ Supermatriz: {len(nombres)} taxones × {len(secuencias[0])} sitios → {salida}/")
+    for marcador, inicio, fin in particiones:
+        print(f"   {marcador:12} {inicio:6}-{fin}")
+
+
+def cmd_convert(args, rutas):
+    from archivos import abrir, sin_compresion
+    entrada, salida = args.entrada, args.salida
+    destino = sin_compresion(salida).lower()
+    es_fasta = not sin_compresion(entrada).lower().endswith(('.tnt', '.nex', '.nexus', '.nxs'))
+
+    if destino.endswith('.tnt') and es_fasta:
+        # Conversión directa sin NumPy
+        from convertidor_fasta_corregido import fasta_to_tnt
+        try:
+            fasta_to_tnt(entrada, salida)
+        except ValueError as e:
+            sys.exit(f"❌ {entrada}: {e}")
+        return
+
+    from alineamientos import escribir_fasta, escribir_nexus, leer_matriz
+    registros = leer_matriz(entrada)
+    longitudes = {len(seq) for _, seq in registros}
+    if destino.endswith(('.tnt', '.nex', '.nexus', '.nxs')) and len(longitudes) > 1:
+        # NEXUS y TNT declaran un único nchar: la matriz debe estar alineada
+        sys.exit(f"❌ {entrada}: secuencias de longitud desigual {sorted(longitudes)}; "
+                 f"alinear antes de convertir a {os.path.splitext(destino)[1]}")
+    nombres = [n for n, _ in registros]
+    secuencias = [s for _, s in registros]
+    if destino.endswith('.tnt'):
+        with abrir(salida, 'w') as f:
+            f.write(f"nstates dna;\nxread\n{len(secuencias[0])} {len(nombres)}\n")
+            for nombre, seq in registros:
+                f.write(f"{nombre} {seq}\n")
+            f.write(";\nproc/;\n")
+    elif destino.endswith(('.nex', '.nexus', '.nxs')):
+        escribir_nexus(salida, nombres, secuencias)
+    else:
+        escribir_fasta(salida, nombres, secuencias)
+    print(f"✅ {entrada} → {salida} ({len(nombres)} taxones × {len(secuencias[0])} sitios)")
+
+
+def cmd_beast_xml(args, rutas):
+    sys.path.insert(0, os.path.join(RAIZ_PROYECTO, 'analyses', 'beast'))
+    from beast_thesis_config import generate_beast_xml_thesis, generate_replicates, load_model
+    nexus = args.nexus or _ruta(rutas, 'supermatriz', 'supermatriz.nex')
+    salida = args.salida or _ruta(rutas, 'beast', 'combretaceae_thesis.xml')
+    carpeta = os.path.dirname(salida)
+    if carpeta:
+        os.makedirs(carpeta, exist_ok=True)
+    arbol = None
+    if args.arbol_inicial == 'upgma':
+        from arboles_rapidos import newick_beast
+        from beast_thesis_config import CALIBRATION_AGE, CALIBRATION_TAXA
+        arbol = newick_beast(nexus, CALIBRATION_TAXA, CALIBRATION_AGE)
+    elif args.arbol_inicial:
+        with open(args.arbol_inicial) as f:
+            arbol = f.read()
+    modelo = load_model(args.modelo) if args.modelo else None
+    if args.replicas > 1:
+        generate_replicates(nexus, args.replicas, modelo, carpeta or '.', arbol, seed=args.semilla)
+    else:
+        generate_beast_xml_thesis(nexus, modelo, salida, initial_tree=arbol)
+
+
+def cmd_diagnose(args, rutas):
+    import subprocess
+    script = os.path.join(DIRECTORIO, '04_diagnose_convergence.R')
+    try:
+        resultado = subprocess.run([args.rscript, script, args.log])
+    except FileNotFoundError:
+        sys.exit(f"❌ No se encontró {args.rscript} (R es necesario para diagnose)")
+    sys.exit(resultado.returncode)
+
+
+def delegar(subcomando, resto):
+    """Ejecuta main() del script con su propia línea de comandos"""
+    import importlib
+    modulo = importlib.import_module(DELEGADOS[subcomando][0])
+    sys.argv = [f"conocarpus {subcomando}"] + list(resto)
+    return modulo.main()
+
+
+# ============================================================================
+# LÍNEA DE COMANDOS
+# ============================================================================
+
+def construir_parser():
+    parser = argparse.ArgumentParser(
+        prog='conocarpus', description="Filogenia de Combretaceae: todas las etapas del flujo")
+    parser.add_argument("--config", help="JSON con rutas (mismas claves que pipeline.py)")
+    sub = parser.add_subparsers(dest='subcomando', metavar='subcomando')
+    sub.required = True
+
+    p = sub.add_parser('download', help="Descarga de secuencias de NCBI")
+    p.add_argument("--salida", help="Carpeta de descargas")
+    p.add_argument("--email", help="Correo para NCBI Entrez")
+    p.add_argument("--api-key", help="API key de NCBI")
+    p.add_argument("--gz", action="store_true", help="Guardar las descargas como .fasta.gz")
+    p.set_defaults(funcion=cmd_download)
+
+    for nombre, ayuda, funcion in (
+            ('clean', "Limpieza y curación de FASTA descargados", cmd_clean),
+            ('consolidate', "Multi-FASTA por marcador para MAFFT", cmd_consolidate)):
+        p = sub.add_parser(nombre, help=ayuda)
+        p.add_argument("--entrada", help="Carpeta de entrada")
+        p.add_argument("--salida", help="Carpeta de salida")
+        p.add_argument("--marcador", action='append', help="Solo estos marcadores")
+        p.set_defaults(funcion=funcion)
+
+    p = sub.add_parser('supermatrix', help="Concatenar alineamientos por marcador")
+    p.add_argument("--entrada", help="Carpeta de alineamientos")
+    p.add_argument("--salida", help="Carpeta de la supermatriz")
+    p.add_argument("--sufijo", default='_aligned.fasta',
+                   help="Sufijo de los archivos (p. ej. _trimmed.fasta)")
+    p.add_argument("--marcador", action='append', help="Solo estos marcadores (en orden)")
+    p.set_defaults(funcion=cmd_supermatrix)
+
+    p = sub.add_parser('convert', help="Convertir matrices entre FASTA, NEXUS y TNT")
+    p.add_argument("entrada")
+    p.add_argument("salida", help="Formato según la extensión (.tnt, .nex, .fasta)")
+    p.set_defaults(funcion=cmd_convert)
+
+    p = sub.add_parser('beast-xml', help="Generar el XML de BEAST 2")
+    p.add_argument("nexus", nargs='?', help="NEXUS de datos (defecto: supermatriz.nex)")
+    p.add_argument("--modelo", help="Modelo (GTR+I+G) o JSON de seleccion_modelos.py")
+    p.add_argument("--salida", help="XML de salida")
+    p.add_argument("--arbol-inicial", metavar="upgma|NWK",
+                   help="Árbol inicial fijo: 'upgma' (calibrado, arboles_rapidos.py) o un Newick")
+    p.add_argument("--replicas", type=int, default=1,
+                   help="N XML réplicas (cadenas de 50M/N, semillas distintas) en la carpeta de --salida")
+    p.add_argument("--semilla", type=int, help="Semilla para sortear las semillas de las réplicas")
+    p.set_defaults(funcion=cmd_beast_xml)
+
+    p = sub.add_parser('diagnose', help="Diagnóstico de convergencia (ESS) de una traza")
+    p.add_argument("log", help="Traza .log de BEAST")
+    p.add_argument("--rscript", default='Rscript')
+    p.set_defaults(funcion=cmd_diagnose)
+
+    for nombre, (_, ayuda) in DELEGADOS.items():
+        sub.add_parser(nombre, help=ayuda, add_help=False)
+    return parser
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    parser = construir_parser()
+
+    # Los delegados reciben todo lo que sigue al subcomando sin interpretarlo
+    # (--config no se aplica: cada script tiene sus propios argumentos)
+    for i, valor in enumerate(argv):
+        if valor in DELEGADOS:
+            return delegar(valor, argv[i + 1:])
+        if not valor.startswith('-') and (i == 0 or argv[i - 1] != '--config'):
+            break
+
+    args = parser.parse_args(argv)
+    return args.funcion(args, cargar_rutas(args.config))
+
+
+if __name__ == "__main__":
+    main()
@@ -13,6 +13,9 @@ Output: alineamiento_input/*.fasta (5 archivos multi-FASTA)
 from pathlib import Path
 from collections import defaultdict
 
+import instrumentacion as inst
+from archivos import abrir, listar, nombre_base
+
 # ============================================================================
 # CONFIGURACIÓN
 # ============================================================================
@@ -23,10 +26,19 @@ MARCADORES = ['ITS', 'matK', 'rbcL', 'psaA-ycf3', 'trnH-psbA']
 # FUNCIÓN PRINCIPAL
 # ============================================================================
 
-def main():
-    input_dir = Path("fastas_individuales_curados")
-    output_dir = Path("alineamiento_input")
-    output_dir.mkdir(exist_ok=True)
+@inst.etapa('consolidacion')
+def main(input_dir="fastas_individuales_curados", output_dir="alineamiento_input",
+         marcadores=None):
+    """
+    Args:
+        input_dir: carpeta de FASTA individuales (salida de limpiar_fastas)
+        output_dir: carpeta de multi-FASTA por marcador
+        marcadores: limitar a estos marcadores (defecto: MARCADORES)
+    """
+    input_dir = Path(input_dir)
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    marcadores = list(marcadores or MARCADORES)
     
     print("=" * 80)
     print("📦 CONSOLIDACIÓN DE FASTAS PARA MAFFT")
@@ -42,15 +54,15 @@ def main():
     # Agrupar archivos por marcador
     archivos_por_marcador = defaultdict(list)
     
-    for archivo in sorted(input_dir.glob("*.fasta")):
-        # Formato: Especie_nombre_marcador.fasta
-        marcador = archivo.stem.split('_')[-1]
+    for archivo in listar(input_dir, "*.fasta"):
+        # Formato: Especie_nombre_marcador.fasta (o .fasta.gz)
+        marcador = nombre_base(archivo).split('_')[-1]
         
-        if marcador in MARCADORES:
+        if marcador in marcadores:
             archivos_por_marcador[marcador].append(archivo)
     
     # Consolidar cada marcador en un multi-FASTA
-    for marcador in MARCADORES:
+    for marcador in marcadores:
         archivos = archivos_por_marcador[marcador]
         
         if not archivos:
@@ -61,10 +73,10 @@ def main():
         n_secuencias = 0
         longitudes = []
         
-        with open(output_file, 'w') as out_f:
+        with abrir(output_file, 'w') as out_f:
             for archivo in sorted(archivos):
                 # Leer contenido completo del archivo
-                with open(archivo, 'r') as in_f:
+                with abrir(archivo, 'r') as in_f:
                     contenido = in_f.read()
                     
                     # Escribir al archivo consolidado
@@ -80,6 +92,9 @@ def main():
                         longitud = sum(len(line) for line in seq_lines)
                         longitudes.append(longitud)
         
+        inst.incrementar('secuencias_escritas', n_secuencias, etapa='consolidacion',
+                         marcador=marcador)
+        
         # Estadísticas
         if longitudes:
             min_len = min(longitudes)
@@ -97,13 +112,9 @@ def main():
     print(f"\n📁 Archivos generados en: {output_dir}/\n")
     
     # Instrucciones para siguiente paso
-    print("🔬 SIGUIENTE PASO - ALINEAMIENTO CON MAFFT:")
+    print("🔬 SIGUIENTE PASO - ALINEAMIENTO CON MAFFT (todos los marcadores en paralelo):")
     print("-" * 80)
-    print("cd alineamiento_input/\n")
-    
-    for marcador in MARCADORES:
-        if archivos_por_marcador[marcador]:
-            print(f"mafft --maxiterate 1000 --localpair {marcador}_all.fasta > {marcador}_aligned.fasta")
+    print(f"python alinear_marcadores.py {output_dir} alineamientos")
     
     print("\n" + "=" * 80 + "\n")
 
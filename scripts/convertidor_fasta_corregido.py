@@ -4,6 +4,9 @@ Script para convertir archivos FASTA a formato TNT
 Versión corregida - sin errores de taxnames
 """
 
+from archivos import abrir
+
+
 def fasta_to_tnt(input_fasta, output_tnt):
     """
     Convierte un archivo FASTA a formato TNT para análisis filogenético
@@ -16,7 +19,7 @@ def fasta_to_tnt(input_fasta, output_tnt):
     current_seq = ""
     
     # Leer el archivo FASTA
-    with open(input_fasta, 'r') as f:
+    with abrir(input_fasta, 'r') as f:
         for line in f:
             line = line.strip()
             if line.startswith(">"):
@@ -38,8 +41,13 @@ def fasta_to_tnt(input_fasta, output_tnt):
         if current_seq:
             taxa[-1] = (taxa[-1][0], current_seq)
 
+    # TNT declara un único número de caracteres: las secuencias deben estar alineadas
+    longitudes = {len(seq) for _, seq in taxa}
+    if len(longitudes) > 1:
+        raise ValueError(f"Secuencias de longitud desigual: {sorted(longitudes)}")
+
     # Escribir el archivo TNT
-    with open(output_tnt, 'w') as f:
+    with abrir(output_tnt, 'w') as f:
         # Definir el tipo de datos
         f.write("nstates dna;\n")
         
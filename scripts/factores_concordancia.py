@@ -0,0 +1,483 @@
+#!/usr/bin/env python3
+"""
+FACTORES DE CONCORDANCIA gCF / sCF - PROYECTO MANGLARES COMBRETACEAE
+====================================================================
+Propósito: Medir el conflicto entre marcadores (ITS nuclear vs. los cuatro
+          de cloroplasto) que la supermatriz esconde, rama por rama de un
+          árbol de referencia (p. ej. combretaceae_mrbayes.con.tre).
+
+Método (Minh, Hahn & Lanfear 2020, versión de parsimonia de IQ-TREE):
+  - Cada rama interna separa cuatro clados A, B | C, D (en una politomía,
+    B / D agrupan a los hermanos restantes).
+  - gCF: fracción de árboles de genes decisivos (con al menos un taxón de
+    cada clado) que contienen la bipartición restringida a sus taxones.
+    gDF1 y gDF2 son las dos alternativas NNI (AC|BD y AD|BC) y gDFP el
+    resto (parafilia).
+  - sCF: se muestrean cuartetos (a, b, c, d), uno por clado (todos si hay
+    menos que --cuartetos); un sitio es decisivo si los cuatro tienen base
+    no ambigua y el patrón es xxyy. sCF = media, sobre los cuartetos con
+    algún sitio decisivo, de la fracción de sitios a favor de ab|cd.
+    Los cuartetos × sitios se evalúan como matrices booleanas y se suman
+    por marcador con np.add.reduceat; las ramas se reparten entre procesos.
+  - Sin --arboles-genes, los árboles de genes se infieren con NJ (K2P)
+    sobre cada alineamiento (arboles_rapidos.py); las ramas internas de
+    longitud <= max(1e-6, 0.5 / sitios) (sin ningún cambio que las
+    sostenga; NJ reparte longitudes positivas al desempatar) se colapsan
+    en politomías, y un marcador sin ninguna rama interna restante (p. ej.
+    constante) no cuenta como árbol de genes.
+
+Entradas: alineamientos por marcador (el marcador sale del nombre:
+ITS_aligned.fasta, ITS_trimmed.fasta o ITS_all.fasta → ITS), ya alineados.
+
+Salidas: TSV por rama y árbol Newick con etiquetas "gCF/sCF" en los nodos.
+
+Uso:
+    python factores_concordancia.py combretaceae_mrbayes.con.tre alineamientos/*_aligned.fasta
+    python factores_concordancia.py ref.tre alineamientos/*.fasta --arboles-genes ITS=its.tre \\
+        --cuartetos 200 --procesos 4 --tabla cf.tsv --arbol cf.tree
+"""
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from alineamientos import BASES, codificar, concatenar
+from archivos import abrir, nombre_base
+from arboles_nexus import a_newick, asignar_mascaras, iterar_arboles, parsear_newick
+
+# ============================================================================
+# CONFIGURACIÓN
+# ============================================================================
+
+CUARTETOS = 100
+SEMILLA = 1
+BLOQUE_CUARTETOS = 256   # cuartetos por bloque (memoria: bloque × sitios bytes)
+SUFIJOS = ('_aligned', '_trimmed', '_all')
+CLADO_INTERES = ('Laguncularia_racemosa', 'Conocarpus_erectus')
+RAMA_MINIMA = 1e-6       # ramas NJ más cortas se colapsan (como IQ-TREE)
+MEDIO_CAMBIO = 0.5       # ... o más cortas que medio cambio por alineamiento
+
+# ============================================================================
+# ÁRBOLES Y BIPARTICIONES
+# ============================================================================
+
+def nombre_marcador(ruta):
+    base = nombre_base(ruta)
+    for sufijo in SUFIJOS:
+        if base.endswith(sufijo):
+            return base[:-len(sufijo)]
+    return base
+
+
+def leer_arboles(ruta):
+    """Árboles (Nodo) de un archivo NEXUS/Newick, con la tabla translate aplicada"""
+    return [parsear_newick(newick, traduccion) for _, newick, traduccion in iterar_arboles(ruta)]
+
+
+def _canonica(mascara, conjunto):
+    """Lado de la bipartición que no contiene al taxón más bajo del conjunto"""
+    menor = conjunto & -conjunto
+    return conjunto ^ mascara if mascara & menor else mascara
+
+
+def _bits(mascara):
+    """Índices de los bits encendidos de una máscara"""
+    indices = []
+    i = 0
+    while mascara:
+        if mascara & 1:
+            indices.append(i)
+        mascara >>= 1
+        i += 1
+    return indices
+
+
+def ramas_internas(raiz, indice):
+    """
+    Ramas internas del árbol de referencia con sus cuatro clados
+
+    Returns:
+        lista de dict con 'id', 'nodo', 'mascara' (lado inferior) y
+        'clados' (A, B, C, D) como máscaras
+    """
+    asignar_mascaras(raiz, indice)
+    completo = (1 << len(indice)) - 1
+    ramas = []
+    vistas = set()
+    for nodo in raiz.preorden():
+        if nodo is raiz or not nodo.hijos:
+            continue
+        padre = nodo.padre
+        izquierda = [h.mascara for h in nodo.hijos]
+        derecha = [h.mascara for h in padre.hijos if h is not nodo]
+        if padre is not raiz:
+            derecha.append(completo ^ padre.mascara)
+        elif len(derecha) == 1:
+            # Raíz bifurcada: la rama continúa hacia los hijos del hermano
+            hermano = next(h for h in padre.hijos if h is not nodo)
+            derecha = [h.mascara for h in hermano.hijos]
+        if len(izquierda) < 2 or len(derecha) < 2:
+            continue
+        split = _canonica(nodo.mascara, completo)
+        if split in vistas:
+            continue
+        vistas.add(split)
+        a, b = izquierda[0], _union(izquierda[1:])
+        c, d = derecha[0], _union(derecha[1:])
+        ramas.append({'id': len(ramas) + 1, 'nodo': nodo, 'mascara': nodo.mascara,
+                      'clados': (a, b, c, d)})
+    return ramas
+
+
+def _union(mascaras):
+    total = 0
+    for m in mascaras:
+        total |= m
+    return total
+
+
+def splits_gen(raiz, indice):
+    """(taxones del árbol como máscara, biparticiones canónicas)"""
+    hojas = [h for h in raiz.hojas() if h.nombre in indice]
+    if len(hojas) != len(raiz.hojas()):
+        faltan = sorted(h.nombre for h in raiz.hojas() if h.nombre not in indice)
+        raise ValueError(f"Taxones del árbol de genes ausentes en la referencia: {', '.join(faltan[:5])}")
+    asignar_mascaras(raiz, indice)
+    conjunto = raiz.mascara
+    splits = set()
+    for nodo in raiz.preorden():
+        if nodo.hijos and nodo is not raiz:
+            splits.add(_canonica(nodo.mascara, conjunto))
+    return conjunto, splits
+
+
+# ============================================================================
+# gCF
+# ============================================================================
+
+def factores_genes(ramas, genes):
+    """
+    Args:
+        ramas: ramas_internas()
+        genes: [(etiqueta, (conjunto, splits))]
+
+    Returns:
+        {id: {'gN', 'gCF', 'gDF1', 'gDF2', 'gDFP', 'concordantes'}} (en %)
+    """
+    resultado = {}
+    for rama in ramas:
+        a, b, c, d = rama['clados']
+        conteo = {'gCF': 0, 'gDF1': 0, 'gDF2': 0, 'gDFP': 0}
+        concordantes = []
+        decisivos = 0
+        for etiqueta, (conjunto, splits) in genes:
+            if not (a & conjunto and b & conjunto and c & conjunto and d & conjunto):
+                continue
+            decisivos += 1
+            if _canonica((a | b) & conjunto, conjunto) in splits:
+                conteo['gCF'] += 1
+                concordantes.append(etiqueta)
+            elif _canonica((a | c) & conjunto, conjunto) in splits:
+                conteo['gDF1'] += 1
+            elif _canonica((a | d) & conjunto, conjunto) in splits:
+                conteo['gDF2'] += 1
+            else:
+                conteo['gDFP'] += 1
+        fila = {k: (100.0 * v / decisivos if decisivos else float('nan'))
+                for k, v in conteo.items()}
+        fila['gN'] = decisivos
+        fila['concordantes'] = concordantes
+        resultado[rama['id']] = fila
+    return resultado
+
+
+# ============================================================================
+# sCF
+# ============================================================================
+
+_CODIGOS = None
+_CORTES = None
+
+
+def _iniciar_trabajador(codigos, cortes):
+    global _CODIGOS, _CORTES
+    _CODIGOS = codigos
+    _CORTES = cortes
+
+
+def muestrear_cuartetos(clados, n_cuartetos, rng):
+    """
+    Cuartetos (4, Q) con un taxón de cada clado: todos si hay <= n_cuartetos
+    combinaciones, si no una muestra uniforme con reemplazo
+    """
+    indices = [np.array(_bits(m), dtype=np.int64) for m in clados]
+    total = 1
+    for arreglo in indices:
+        total *= len(arreglo)
+    if total <= n_cuartetos:
+        malla = np.meshgrid(*indices, indexing='ij')
+        return np.stack([m.ravel() for m in malla])
+    return np.stack([arreglo[rng.integers(0, len(arreglo), n_cuartetos)] for arreglo in indices])
+
+
+def soporte_sitios(codigos, cuartetos, cortes):
+    """
+    Sitios a favor de ab|cd, ac|bd y ad|bc por cuarteto y marcador
+
+    Args:
+        codigos: matriz uint8 (taxones × sitios)
+        cuartetos: (4, Q) índices de filas
+        cortes: inicio de cada marcador en las columnas (para reduceat)
+
+    Returns:
+        arreglo (Q, marcadores, 3) int64
+    """
+    q = cuartetos.shape[1]
+    resultado = np.empty((q, len(cortes), 3), dtype=np.int64)
+    for inicio in range(0, q, BLOQUE_CUARTETOS):
+        bloque = cuartetos[:, inicio:inicio + BLOQUE_CUARTETOS]
+        a, b, c, d = (codigos[fila] for fila in bloque)
+        validos = np.isin(a, BASES) & np.isin(b, BASES) & np.isin(c, BASES) & np.isin(d, BASES)
+        ab, cd, ac, bd, ad, bc = a == b, c == d, a == c, b == d, a == d, b == c
+        for k, (uno, dos, distinto) in enumerate(((ab, cd, ac), (ac, bd, ab), (ad, bc, ab))):
+            sitios = (uno & dos & ~distinto & validos).view(np.uint8)
+            resultado[inicio:inicio + bloque.shape[1], :, k] = np.add.reduceat(
+                sitios, cortes, axis=1, dtype=np.int64)
+    return resultado
+
+
+def _sitios_rama(args):
+    id_, clados, n_cuartetos, semilla = args
+    rng = np.random.default_rng(np.random.SeedSequence([semilla, id_]))
+    cuartetos = muestrear_cuartetos(clados, n_cuartetos, rng)
+    return id_, soporte_sitios(_CODIGOS, cuartetos, _CORTES)
+
+
+def _resumir_sitios(soporte):
+    """sCF, sDF1, sDF2 (%) y sN de un arreglo (Q, 3)"""
+    decisivos = soporte.sum(axis=1)
+    con_datos = decisivos > 0
+    if not con_datos.any():
+        return {'sCF': float('nan'), 'sDF1': float('nan'), 'sDF2': float('nan'), 'sN': 0.0}
+    fracciones = soporte[con_datos] / decisivos[con_datos, None]
+    media = 100.0 * fracciones.mean(axis=0)
+    return {'sCF': media[0], 'sDF1': media[1], 'sDF2': media[2],
+            'sN': float(decisivos.mean())}
+
+
+def factores_sitios(ramas, codigos, cortes, marcadores, n_cuartetos=CUARTETOS,
+                    semilla=SEMILLA, procesos=1):
+    """
+    Returns:
+        {id: {'sCF', 'sDF1', 'sDF2', 'sN', 'por_marcador': {marcador: {...}}}}
+    """
+    tareas = [(r['id'], r['clados'], n_cuartetos, semilla) for r in ramas]
+    cortes = np.asarray(cortes, dtype=np.int64)
+    if procesos > 1 and len(tareas) > 1:
+        with ProcessPoolExecutor(procesos, initializer=_iniciar_trabajador,
+                                 initargs=(codigos, cortes)) as pool:
+            resultados = list(pool.map(_sitios_rama, tareas))
+    else:
+        _iniciar_trabajador(codigos, cortes)
+        resultados = [_sitios_rama(t) for t in tareas]
+
+    salida = {}
+    for id_, soporte in resultados:
+        fila = _resumir_sitios(soporte.sum(axis=1))
+        fila['por_marcador'] = {m: _resumir_sitios(soporte[:, k])
+                                for k, m in enumerate(marcadores)}
+        salida[id_] = fila
+    return salida
+
+
+# ============================================================================
+# ÁRBOLES DE GENES POR NJ
+# ============================================================================
+
+def colapsar_ramas(raiz, minima=RAMA_MINIMA):
+    """
+    Colapsa las ramas internas de longitud <= minima (los hijos pasan al
+    padre); retorna la cantidad de ramas internas que quedan
+    """
+    restantes = 0
+    for nodo in list(raiz.postorden()):
+        if nodo is raiz or not nodo.hijos:
+            continue
+        if (nodo.longitud or 0.0) > minima:
+            restantes += 1
+            continue
+        padre = nodo.padre
+        posicion = padre.hijos.index(nodo)
+        for hijo in nodo.hijos:
+            hijo.padre = padre
+            if hijo.longitud is not None:
+                hijo.longitud += nodo.longitud or 0.0
+        padre.hijos[posicion:posicion + 1] = nodo.hijos
+    return restantes
+
+
+def arbol_nj(nombres, codigos):
+    """
+    Árbol NJ (K2P, distancias como en arboles_rapidos.distancias_codificadas)
+    de los taxones con datos, con las ramas sin cambios colapsadas; None si
+    hay menos de 4 taxones o no queda ninguna rama interna (el marcador no
+    es decisivo para ninguna rama)
+    """
+    from arboles_rapidos import distancias_codificadas, neighbor_joining
+    presentes, distancias = distancias_codificadas(nombres, codigos)
+    if len(presentes) < 4:
+        return None
+    arbol = neighbor_joining(distancias, presentes)
+    minima = max(RAMA_MINIMA, MEDIO_CAMBIO / codigos.shape[1])
+    return arbol if colapsar_ramas(arbol, minima) else None
+
+
+# ============================================================================
+# ANÁLISIS COMPLETO
+# ============================================================================
+
+def concordancia(referencia, alineamientos, arboles_genes=None, n_cuartetos=CUARTETOS,
+                 semilla=SEMILLA, procesos=1):
+    """
+    Args:
+        referencia: Nodo raíz del árbol de referencia
+        alineamientos: {marcador: ruta} de alineamientos por marcador
+        arboles_genes: [(etiqueta, Nodo)] o None para inferirlos por NJ
+
+    Returns:
+        (ramas, gcf, scf, taxa, marcadores, taxones sin secuencias)
+    """
+    taxa = [h.nombre for h in referencia.hojas()]
+    indice = {nombre: i for i, nombre in enumerate(taxa)}
+    ramas = ramas_internas(referencia, indice)
+
+    nombres, secuencias, particiones = concatenar(alineamientos)
+    filas = {nombre: seq for nombre, seq in zip(nombres, secuencias)}
+    largo = len(secuencias[0])
+    ausentes = [t for t in taxa if t not in filas]
+    if len(ausentes) == len(taxa):
+        raise ValueError("Ningún taxón del árbol de referencia está en los alineamientos")
+    _, codigos = codificar([(t, filas.get(t, '?' * largo)) for t in taxa])
+    cortes = [inicio - 1 for _, inicio, _ in particiones]
+    marcadores = [m for m, _, _ in particiones]
+
+    if arboles_genes is None:
+        arboles_genes = []
+        for marcador, inicio, fin in particiones:
+            arbol = arbol_nj(taxa, codigos[:, inicio - 1:fin])
+            if arbol is not None:
+                arboles_genes.append((marcador, arbol))
+    genes = [(etiqueta, splits_gen(arbol, indice)) for etiqueta, arbol in arboles_genes]
+
+    gcf = factores_genes(ramas, genes)
+    scf = factores_sitios(ramas, codigos, cortes, marcadores, n_cuartetos, semilla, procesos)
+    return ramas, gcf, scf, taxa, marcadores, ausentes
+
+
+def escribir_tabla(ruta, ramas, gcf, scf, taxa, marcadores):
+    """TSV por rama: factores globales, sCF por marcador y genes concordantes"""
+    with abrir(ruta, 'w') as f:
+        columnas = ['id', 'n_taxones', 'gCF', 'gN', 'gDF1', 'gDF2', 'gDFP',
+                    'sCF', 'sN', 'sDF1', 'sDF2'] + [f"sCF_{m}" for m in marcadores]
+        f.write('\t'.join(columnas + ['genes_concordantes', 'clado']) + '\n')
+        for rama in ramas:
+            g, s = gcf[rama['id']], scf[rama['id']]
+            clado = [taxa[i] for i in _bits(rama['mascara'])]
+            valores = [rama['id'], len(clado)]
+            valores += [f"{g[k]:.1f}" if k != 'gN' else g[k]
+                        for k in ('gCF', 'gN', 'gDF1', 'gDF2', 'gDFP')]
+            valores += [f"{s[k]:.1f}" for k in ('sCF', 'sN', 'sDF1', 'sDF2')]
+            valores += [f"{s['por_marcador'][m]['sCF']:.1f}" for m in marcadores]
+            valores += [','.join(g['concordantes']) or '-', ','.join(clado)]
+            f.write('\t'.join(str(v) for v in valores) + '\n')
+
+
+def etiquetar_arbol(referencia, ramas, gcf, scf):
+    """Newick con etiquetas 'gCF/sCF' en los nodos internos evaluados"""
+    originales = {}
+    for rama in ramas:
+        g, s = gcf[rama['id']]['gCF'], scf[rama['id']]['sCF']
+        originales[rama['nodo']] = rama['nodo'].nombre
+        rama['nodo'].nombre = f"{g:.0f}/{s:.0f}".replace('nan', 'NA')
+    try:
+        return a_newick(referencia)
+    finally:
+        for nodo, nombre in originales.items():
+            nodo.nombre = nombre
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Factores de concordancia gCF / sCF por rama")
+    parser.add_argument("referencia", help="Árbol de referencia (NEXUS/Newick; se usa el primero)")
+    parser.add_argument("alineamientos", nargs='+', help="Alineamientos por marcador")
+    parser.add_argument("--arboles-genes", action='append',
+                        help="[MARCADOR=]archivo de árboles de genes (todos sus árboles "
+                             "cuentan); defecto: NJ por marcador")
+    parser.add_argument("--cuartetos", type=int, default=CUARTETOS,
+                        help="Cuartetos por rama para sCF")
+    parser.add_argument("--semilla", type=int, default=SEMILLA)
+    parser.add_argument("--procesos", type=int, default=1)
+    parser.add_argument("--tabla", default="concordancia.tsv")
+    parser.add_argument("--arbol", default="concordancia.tree")
+    parser.add_argument("--clado", default=','.join(CLADO_INTERES),
+                        help="Taxones (separados por comas) cuyo clado se detalla")
+    args = parser.parse_args()
+
+    referencia = leer_arboles(args.referencia)[0]
+    alineamientos = {nombre_marcador(r): r for r in args.alineamientos}
+
+    arboles_genes = None
+    if args.arboles_genes:
+        arboles_genes = []
+        for valor in args.arboles_genes:
+            marcador, _, ruta = valor.rpartition('=')
+            marcador = marcador or nombre_marcador(ruta)
+            arboles = leer_arboles(ruta)
+            for i, arbol in enumerate(arboles, 1):
+                arboles_genes.append((marcador if len(arboles) == 1 else f"{marcador}_{i}", arbol))
+
+    print("=" * 80)
+    print("🌿 FACTORES DE CONCORDANCIA (gCF / sCF)")
+    print("=" * 80)
+    print(f"\n📁 Referencia: {args.referencia}")
+    print(f"   Marcadores: {', '.join(alineamientos)}")
+    print(f"   Árboles de genes: {'NJ por marcador' if arboles_genes is None else len(arboles_genes)}"
+          f"  |  {args.cuartetos} cuartetos por rama\n")
+
+    ramas, gcf, scf, taxa, marcadores, ausentes = concordancia(
+        referencia, alineamientos, arboles_genes, args.cuartetos, args.semilla, args.procesos)
+    if ausentes:
+        print(f"⚠️  Sin secuencias en los alineamientos: {', '.join(ausentes)}\n")
+
+    print(f"{'rama':>5} {'taxa':>5} {'gCF':>6} {'gN':>3} {'sCF':>6} {'sN':>7}  " +
+          ' '.join(f"{m[:9]:>9}" for m in marcadores))
+    for rama in ramas:
+        g, s = gcf[rama['id']], scf[rama['id']]
+        print(f"{rama['id']:5} {len(_bits(rama['mascara'])):5} {g['gCF']:6.1f} {g['gN']:3} "
+              f"{s['sCF']:6.1f} {s['sN']:7.1f}  " +
+              ' '.join(f"{s['por_marcador'][m]['sCF']:9.1f}" for m in marcadores))
+
+    # Clado de interés: la rama más pequeña que contiene a todos sus taxones
+    interes = [t for t in args.clado.split(',') if t in taxa]
+    if interes:
+        objetivo = _union(1 << taxa.index(t) for t in interes)
+        candidatas = [r for r in ramas if r['mascara'] & objetivo == objetivo]
+        if candidatas:
+            rama = min(candidatas, key=lambda r: bin(r['mascara']).count('1'))
+            g, s = gcf[rama['id']], scf[rama['id']]
+            print(f"\n🔎 Clado mínimo con {' + '.join(interes)} (rama {rama['id']}, "
+                  f"{len(_bits(rama['mascara']))} taxones):")
+            print(f"   gCF {g['gCF']:.1f}% ({g['gN']} genes decisivos; concordantes: "
+                  f"{', '.join(g['concordantes']) or 'ninguno'})")
+            print(f"   sCF {s['sCF']:.1f}%  sDF1 {s['sDF1']:.1f}%  sDF2 {s['sDF2']:.1f}%")
+
+    escribir_tabla(args.tabla, ramas, gcf, scf, taxa, marcadores)
+    with abrir(args.arbol, 'w') as f:
+        f.write(etiquetar_arbol(referencia, ramas, gcf, scf) + '\n')
+    print(f"\n✅ Tabla: {args.tabla}")
+    print(f"✅ Árbol gCF/sCF: {args.arbol}")
+
+
+if __name__ == "__main__":
+    main()
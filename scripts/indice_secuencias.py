@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+ÍNDICE DE SECUENCIAS DUPLICADAS - PROYECTO MANGLARES COMBRETACEAE
+=================================================================
+Propósito: GenBank devuelve muchos registros idénticos para el mismo locus
+          (reenvíos, lotes de barcoding). El índice asocia el hash de cada
+          secuencia normalizada con las accesiones y especies que la
+          tienen, para:
+            - colapsar duplicados antes de calcular_score (limpiar_fastas),
+            - no volver a medir ni puntuar secuencias ya vistas en corridas
+              anteriores (el score de calcular_score se guarda por hash y
+              descripción del header),
+            - marcar secuencias idénticas en especies distintas (casi
+              siempre una identificación errónea en GenBank).
+
+Formato: un JSON por marcador (<carpeta>/<marcador>.json):
+    secuencias  {hash: {longitud, ambiguas}}
+    especies    {especie: [[accesion, hash], ...]}
+    scores      {"hash descripción": score}
+    huella_scores  huella de la configuración de calcular_score; si cambia,
+                   los scores guardados se descartan
+Al volver a procesar el archivo de una especie, sus registros anteriores se
+reemplazan (las accesiones retiradas de GenBank no quedan colgadas), y las
+especies cuyo archivo ya no está en la entrada se podan antes de guardar.
+
+Normalización: mayúsculas, sin espacios ni gaps ('-', '.'), U → T.
+Hash: BLAKE2b de 128 bits.
+
+Uso:
+    python indice_secuencias.py combretaceae_sequences_final
+    python indice_secuencias.py combretaceae_sequences_final --tsv compartidas.tsv
+"""
+
+import argparse
+import hashlib
+import json
+import os
+
+from archivos import abrir, listar, nombre_base
+
+# ============================================================================
+# CONFIGURACIÓN
+# ============================================================================
+
+AMBIGUAS = 'NYRSWKMBDHV'
+_QUITAR = str.maketrans('', '', ' \t\r\n-.')
+
+# ============================================================================
+# HASH
+# ============================================================================
+
+def normalizar(secuencia):
+    return secuencia.upper().translate(_QUITAR).replace('U', 'T')
+
+
+def huella(secuencia):
+    """Hash hexadecimal (32 caracteres) de la secuencia normalizada"""
+    return hashlib.blake2b(normalizar(secuencia).encode('ascii', 'replace'),
+                           digest_size=16).hexdigest()
+
+
+def accesion(header):
+    """Primera palabra del header FASTA (sin '>')"""
+    partes = header.lstrip('>').split(None, 1)
+    return partes[0] if partes else ''
+
+
+# ============================================================================
+# ÍNDICE
+# ============================================================================
+
+class IndiceSecuencias:
+    """Índice hash -> (longitud, ambiguas) y especie -> [(accesión, hash)] de un marcador"""
+
+    def __init__(self, ruta=None, marcador=None, huella_scores=None):
+        self.ruta = ruta
+        self.marcador = marcador
+        self.huella_scores = huella_scores
+        self.secuencias = {}
+        self.especies = {}
+        self.scores = {}
+        self.nuevas = 0
+        self.reutilizadas = 0
+        self.scores_reutilizados = 0
+        if ruta and os.path.exists(ruta):
+            with open(ruta) as f:
+                datos = json.load(f)
+            self.secuencias = datos.get('secuencias', {})
+            self.especies = datos.get('especies', {})
+            if huella_scores is None:
+                # Quien no puntúa (indexar_carpeta) conserva los scores tal cual
+                self.huella_scores = datos.get('huella_scores')
+                self.scores = datos.get('scores', {})
+            elif datos.get('huella_scores') == huella_scores:
+                self.scores = datos.get('scores', {})
+
+    def reiniciar_especie(self, especie):
+        """Olvida los registros previos de la especie (se vuelve a leer su archivo)"""
+        self.especies[especie] = []
+
+    def registrar(self, secuencia, acc, especie):
+        """
+        Registra una secuencia (ya en mayúsculas y sin espacios)
+
+        Returns:
+            (hash, info) con info = {'longitud', 'ambiguas'}; si el hash ya
+            estaba en el índice no se vuelve a medir
+        """
+        h = huella(secuencia)
+        info = self.secuencias.get(h)
+        if info is None:
+            info = {'longitud': len(secuencia),
+                    'ambiguas': sum(secuencia.count(base) for base in AMBIGUAS)}
+            self.secuencias[h] = info
+            self.nuevas += 1
+        else:
+            self.reutilizadas += 1
+        self.especies.setdefault(especie, []).append([acc, h])
+        return h, info
+
+    def score(self, h, descripcion, calcular):
+        """
+        Score de la secuencia `h` con esa descripción de header; calcular()
+        solo se llama si no está guardado de una corrida anterior
+        """
+        clave = f"{h} {descripcion}"
+        valor = self.scores.get(clave)
+        if valor is None:
+            valor = self.scores[clave] = calcular()
+        else:
+            self.scores_reutilizados += 1
+        return valor
+
+    def podar(self, especies):
+        """Olvida las especies que no están en `especies`; retorna cuántas se quitaron"""
+        ausentes = [e for e in self.especies if e not in especies]
+        for especie in ausentes:
+            del self.especies[especie]
+        return len(ausentes)
+
+    def por_hash(self):
+        """{hash: {especie: [accesiones]}}"""
+        inverso = {}
+        for especie, registros in self.especies.items():
+            for acc, h in registros:
+                inverso.setdefault(h, {}).setdefault(especie, []).append(acc)
+        return inverso
+
+    def compartidas(self):
+        """[(hash, {especie: [accesiones]})] de secuencias presentes en >1 especie"""
+        return [(h, especies) for h, especies in sorted(self.por_hash().items())
+                if len(especies) > 1]
+
+    def guardar(self, ruta=None):
+        """Guarda el índice (escritura atómica); descarta hashes sin registros"""
+        ruta = ruta or self.ruta
+        usados = {h for registros in self.especies.values() for _, h in registros}
+        self.secuencias = {h: i for h, i in self.secuencias.items() if h in usados}
+        self.scores = {c: v for c, v in self.scores.items() if c.split(' ', 1)[0] in usados}
+        carpeta = os.path.dirname(ruta)
+        if carpeta:
+            os.makedirs(carpeta, exist_ok=True)
+        temporal = f"{ruta}.{os.getpid()}.tmp"
+        with open(temporal, 'w') as f:
+            json.dump({'version': 1, 'marcador': self.marcador,
+                       'secuencias': self.secuencias, 'especies': self.especies,
+                       'scores': self.scores, 'huella_scores': self.huella_scores},
+                      f, sort_keys=True)
+        os.replace(temporal, ruta)
+
+
+def ruta_indice(carpeta, marcador):
+    return os.path.join(carpeta, f"{marcador}.json")
+
+
+def reportar_compartidas(indice, maximo=20):
+    """Imprime las secuencias idénticas entre especies; retorna cuántas hay"""
+    compartidas = indice.compartidas()
+    if compartidas:
+        print(f"\n⚠️  {indice.marcador}: {len(compartidas)} secuencia(s) idéntica(s) en "
+              f"especies distintas (¿identificación errónea?)")
+        for h, especies in compartidas[:maximo]:
+            detalle = '; '.join(f"{e} ({', '.join(sorted(a))})"
+                                for e, a in sorted(especies.items()))
+            print(f"   {h[:12]}  {detalle}")
+        if len(compartidas) > maximo:
+            print(f"   ... y {len(compartidas) - maximo} más")
+    return len(compartidas)
+
+
+def escribir_tsv(ruta, indices):
+    """TSV con una fila por (hash, especie) de las secuencias compartidas"""
+    with abrir(ruta, 'w') as f:
+        f.write("marcador\thash\tlongitud\tespecie\taccesiones\n")
+        for indice in indices:
+            for h, especies in indice.compartidas():
+                longitud = indice.secuencias[h]['longitud']
+                for especie, accs in sorted(especies.items()):
+                    f.write(f"{indice.marcador}\t{h}\t{longitud}\t{especie}\t"
+                            f"{','.join(sorted(accs))}\n")
+
+
+# ============================================================================
+# INDEXAR UNA CARPETA DE DESCARGAS
+# ============================================================================
+
+def _leer_registros(archivo):
+    """Itera (header, secuencia en mayúsculas sin espacios) de un FASTA"""
+    header = None
+    partes = []
+    with abrir(archivo, 'r', encoding='utf-8', errors='replace') as f:
+        for linea in f:
+            linea = linea.strip()
+            if not linea:
+                continue
+            if linea.startswith('>'):
+                if header is not None:
+                    yield header, ''.join(partes).upper().replace(' ', '')
+                header = linea[1:]
+                partes = []
+            else:
+                partes.append(linea)
+    if header is not None:
+        yield header, ''.join(partes).upper().replace(' ', '')
+
+
+def indexar_carpeta(entrada, carpeta_indice, marcadores=None):
+    """Indexa <entrada>/Especie_marcador.fasta(.gz); retorna {marcador: IndiceSecuencias}"""
+    indices = {}
+    vistas = {}
+    for archivo in listar(entrada, "*.fasta"):
+        partes = nombre_base(archivo).split('_')
+        if len(partes) < 2:
+            continue
+        marcador, especie = partes[-1], "_".join(partes[:-1])
+        if marcadores and marcador not in marcadores:
+            continue
+        if marcador not in indices:
+            indices[marcador] = IndiceSecuencias(ruta_indice(carpeta_indice, marcador), marcador)
+        indice = indices[marcador]
+        indice.reiniciar_especie(especie)
+        vistas.setdefault(marcador, set()).add(especie)
+        for header, secuencia in _leer_registros(archivo):
+            indice.registrar(secuencia, accesion(header), especie)
+    for marcador, indice in indices.items():
+        indice.podar(vistas[marcador])
+        indice.guardar()
+    return indices
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Índice de secuencias duplicadas por marcador")
+    parser.add_argument("entrada", nargs='?', default="combretaceae_sequences_final",
+                        help="Carpeta con Especie_marcador.fasta")
+    parser.add_argument("--indice", default=os.path.join("fastas_individuales_curados",
+                                                         ".indice_secuencias"),
+                        help="Carpeta del índice (defecto: la que usa limpiar_fastas)")
+    parser.add_argument("--marcador", action='append', help="Solo estos marcadores")
+    parser.add_argument("--tsv", help="Tabla de secuencias compartidas entre especies")
+    args = parser.parse_args()
+
+    carpeta = args.indice
+
+    print("=" * 80)
+    print("🔑 ÍNDICE DE SECUENCIAS DUPLICADAS")
+    print("=" * 80)
+    print(f"\n📁 Entrada: {args.entrada}  →  Índice: {carpeta}/\n")
+
+    indices = indexar_carpeta(args.entrada, carpeta, args.marcador)
+    for marcador, indice in sorted(indices.items()):
+        registros = sum(len(r) for r in indice.especies.values())
+        print(f"   {marcador:12} {registros:6} registros  {len(indice.secuencias):6} únicas  "
+              f"({indice.reutilizadas} ya vistas)")
+    total = sum(reportar_compartidas(indice) for _, indice in sorted(indices.items()))
+    if args.tsv:
+        escribir_tsv(args.tsv, [indices[m] for m in sorted(indices)])
+        print(f"\n✅ Tabla: {args.tsv}")
+    if not total:
+        print("\n✅ Ninguna secuencia idéntica entre especies distintas")
+
+
+if __name__ == "__main__":
+    main()
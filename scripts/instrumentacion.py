@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+INSTRUMENTACIÓN Y MÉTRICAS - PROYECTO MANGLARES COMBRETACEAE
+============================================================
+Propósito: Capa común de métricas para los scripts del flujo: temporizadores
+          por etapa y por llamada a NCBI, contadores (solicitudes,
+          reintentos, bytes descargados, registros leídos, rechazos por
+          regla de calcular_score, secuencias escritas) y pico de RSS.
+
+Salidas (se activan con variables de entorno, sin cambiar la línea de
+comandos de cada script):
+    CONOCARPUS_METRICAS_JSONL   eventos JSON por línea (se agregan al final)
+    CONOCARPUS_METRICAS_PROM    archivo de texto para el textfile collector
+                                de Prometheus (node_exporter); se reescribe
+                                de forma atómica al terminar
+    CONOCARPUS_PERFIL           'cprofile' o 'pyinstrument': perfila cada
+                                etapa
+    CONOCARPUS_PERFIL_DIR       carpeta de perfiles (defecto: perfiles/)
+
+Uso en un script (la configuración desde el entorno se aplica al importar):
+    import instrumentacion as inst
+
+    @inst.etapa('limpieza')
+    def main(): ...
+
+    with inst.etapa('limpieza', marcador='ITS'):
+        ...
+        inst.incrementar('registros_leidos', n, marcador='ITS')
+    with inst.temporizador('ncbi_llamada', operacion='esearch'):
+        ...
+"""
+
+import atexit
+import json
+import os
+import resource
+import sys
+import time
+from contextlib import contextmanager
+
+# ============================================================================
+# CONFIGURACIÓN
+# ============================================================================
+
+PREFIJO = 'conocarpus'
+
+
+class Metricas:
+    """Registro en memoria de contadores y temporizadores con etiquetas"""
+
+    def __init__(self):
+        self.contadores = {}
+        self.tiempos = {}       # clave -> [n, suma, máximo]
+        self.jsonl = None
+        self.prometheus = None
+        self.perfil = None
+        self.directorio_perfiles = 'perfiles'
+        self.script = os.path.basename(sys.argv[0]) if sys.argv and sys.argv[0] else 'python'
+        self._archivo_jsonl = None
+
+    @staticmethod
+    def _clave(nombre, etiquetas):
+        return nombre, tuple(sorted((k, str(v)) for k, v in etiquetas.items()))
+
+    def incrementar(self, nombre, valor=1, **etiquetas):
+        clave = self._clave(nombre, etiquetas)
+        self.contadores[clave] = self.contadores.get(clave, 0) + valor
+
+    def registrar_tiempo(self, nombre, segundos, **etiquetas):
+        clave = self._clave(nombre, etiquetas)
+        acumulado = self.tiempos.get(clave)
+        if acumulado is None:
+            self.tiempos[clave] = [1, segundos, segundos]
+        else:
+            acumulado[0] += 1
+            acumulado[1] += segundos
+            acumulado[2] = max(acumulado[2], segundos)
+        if self.jsonl:
+            self.evento('tiempo', nombre, segundos=round(segundos, 6), **etiquetas)
+
+    # ------------------------------------------------------------------------
+
+    def evento(self, tipo, nombre, **campos):
+        """Escribe una línea JSON (solo si CONOCARPUS_METRICAS_JSONL está activo)"""
+        if not self.jsonl:
+            return
+        if self._archivo_jsonl is None:
+            carpeta = os.path.dirname(self.jsonl)
+            if carpeta:
+                os.makedirs(carpeta, exist_ok=True)
+            self._archivo_jsonl = open(self.jsonl, 'a', buffering=1)
+        registro = {'ts': round(time.time(), 3), 'script': self.script, 'pid': os.getpid(),
+                    'tipo': tipo, 'nombre': nombre}
+        registro.update(campos)
+        self._archivo_jsonl.write(json.dumps(registro, ensure_ascii=False) + '\n')
+
+    def escribir_prometheus(self, ruta):
+        """Formato de exposición de texto de Prometheus (escritura atómica)"""
+        lineas = []
+
+        def etiquetas_texto(etiquetas):
+            todas = (('script', self.script),) + etiquetas
+            return '{' + ','.join(f'{k}="{_escapar(v)}"' for k, v in todas) + '}'
+
+        for nombre in sorted({n for n, _ in self.contadores}):
+            metrica = f"{PREFIJO}_{nombre}_total"
+            lineas.append(f"# TYPE {metrica} counter")
+            for (n, etiquetas), valor in sorted(self.contadores.items()):
+                if n == nombre:
+                    lineas.append(f"{metrica}{etiquetas_texto(etiquetas)} {valor}")
+
+        for nombre in sorted({n for n, _ in self.tiempos}):
+            metrica = f"{PREFIJO}_{nombre}_seconds"
+            lineas.append(f"# TYPE {metrica} summary")
+            for (n, etiquetas), (cuenta, suma, _) in sorted(self.tiempos.items()):
+                if n == nombre:
+                    texto = etiquetas_texto(etiquetas)
+                    lineas.append(f"{metrica}_sum{texto} {suma:.6f}")
+                    lineas.append(f"{metrica}_count{texto} {cuenta}")
+            lineas.append(f"# TYPE {metrica}_max gauge")
+            for (n, etiquetas), (_, _, maximo) in sorted(self.tiempos.items()):
+                if n == nombre:
+                    lineas.append(f"{metrica}_max{etiquetas_texto(etiquetas)} {maximo:.6f}")
+
+        metrica = f"{PREFIJO}_peak_rss_bytes"
+        lineas.append(f"# TYPE {metrica} gauge")
+        lineas.append(f"{metrica}{etiquetas_texto(())} {pico_rss_bytes()}")
+        metrica = f"{PREFIJO}_last_run_timestamp_seconds"
+        lineas.append(f"# TYPE {metrica} gauge")
+        lineas.append(f"{metrica}{etiquetas_texto(())} {time.time():.0f}")
+
+        carpeta = os.path.dirname(ruta)
+        if carpeta:
+            os.makedirs(carpeta, exist_ok=True)
+        temporal = f"{ruta}.{os.getpid()}.tmp"
+        with open(temporal, 'w') as f:
+            f.write('\n'.join(lineas) + '\n')
+        os.replace(temporal, ruta)
+
+    def finalizar(self):
+        """Vuelca contadores y pico de RSS (JSON) y escribe el archivo Prometheus"""
+        if self.jsonl:
+            for (nombre, etiquetas), valor in sorted(self.contadores.items()):
+                self.evento('contador', nombre, valor=valor, **dict(etiquetas))
+            self.evento('rss', 'pico_rss_bytes', valor=pico_rss_bytes())
+            if self._archivo_jsonl is not None:
+                self._archivo_jsonl.close()
+                self._archivo_jsonl = None
+        if self.prometheus:
+            self.escribir_prometheus(self.prometheus)
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def pico_rss_bytes():
+    # ru_maxrss: KB en Linux, bytes en macOS
+    escala = 1 if sys.platform == 'darwin' else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * escala
+
+
+# ============================================================================
+# API DEL MÓDULO (registro global)
+# ============================================================================
+
+METRICAS = Metricas()
+_configurado = False
+_perfilando = False
+
+
+def configurar(jsonl=None, prometheus=None, perfil=None, directorio_perfiles=None):
+    """
+    Activa las salidas; los argumentos omitidos se toman del entorno.
+    Se puede llamar varias veces: el volcado final se registra una sola vez.
+    """
+    global _configurado
+    m = METRICAS
+    m.jsonl = jsonl or os.environ.get('CONOCARPUS_METRICAS_JSONL') or m.jsonl
+    m.prometheus = prometheus or os.environ.get('CONOCARPUS_METRICAS_PROM') or m.prometheus
+    m.perfil = perfil or os.environ.get('CONOCARPUS_PERFIL') or m.perfil
+    m.directorio_perfiles = (directorio_perfiles or os.environ.get('CONOCARPUS_PERFIL_DIR')
+                             or m.directorio_perfiles)
+    if m.perfil not in (None, '', 'cprofile', 'pyinstrument'):
+        raise ValueError(f"Perfilador desconocido: {m.perfil} (opciones: cprofile, pyinstrument)")
+    if not _configurado and (m.jsonl or m.prometheus):
+        atexit.register(lambda: METRICAS.finalizar())
+        _configurado = True
+    return m
+
+
+def reiniciar():
+    """
+    Vacía contadores y tiempos conservando la configuración (p. ej. entre
+    etapas en un mismo proceso); no vuelca nada: llamar antes a finalizar()
+    """
+    global METRICAS
+    anterior = METRICAS
+    METRICAS = Metricas()
+    for campo in ('jsonl', 'prometheus', 'perfil', 'directorio_perfiles', 'script'):
+        setattr(METRICAS, campo, getattr(anterior, campo))
+    return METRICAS
+
+
+def incrementar(nombre, valor=1, **etiquetas):
+    METRICAS.incrementar(nombre, valor, **etiquetas)
+
+
+@contextmanager
+def temporizador(nombre, **etiquetas):
+    """Mide el bloque y lo registra como <nombre>_seconds{etiquetas}"""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        METRICAS.registrar_tiempo(nombre, time.perf_counter() - inicio, **etiquetas)
+
+
+@contextmanager
+def perfilar(nombre):
+    """
+    Perfila el bloque con cProfile o pyinstrument si CONOCARPUS_PERFIL lo pide
+    (solo el bloque más externo: los perfiladores no se pueden anidar)
+    """
+    global _perfilando
+    tipo = METRICAS.perfil
+    if not tipo or _perfilando:
+        yield
+        return
+    _perfilando = True
+    try:
+        with _perfil(tipo, nombre):
+            yield
+    finally:
+        _perfilando = False
+
+
+@contextmanager
+def _perfil(tipo, nombre):
+    os.makedirs(METRICAS.directorio_perfiles, exist_ok=True)
+    base = os.path.join(METRICAS.directorio_perfiles,
+                        f"{nombre.replace(':', '_').replace('/', '_')}_{os.getpid()}")
+
+    if tipo == 'cprofile':
+        import cProfile
+        perfil = cProfile.Profile()
+        perfil.enable()
+        try:
+            yield
+        finally:
+            perfil.disable()
+            perfil.dump_stats(base + '.prof')
+            METRICAS.evento('perfil', nombre, ruta=base + '.prof')
+        return
+
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        print("⚠️  pyinstrument no está instalado; la etapa se ejecuta sin perfil",
+              file=sys.stderr)
+        yield
+        return
+    perfil = Profiler()
+    perfil.start()
+    try:
+        yield
+    finally:
+        perfil.stop()
+        with open(base + '.html', 'w') as f:
+            f.write(perfil.output_html())
+        METRICAS.evento('perfil', nombre, ruta=base + '.html')
+
+
+@contextmanager
+def etapa(nombre, **etiquetas):
+    """Temporizador de etapa (etapa_seconds{etapa=...}) + perfil opcional"""
+    METRICAS.evento('inicio', 'etapa', etapa=nombre, **etiquetas)
+    estado = 'error'
+    try:
+        with temporizador('etapa', etapa=nombre, **etiquetas), perfilar(nombre):
+            yield
+        estado = 'ok'
+    finally:
+        METRICAS.evento('fin', 'etapa', etapa=nombre, estado=estado,
+                        pico_rss_bytes=pico_rss_bytes(), **etiquetas)
+
+
+configurar()
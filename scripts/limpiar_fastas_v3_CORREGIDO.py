@@ -9,10 +9,17 @@ PROBLEMA ANTERIOR: Generaba 5 archivos consolidados (uno por marcador).
 SOLUCIÓN: Genera ~100 archivos individuales (20 especies × 5 marcadores).
 """
 
+import hashlib
+import inspect
+import json
 import os
 from pathlib import Path
 from collections import defaultdict
 
+import instrumentacion as inst
+from archivos import abrir, listar, nombre_base
+from indice_secuencias import IndiceSecuencias, accesion, reportar_compartidas, ruta_indice
+
 # ============================================================================
 # CONFIGURACIÓN
 # ============================================================================
@@ -28,18 +35,65 @@ LONGITUD_CONFIG = {
 EXCLUIR_KEYWORDS = ['complete genome', 'whole genome', 'scaffold', 'chloroplast genome']
 PREFERIR_KEYWORDS = ['gene', 'spacer', 'internal transcribed spacer', 'partial']
 
+# Scores de descarte de calcular_score -> regla (para las métricas de rechazo)
+REGLAS_RECHAZO = {-10000: 'genoma_completo', -5000: 'muy_corta', -3000: 'muy_larga'}
+
 # ============================================================================
 # FUNCIONES
 # ============================================================================
 
-def leer_fasta(archivo):
-    """Lee archivo FASTA y retorna lista de diccionarios con header, seq, length"""
+def leer_fasta(archivo, indice=None, especie=None):
+    """
+    Lee archivo FASTA y retorna lista de diccionarios con header, seq, length
+
+    Con `indice` (IndiceSecuencias del marcador) las copias idénticas se
+    colapsan en un solo registro ('headers' lista todos sus headers) y las
+    secuencias ya vistas en corridas anteriores no se vuelven a medir.
+    """
     secuencias = []
+    por_hash = {}
+    rechazadas = 0
+    duplicadas = 0
+    
+    def agregar(header, seq_str):
+        nonlocal rechazadas, duplicadas
+        if indice is not None:
+            h, info = indice.registrar(seq_str, accesion(header), especie)
+            if h in por_hash:
+                # Copia idéntica: solo se agrega el header (None = ya rechazada)
+                duplicadas += 1
+                if por_hash[h] is None:
+                    rechazadas += 1
+                else:
+                    por_hash[h]['headers'].append(header)
+                return
+            n_ambiguous = info['ambiguas']
+        else:
+            n_ambiguous = sum(seq_str.count(base) for base in 'NYRSWKMBDHV')
+        
+        # Filtrar secuencias con >20% bases ambiguas
+        prop_ambiguous = n_ambiguous / len(seq_str) if len(seq_str) > 0 else 1.0
+        if prop_ambiguous <= 0.20:  # Máximo 20% ambiguas
+            registro = {
+                'header': header,
+                'headers': [header],
+                'seq': seq_str,
+                'length': len(seq_str)
+            }
+            secuencias.append(registro)
+            if indice is not None:
+                registro['hash'] = h
+                por_hash[h] = registro
+        else:
+            rechazadas += 1
+            if indice is not None:
+                por_hash[h] = None
+    
     header_actual = None
     seq_actual = []
     
     try:
-        with open(archivo, 'r', encoding='utf-8', errors='replace') as f:
+        with abrir(archivo, 'r', encoding='utf-8', errors='replace') as f:
             for linea in f:
                 linea = linea.strip()
                 if not linea:
@@ -48,18 +102,7 @@ def leer_fasta(archivo):
                 if linea.startswith('>'):
                     # Guardar secuencia anterior
                     if header_actual:
-                        seq_str = ''.join(seq_actual).upper().replace(' ', '')
-                        # Filtrar secuencias con >20% bases ambiguas
-                        n_ambiguous = sum(seq_str.count(base) for base in 'NYRSWKMBDHV')
-                        prop_ambiguous = n_ambiguous / len(seq_str) if len(seq_str) > 0 else 1.0
-                        
-                        if prop_ambiguous <= 0.20:  # Máximo 20% ambiguas
-                            secuencias.append({
-                                'header': header_actual,
-                                'seq': seq_str,
-                                'length': len(seq_str)
-                            })
-                    
+                        agregar(header_actual, ''.join(seq_actual).upper().replace(' ', ''))
                     header_actual = linea[1:]  # Remover '>'
                     seq_actual = []
                 else:
@@ -67,24 +110,47 @@ def leer_fasta(archivo):
             
             # Última secuencia
             if header_actual:
-                seq_str = ''.join(seq_actual).upper().replace(' ', '')
-                n_ambiguous = sum(seq_str.count(base) for base in 'NYRSWKMBDHV')
-                prop_ambiguous = n_ambiguous / len(seq_str) if len(seq_str) > 0 else 1.0
-                
-                if prop_ambiguous <= 0.20:
-                    secuencias.append({
-                        'header': header_actual,
-                        'seq': seq_str,
-                        'length': len(seq_str)
-                    })
+                agregar(header_actual, ''.join(seq_actual).upper().replace(' ', ''))
                     
     except Exception as e:
+        inst.incrementar('archivos_con_error', etapa='limpieza')
         print(f"⚠️  Error leyendo {archivo}: {e}")
         return []
     
+    inst.incrementar('registros_leidos', sum(len(s['headers']) for s in secuencias) + rechazadas)
+    if rechazadas:
+        inst.incrementar('registros_rechazados', rechazadas, regla='ambiguedad')
+    if duplicadas:
+        inst.incrementar('registros_duplicados', duplicadas)
     return secuencias
 
 
+def score_grupo(seq_info, marcador, indice=None):
+    """
+    Score de un registro colapsado: el mejor entre las descripciones
+    distintas de sus copias (el score solo depende del header y la longitud).
+    Con `indice`, el score de cada (hash, descripción) se guarda en el
+    índice y se reutiliza en las corridas siguientes.
+    """
+    descripciones = {h.split(None, 1)[1] if ' ' in h else '' for h in seq_info['headers']}
+    if indice is None:
+        if len(descripciones) <= 1:
+            return calcular_score(seq_info, marcador)
+        return max(calcular_score({'header': d, 'length': seq_info['length']}, marcador)
+                   for d in descripciones)
+    return max(indice.score(seq_info['hash'], d,
+                            lambda d=d: calcular_score({'header': d, 'length': seq_info['length']},
+                                                       marcador))
+               for d in descripciones)
+
+
+def huella_scores():
+    """Huella del código y la configuración de calcular_score (invalida los scores guardados)"""
+    contenido = json.dumps([inspect.getsource(calcular_score), LONGITUD_CONFIG,
+                            EXCLUIR_KEYWORDS, PREFERIR_KEYWORDS], sort_keys=True)
+    return hashlib.sha256(contenido.encode('utf-8')).hexdigest()[:16]
+
+
 def calcular_score(seq_info, marcador):
     """Calcula score de calidad para una secuencia"""
     score = 0
@@ -120,10 +186,21 @@ def calcular_score(seq_info, marcador):
     return score
 
 
-def main():
-    input_dir = Path("combretaceae_sequences_final")
-    output_dir = Path("fastas_individuales_curados")
-    output_dir.mkdir(exist_ok=True)
+@inst.etapa('limpieza')
+def main(input_dir="combretaceae_sequences_final", output_dir="fastas_individuales_curados",
+         marcadores=None, indice_dir=None):
+    """
+    Args:
+        input_dir: carpeta con los FASTA descargados (Especie_marcador.fasta)
+        output_dir: carpeta de FASTA individuales curados
+        marcadores: limitar a estos marcadores (defecto: todos)
+        indice_dir: carpeta del índice de duplicados, un JSON por marcador
+            (defecto: <output_dir>/.indice_secuencias)
+    """
+    input_dir = Path(input_dir)
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    marcadores = list(marcadores or LONGITUD_CONFIG)
     
     print("=" * 80)
     print("🧬 LIMPIEZA DE FASTAS - VERSIÓN CORREGIDA")
@@ -138,14 +215,18 @@ def main():
     archivos_procesados = 0
     archivos_generados = 0
     especies_por_marcador = defaultdict(int)
+    indice_dir = indice_dir or output_dir / '.indice_secuencias'
+    indices = {}
+    especies_vistas = defaultdict(set)
+    huella = huella_scores()
     
     # Procesar cada archivo FASTA de entrada
-    for archivo in sorted(input_dir.glob("*.fasta")):
+    for archivo in listar(input_dir, "*.fasta"):
         archivos_procesados += 1
         
         # Extraer especie y marcador del nombre del archivo
-        # Formato esperado: "Especie_nombre_marcador.fasta"
-        partes = archivo.stem.split('_')
+        # Formato esperado: "Especie_nombre_marcador.fasta" (o .fasta.gz)
+        partes = nombre_base(archivo).split('_')
         if len(partes) < 2:
             print(f"⚠️  Saltando {archivo.name} (formato no reconocido)")
             continue
@@ -157,17 +238,27 @@ def main():
         if marcador not in LONGITUD_CONFIG:
             print(f"⚠️  Saltando {archivo.name} (marcador '{marcador}' no reconocido)")
             continue
+        if marcador not in marcadores:
+            continue
         
-        # Leer todas las secuencias del archivo
-        secuencias = leer_fasta(archivo)
+        # Leer todas las secuencias del archivo (copias idénticas colapsadas)
+        if marcador not in indices:
+            indices[marcador] = IndiceSecuencias(ruta_indice(indice_dir, marcador), marcador, huella)
+        indices[marcador].reiniciar_especie(especie)
+        especies_vistas[marcador].add(especie)
+        secuencias = leer_fasta(archivo, indices[marcador], especie)
         
         if not secuencias:
             print(f"⚠️  {especie} × {marcador}: Sin secuencias válidas")
             continue
         
         # Calcular scores para todas las secuencias
-        scores = [(seq, calcular_score(seq, marcador)) for seq in secuencias]
+        scores = [(seq, score_grupo(seq, marcador, indices[marcador])) for seq in secuencias]
         scores_positivos = [(seq, sc) for seq, sc in scores if sc > 0]
+        for seq, sc in scores:
+            if sc <= 0:
+                inst.incrementar('registros_rechazados', len(seq['headers']), marcador=marcador,
+                                 regla=REGLAS_RECHAZO.get(sc, 'score_no_positivo'))
         
         if not scores_positivos:
             print(f"❌ {especie} × {marcador}: Todas las secuencias descartadas (baja calidad)")
@@ -179,7 +270,7 @@ def main():
         # Generar archivo individual para esta especie-marcador
         output_file = output_dir / f"{especie}_{marcador}.fasta"
         
-        with open(output_file, 'w') as f:
+        with abrir(output_file, 'w') as f:
             # Header simplificado: solo especie y marcador
             f.write(f">{especie}\n")
             
@@ -190,19 +281,35 @@ def main():
         
         archivos_generados += 1
         especies_por_marcador[marcador] += 1
+        inst.incrementar('secuencias_escritas', etapa='limpieza', marcador=marcador)
         
         print(f"✅ {especie:40} × {marcador:10} → {mejor_seq['length']:4} bp (score: {mejor_score:4})")
     
+    # Índice de duplicados: podar especies que ya no están en la entrada,
+    # persistir y avisar de secuencias idénticas entre especies
+    for marcador in sorted(indices):
+        indices[marcador].podar(especies_vistas[marcador])
+        indices[marcador].guardar()
+        compartidas = reportar_compartidas(indices[marcador])
+        if compartidas:
+            inst.incrementar('secuencias_compartidas', compartidas, marcador=marcador)
+    
     # RESUMEN FINAL
     print("\n" + "=" * 80)
     print("📊 RESUMEN DE LIMPIEZA")
     print("=" * 80)
     print(f"Archivos procesados:  {archivos_procesados}")
     print(f"Archivos generados:   {archivos_generados}")
+    if indices:
+        nuevas = sum(i.nuevas for i in indices.values())
+        vistas = sum(i.reutilizadas for i in indices.values())
+        puntuadas = sum(i.scores_reutilizados for i in indices.values())
+        print(f"Secuencias medidas:   {nuevas} ({vistas} duplicadas o ya indexadas)")
+        print(f"Scores reutilizados:  {puntuadas}")
     print(f"\n📈 COBERTURA POR MARCADOR:")
     print("-" * 80)
     
-    for marcador in sorted(LONGITUD_CONFIG.keys()):
+    for marcador in sorted(marcadores):
         n_especies = especies_por_marcador.get(marcador, 0)
         porcentaje = (n_especies / 20) * 100  # Asumiendo 20 especies objetivo
         barra = "█" * int(porcentaje / 5) + "░" * (20 - int(porcentaje / 5))
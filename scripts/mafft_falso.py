@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+MAFFT FALSO PARA PRUEBAS - PROYECTO MANGLARES COMBRETACEAE
+==========================================================
+Propósito: Reemplazo mínimo de MAFFT para probar alinear_marcadores.py y el
+          pipeline en equipos sin MAFFT instalado. NO alinea: completa cada
+          secuencia con gaps al final hasta la longitud de la más larga, de
+          modo que la salida tiene la forma de un alineamiento (todas las
+          filas de igual longitud) y las etapas siguientes pueden correr.
+
+Acepta la misma línea de comandos que alinear_marcadores.py le pasa a MAFFT
+(--maxiterate, --localpair, --retree, --thread ...): las opciones se ignoran
+y el último argumento es el FASTA de entrada (.fasta o .fasta.gz). La salida
+va a stdout, como en MAFFT.
+
+Uso:
+    python alinear_marcadores.py alineamiento_input alineamientos --mafft ./mafft_falso.py
+    pipeline.py con "mafft": ["python", "mafft_falso.py"] en la configuración
+"""
+
+import sys
+
+from archivos import abrir
+
+# ============================================================================
+# LECTURA Y RELLENO
+# ============================================================================
+
+def leer_registros(ruta):
+    """Lista de [header, secuencia] de un FASTA"""
+    registros = []
+    with abrir(ruta, 'r') as f:
+        for linea in f:
+            linea = linea.strip()
+            if not linea:
+                continue
+            if linea.startswith('>'):
+                registros.append([linea, []])
+            elif registros:
+                registros[-1][1].append(linea)
+    return [(header, ''.join(partes)) for header, partes in registros]
+
+
+def main(argumentos):
+    if not argumentos or argumentos[-1].startswith('-'):
+        sys.exit("uso: mafft_falso.py [opciones de MAFFT] entrada.fasta")
+
+    registros = leer_registros(argumentos[-1])
+    largo = max((len(seq) for _, seq in registros), default=0)
+    salida = sys.stdout
+    for header, seq in registros:
+        salida.write(f"{header}\n")
+        relleno = seq.ljust(largo, '-')
+        for i in range(0, len(relleno), 60):
+            salida.write(relleno[i:i + 60] + '\n')
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
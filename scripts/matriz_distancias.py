@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+MATRIZ DE DISTANCIAS VECTORIZADA - PROYECTO MANGLARES COMBRETACEAE
+===================================================================
+Propósito: Calcular matrices de distancias p, JC69 y K2P sobre la supermatriz
+          (o un marcador) sin depender de ASAP externo.
+
+Método:
+  - El alineamiento se codifica como uint8 (ver alineamientos.py).
+  - Eliminación por pares: solo cuentan los sitios donde ambas secuencias
+    tienen una base no ambigua (gaps y códigos IUPAC se excluyen).
+  - Los conteos por par (sitios válidos, idénticos, transiciones) se obtienen
+    como productos de matrices one-hot por bloques de filas: memoria acotada
+    por el tamaño de bloque, no por el número de secuencias.
+  - Los bloques (i, j) se pueden repartir entre procesos.
+
+Input:  supermatriz.fasta (o cualquier FASTA/NEXUS/TNT alineado)
+Output: matriz PHYLIP (entrada de ASAP/NJ) o CSV
+
+Uso: python matriz_distancias.py supermatriz.fasta distancias.phy --modelo k2p
+"""
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from alineamientos import BASES, leer_codificado
+from archivos import abrir, sin_compresion
+
+# ============================================================================
+# CONFIGURACIÓN
+# ============================================================================
+
+MODELOS = ('p', 'jc69', 'k2p')
+BLOQUE = 512   # filas por bloque: memoria ≈ 4 × BLOQUE × sitios × 4 bytes × 2
+
+# ============================================================================
+# CONTEOS POR BLOQUES
+# ============================================================================
+
+def _one_hot(codigos):
+    """Matrices float32 (4, filas, sitios) con 1 donde hay cada base no ambigua"""
+    return np.stack([(codigos == b) for b in BASES]).astype(np.float32)
+
+
+def conteos_bloque(filas_i, filas_j):
+    """
+    Conteos por par entre dos bloques de secuencias codificadas
+
+    Returns:
+        (validos, identicos, transiciones) matrices (len(i), len(j))
+    """
+    xi = _one_hot(filas_i)
+    xj = xi if filas_j is filas_i else _one_hot(filas_j)
+
+    validos = xi.sum(axis=0) @ xj.sum(axis=0).T
+    identicos = sum(xi[b] @ xj[b].T for b in range(4))
+    # Transiciones: A<->G (índices 0, 2) y C<->T (índices 1, 3)
+    transiciones = (xi[0] @ xj[2].T + xi[2] @ xj[0].T
+                    + xi[1] @ xj[3].T + xi[3] @ xj[1].T)
+    return validos, identicos, transiciones
+
+
+def distancias_bloque(filas_i, filas_j, modelo='p'):
+    """Distancias de un bloque (NaN si no hay sitios comparables o saturación)"""
+    validos, identicos, transiciones = conteos_bloque(filas_i, filas_j)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        p = (validos - identicos) / validos
+        if modelo == 'p':
+            return p
+        if modelo == 'jc69':
+            return -0.75 * np.log(1.0 - p * 4.0 / 3.0)
+        P = transiciones / validos
+        Q = p - P
+        return -0.5 * np.log(1.0 - 2.0 * P - Q) - 0.25 * np.log(1.0 - 2.0 * Q)
+
+
+# ============================================================================
+# MATRIZ COMPLETA
+# ============================================================================
+
+_CODIGOS = None
+
+
+def _iniciar_trabajador(codigos):
+    global _CODIGOS
+    _CODIGOS = codigos
+
+
+def _calcular_tesela(args):
+    i0, i1, j0, j1, modelo = args
+    filas_i = _CODIGOS[i0:i1]
+    filas_j = filas_i if (i0, i1) == (j0, j1) else _CODIGOS[j0:j1]
+    return i0, j0, distancias_bloque(filas_i, filas_j, modelo)
+
+
+def matriz_distancias(codigos, modelo='p', bloque=BLOQUE, procesos=1):
+    """
+    Matriz de distancias simétrica (n × n, float64)
+
+    Args:
+        codigos: matriz uint8 (taxones × sitios) de alineamientos.codificar
+        modelo: 'p', 'jc69' o 'k2p'
+        bloque: filas por tesela
+        procesos: número de procesos para repartir las teselas
+    """
+    if modelo not in MODELOS:
+        raise ValueError(f"Modelo desconocido: {modelo} (opciones: {', '.join(MODELOS)})")
+
+    n = codigos.shape[0]
+    cortes = list(range(0, n, bloque)) + [n]
+    teselas = [(cortes[a], cortes[a + 1], cortes[b], cortes[b + 1], modelo)
+               for a in range(len(cortes) - 1)
+               for b in range(a, len(cortes) - 1)]
+
+    distancias = np.empty((n, n), dtype=np.float64)
+
+    if procesos > 1 and len(teselas) > 1:
+        with ProcessPoolExecutor(procesos, initializer=_iniciar_trabajador,
+                                 initargs=(codigos,)) as pool:
+            resultados = pool.map(_calcular_tesela, teselas)
+            for i0, j0, d in resultados:
+                _colocar(distancias, i0, j0, d)
+    else:
+        _iniciar_trabajador(codigos)
+        for tesela in teselas:
+            _colocar(distancias, *_calcular_tesela(tesela))
+
+    np.fill_diagonal(distancias, 0.0)
+    return distancias
+
+
+def _colocar(distancias, i0, j0, d):
+    filas, columnas = d.shape
+    distancias[i0:i0 + filas, j0:j0 + columnas] = d
+    distancias[j0:j0 + columnas, i0:i0 + filas] = d.T
+
+
+# ============================================================================
+# ESCRITURA
+# ============================================================================
+
+def escribir_phylip(ruta, nombres, distancias):
+    """Matriz cuadrada PHYLIP (nombres completos, formato relajado)"""
+    ancho = max(len(nombre) for nombre in nombres)
+    with abrir(ruta, 'w') as f:
+        f.write(f"{len(nombres)}\n")
+        for nombre, fila in zip(nombres, distancias):
+            valores = ' '.join(f"{d:.6f}" for d in fila)
+            f.write(f"{nombre:<{ancho}}  {valores}\n")
+
+
+def escribir_csv(ruta, nombres, distancias):
+    with abrir(ruta, 'w') as f:
+        f.write(',' + ','.join(nombres) + '\n')
+        for nombre, fila in zip(nombres, distancias):
+            f.write(nombre + ',' + ','.join(f"{d:.6f}" for d in fila) + '\n')
+
+
+def leer_phylip(ruta):
+    """Lee una matriz cuadrada PHYLIP escrita por escribir_phylip"""
+    nombres = []
+    filas = []
+    with abrir(ruta, 'r') as f:
+        n = int(f.readline().split()[0])
+        for _ in range(n):
+            partes = f.readline().split()
+            nombres.append(partes[0])
+            filas.append([float(x) for x in partes[1:n + 1]])
+    return nombres, np.array(filas, dtype=np.float64)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Matriz de distancias p / JC69 / K2P")
+    parser.add_argument("alineamiento", help="FASTA, NEXUS o TNT alineado")
+    parser.add_argument("salida", help="Archivo de salida (.phy o .csv)")
+    parser.add_argument("--modelo", choices=MODELOS, default='k2p')
+    parser.add_argument("--bloque", type=int, default=BLOQUE,
+                        help=f"Filas por bloque (defecto: {BLOQUE})")
+    parser.add_argument("--procesos", type=int, default=1)
+    args = parser.parse_args()
+
+    nombres, codigos = leer_codificado(args.alineamiento)
+    print(f"🧬 {len(nombres)} secuencias × {codigos.shape[1]} sitios ({args.modelo})")
+
+    distancias = matriz_distancias(codigos, args.modelo, args.bloque, args.procesos)
+    n_nan = int(np.isnan(distancias).sum())
+    if n_nan:
+        print(f"⚠️  {n_nan // 2} pares sin sitios comparables o saturados (NaN)")
+
+    if sin_compresion(args.salida).lower().endswith('.csv'):
+        escribir_csv(args.salida, nombres, distancias)
+    else:
+        escribir_phylip(args.salida, nombres, distancias)
+    print(f"✅ Matriz escrita en: {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
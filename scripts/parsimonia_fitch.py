@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+PARSIMONIA DE FITCH BIT-PARALELA - PROYECTO MANGLARES COMBRETACEAE
+===================================================================
+Propósito: Calcular longitud, CI, RI y pasos por sitio de cualquier árbol
+          Newick/NEXUS contra supermatriz.tnt sin depender de TNT
+          (get_stats.tnt solo se usaba para `length` y `minmax`).
+
+Método:
+  - Cada estado (A, C, G, T y opcionalmente gap) es un plano de bits donde
+    el bit i indica si el sitio i admite ese estado; los planos se empaquetan
+    en palabras uint64, de modo que una operación NumPy por nodo evalúa
+    64 sitios por palabra:
+        I = A & B                (intersección por plano)
+        vacío = ~(OR de planos de I)
+        nodo = I | (vacío & (A | B))
+        pasos += popcount(vacío)
+  - Los gaps se tratan como dato faltante (como TNT por defecto) o como
+    quinto estado con --gaps quinto (entonces N y '?' admiten los cinco).
+  - Las politomías se resuelven en secuencia (longitud de una resolución).
+  - minmax como TNT: mínimo = menor conjunto de estados compatible con
+    todos los taxones - 1; máximo = taxones observados - taxones que
+    admiten el estado más frecuente (los códigos IUPAC cuentan como
+    conjuntos de estados).
+
+Uso:
+    python parsimonia_fitch.py supermatriz.tnt arbol_conocarpus_parsimonia.tre
+    python parsimonia_fitch.py supermatriz.tnt thesis_beast.trees --burnin 10 --resumen
+"""
+
+import argparse
+
+import numpy as np
+
+from alineamientos import DESCONOCIDO, GAP, leer_codificado
+from arboles_nexus import iterar_arboles, parsear_newick
+
+# ============================================================================
+# CONFIGURACIÓN
+# ============================================================================
+
+if hasattr(np, 'bitwise_count'):
+    def _popcount(palabras):
+        return int(np.bitwise_count(palabras).sum())
+else:
+    _POPCOUNT8 = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+    def _popcount(palabras):
+        return int(_POPCOUNT8[palabras.view(np.uint8)].sum())
+
+
+# ============================================================================
+# MATRIZ EMPAQUETADA
+# ============================================================================
+
+class MatrizFitch:
+    """Matriz de caracteres empaquetada en planos de bits por estado"""
+
+    def __init__(self, nombres, codigos, gaps='faltante'):
+        if gaps == 'faltante':
+            codigos = np.where((codigos & GAP) > 0, DESCONOCIDO, codigos)
+            self.n_estados = 4
+        elif gaps == 'quinto':
+            # N, '?' y el relleno de marcadores ausentes admiten cualquier
+            # estado, también el gap
+            codigos = np.where(codigos == DESCONOCIDO, DESCONOCIDO | GAP, codigos)
+            self.n_estados = 5
+        else:
+            raise ValueError(f"Tratamiento de gaps desconocido: {gaps}")
+
+        self.nombres = list(nombres)
+        self.indice = {nombre: i for i, nombre in enumerate(self.nombres)}
+        self.codigos = codigos
+        self.n_sitios = codigos.shape[1]
+
+        # (taxones, estados, palabras) uint64
+        estados = np.arange(self.n_estados, dtype=np.uint8)
+        bits = ((codigos[:, None, :] >> estados[None, :, None]) & 1).astype(np.uint8)
+        self.planos = self._empaquetar(bits)
+        self.mascara = self._empaquetar(np.ones((1, 1, self.n_sitios), dtype=np.uint8))[0, 0]
+        self.minimos, self.maximos = self._minmax()
+
+    def _empaquetar(self, bits):
+        bytes_ = np.packbits(bits, axis=-1, bitorder='little')
+        relleno = (-bytes_.shape[-1]) % 8
+        if relleno:
+            bytes_ = np.concatenate(
+                [bytes_, np.zeros(bytes_.shape[:-1] + (relleno,), dtype=np.uint8)], axis=-1)
+        return np.ascontiguousarray(bytes_).view(np.uint64)
+
+    def _desempaquetar(self, palabras):
+        return np.unpackbits(palabras.view(np.uint8), bitorder='little')[:self.n_sitios]
+
+    def _minmax(self):
+        todos = (1 << self.n_estados) - 1
+        codigos = self.codigos & todos
+        observados = codigos != todos      # los faltantes no aportan pasos
+
+        # Máximo: taxones observados que no admiten el estado más frecuente
+        conteos = np.stack([((codigos >> s) & 1).astype(bool) & observados
+                            for s in range(self.n_estados)]).sum(axis=1)
+        maximos = observados.sum(axis=0) - conteos.max(axis=0)
+
+        # Mínimo: menor conjunto de estados que toca a todos los taxones - 1
+        minimos = np.full(self.n_sitios, self.n_estados - 1, dtype=np.int64)
+        for subconjunto in range(1, todos + 1):
+            cubre = ((codigos & subconjunto) > 0).all(axis=0)
+            minimos = np.where(cubre, np.minimum(minimos, bin(subconjunto).count('1') - 1),
+                               minimos)
+        return minimos, maximos
+
+    # ------------------------------------------------------------------------
+
+    def _filas_hojas(self, raiz):
+        hojas = raiz.hojas()
+        nombres = [h.nombre for h in hojas]
+        if all(n in self.indice for n in nombres):
+            return {h: self.indice[h.nombre] for h in hojas}
+        if all(n.isdigit() for n in nombres):
+            # Árboles exportados por TNT: terminales numerados desde 1
+            return {h: int(h.nombre) - 1 for h in hojas}
+        faltantes = sorted(n for n in nombres if n not in self.indice)
+        raise ValueError(f"Taxones del árbol ausentes en la matriz: {', '.join(faltantes[:5])}")
+
+    def _fitch(self, a, b):
+        interseccion = a & b
+        union_planos = np.bitwise_or.reduce(interseccion, axis=0)
+        vacio = ~union_planos & self.mascara
+        return interseccion | (vacio & (a | b)), vacio
+
+    def longitud(self, raiz, por_sitio=False, pesos=None):
+        """
+        Longitud de Fitch del árbol
+
+        Args:
+            por_sitio: también retornar el vector de pasos por sitio
+            pesos: vector de pesos enteros por sitio (remuestreos)
+
+        Returns:
+            longitud, o (longitud, pasos_por_sitio) si por_sitio
+        """
+        filas = self._filas_hojas(raiz)
+        estados = {}
+        total = 0
+        pasos = np.zeros(self.n_sitios, dtype=np.int64) if (por_sitio or pesos is not None) else None
+
+        for nodo in raiz.postorden():
+            if not nodo.hijos:
+                estados[nodo] = self.planos[filas[nodo]]
+                continue
+            actual = estados.pop(nodo.hijos[0])
+            for hijo in nodo.hijos[1:]:
+                actual, vacio = self._fitch(actual, estados.pop(hijo))
+                if pasos is None:
+                    total += _popcount(vacio)
+                else:
+                    pasos += self._desempaquetar(vacio)
+            estados[nodo] = actual
+
+        if pasos is not None:
+            total = int(pasos.sum()) if pesos is None else int(np.dot(pesos, pasos))
+        return (total, pasos) if por_sitio else total
+
+    def indices(self, longitud, pesos=None):
+        """(CI, RI) de una longitud dada"""
+        if pesos is None:
+            minimo, maximo = int(self.minimos.sum()), int(self.maximos.sum())
+        else:
+            minimo, maximo = int(np.dot(pesos, self.minimos)), int(np.dot(pesos, self.maximos))
+        ci = minimo / longitud if longitud else 1.0
+        ri = (maximo - longitud) / (maximo - minimo) if maximo > minimo else 1.0
+        return ci, ri
+
+
+# ============================================================================
+# EVALUACIÓN DE ARCHIVOS DE ÁRBOLES
+# ============================================================================
+
+def puntuar_arboles(matriz, ruta_arboles, burnin=0.0):
+    """Itera (nombre, longitud, CI, RI) para cada árbol después del burn-in"""
+    saltar = 0
+    posiciones = None
+    if burnin:
+        from arboles_nexus import contar_arboles, posiciones_arboles
+        posiciones = posiciones_arboles(ruta_arboles)
+        total = len(posiciones) if posiciones is not None else contar_arboles(ruta_arboles)
+        saltar = int(total * burnin / 100)
+
+    arboles = iterar_arboles(ruta_arboles, saltar=saltar, posiciones=posiciones)
+    for i, (nombre, newick, traduccion) in enumerate(arboles, saltar):
+        longitud = matriz.longitud(parsear_newick(newick, traduccion))
+        ci, ri = matriz.indices(longitud)
+        yield nombre or f"arbol_{i + 1}", longitud, ci, ri
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Longitud de Fitch, CI y RI de árboles")
+    parser.add_argument("matriz", help="Matriz (supermatriz.tnt, FASTA o NEXUS)")
+    parser.add_argument("arboles", nargs='+', help="Archivos de árboles (Newick/NEXUS/tread)")
+    parser.add_argument("--gaps", choices=['faltante', 'quinto'], default='faltante')
+    parser.add_argument("--burnin", type=float, default=0.0, help="Porcentaje de burn-in")
+    parser.add_argument("--por-sitio", metavar="TSV",
+                        help="Escribe los pasos por sitio del primer árbol")
+    parser.add_argument("--resumen", action="store_true",
+                        help="Solo imprime el resumen (útil para posteriores)")
+    args = parser.parse_args()
+
+    nombres, codigos = leer_codificado(args.matriz)
+    matriz = MatrizFitch(nombres, codigos, args.gaps)
+
+    print("=" * 80)
+    print("🌿 PARSIMONIA DE FITCH (BIT-PARALELA)")
+    print("=" * 80)
+    print(f"\n📁 Matriz: {args.matriz} ({len(nombres)} taxones × {matriz.n_sitios} sitios)")
+    print(f"   minmax: {int(matriz.minimos.sum())} / {int(matriz.maximos.sum())} pasos\n")
+
+    longitudes = []
+    for ruta in args.arboles:
+        for nombre, longitud, ci, ri in puntuar_arboles(matriz, ruta, args.burnin):
+            longitudes.append(longitud)
+            if not args.resumen:
+                print(f"{ruta}  {nombre:<20} longitud={longitud:6d}  CI={ci:.4f}  RI={ri:.4f}")
+
+    if longitudes:
+        print(f"\n✅ {len(longitudes)} árboles: longitud mín {min(longitudes)}, "
+              f"media {sum(longitudes) / len(longitudes):.1f}, máx {max(longitudes)}")
+
+    if args.por_sitio:
+        _, newick, traduccion = next(iterar_arboles(args.arboles[0]))
+        _, pasos = matriz.longitud(parsear_newick(newick, traduccion), por_sitio=True)
+        with open(args.por_sitio, 'w') as f:
+            f.write("sitio\tpasos\tminimo\tmaximo\n")
+            for i, (p, mn, mx) in enumerate(zip(pasos, matriz.minimos, matriz.maximos), 1):
+                f.write(f"{i}\t{p}\t{mn}\t{mx}\n")
+        print(f"📁 Pasos por sitio: {args.por_sitio}")
+
+
+if __name__ == "__main__":
+    main()
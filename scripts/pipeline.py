@@ -0,0 +1,626 @@
+#!/usr/bin/env python3
+"""
+PIPELINE INCREMENTAL - PROYECTO MANGLARES COMBRETACEAE
+======================================================
+Propósito: Declarar las etapas del flujo (descarga → limpieza →
+          consolidación → MAFFT → supermatriz → TNT / MrBayes / BEAST)
+          con sus entradas, salidas y parámetros, y ejecutar solo lo que
+          cambió.
+
+Método:
+  - Cada etapa tiene una huella SHA-256 de: el código de su función y de
+    los scripts del proyecto que importa (directa o indirectamente), sus
+    parámetros y el contenido de sus entradas (los patrones glob incluyen
+    la lista de archivos). Si la huella coincide con la última ejecución
+    correcta y las salidas existen, la etapa se salta.
+  - Las dependencias se deducen de las rutas: una etapa depende de la que
+    declara como salida alguna de sus entradas.
+  - Con 'recorte' activo, cada alineamiento pasa por
+    recortar_alineamientos.py antes de la supermatriz (el mapa de columnas
+    queda junto al recortado).
+  - Con 'arboles_iniciales', arboles_rapidos.py calcula sobre la
+    supermatriz un UPGMA calibrado (árbol inicial de BEAST) y un NJ
+    (startvals de MrBayes).
+  - Las etapas listas se ejecutan en paralelo (un proceso por etapa); la
+    limpieza y la consolidación son por marcador, así que agregar una
+    especie solo reconstruye los marcadores afectados y lo que depende de
+    ellos. El alineamiento es una sola etapa (alinear_marcadores.py reparte
+    los núcleos entre marcadores y no realinea los que no cambiaron).
+  - El estado (huellas de etapas y caché de hashes por tamaño/mtime) se
+    guarda en .pipeline_estado.json; la salida de cada etapa va a
+    logs/<etapa>.log.
+
+Uso:
+    python pipeline.py --plan                  # qué se ejecutaría
+    python pipeline.py --procesos 4            # todo lo pendiente
+    python pipeline.py beast --config pipeline.json
+    python pipeline.py --forzar consolidar:ITS
+"""
+
+import argparse
+import ast
+import glob
+import hashlib
+import inspect
+import json
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from contextlib import redirect_stderr, redirect_stdout
+from pathlib import Path
+
+from archivos import EXTENSIONES
+
+# ============================================================================
+# CONFIGURACIÓN
+# ============================================================================
+
+RAIZ_PROYECTO = Path(__file__).resolve().parent.parent
+# Carpetas donde se buscan los módulos del proyecto que importan las etapas
+CARPETAS_MODULOS = [Path(__file__).resolve().parent, RAIZ_PROYECTO / 'analyses' / 'beast']
+
+CONFIG = {
+    'trabajo': '.',
+    'descargas': 'combretaceae_sequences_final',
+    'curados': 'fastas_individuales_curados',
+    'entrada_mafft': 'alineamiento_input',
+    'alineamientos': 'alineamientos',
+    'recortados': 'alineamientos_recortados',
+    'supermatriz': 'supermatriz',
+    'mrbayes': 'mrbayes',
+    'beast': 'beast',
+    'marcadores': ['ITS', 'matK', 'rbcL', 'psaA-ycf3', 'trnH-psbA'],
+    'mafft': 'mafft',       # ejecutable (o lista, p. ej. ['python', 'mafft_falso.py'])
+    'nucleos_mafft': None,  # núcleos repartidos entre marcadores (defecto: todos)
+    'recorte': None,        # modo de recortar_alineamientos.py ('automatico', 'umbral'); None = sin recorte
+    'modelo': 'GTR+I+G',    # 'auto' = seleccion_modelos.py sobre la supermatriz
+    'descargar': False,     # la descarga de NCBI solo se incluye si se pide
+    'comprimir_descargas': False,  # descargas como .fasta.gz (BGZF, ver archivos.py)
+    'arboles_iniciales': False,  # árbol inicial fijo: UPGMA calibrado en BEAST, NJ en MrBayes
+    'replicas_beast': 1,    # N XML réplicas (50M/N iteraciones cada una; combinar_replicas.py)
+    'semilla_beast': 1,     # sortea las semillas de las réplicas (reproducibles; None = al azar)
+    'plantilla_mrbayes': str(RAIZ_PROYECTO / 'analyses' / 'mrbayes' / 'mrbayes_commands.nex'),
+}
+
+ESTADO = '.pipeline_estado.json'
+
+# ============================================================================
+# ETAPAS
+# ============================================================================
+
+class Etapa:
+    """Una etapa: funcion(**params), con rutas de entrada y salida (admiten glob)"""
+
+    __slots__ = ('nombre', 'funcion', 'entradas', 'salidas', 'params')
+
+    def __init__(self, nombre, funcion, entradas=(), salidas=(), params=None):
+        self.nombre = nombre
+        self.funcion = funcion
+        self.entradas = list(entradas)
+        self.salidas = list(salidas)
+        self.params = params or {}
+
+
+def _descargar(carpeta, comprimir=False):
+    import combretaceae_download_v4_final
+    combretaceae_download_v4_final.COMPRIMIR = comprimir
+    combretaceae_download_v4_final.main(carpeta)
+
+
+def _limpiar(entrada, salida, marcador):
+    import limpiar_fastas_v3_CORREGIDO
+    limpiar_fastas_v3_CORREGIDO.main(entrada, salida, [marcador])
+
+
+def _consolidar(entrada, salida, marcador):
+    import consolidar_fastas
+    consolidar_fastas.main(entrada, salida, [marcador])
+
+
+def _alinear(pares, ejecutable, nucleos):
+    from alinear_marcadores import alinear_marcadores
+    alinear_marcadores(pares, nucleos, ejecutable)
+
+
+def _recortar(entrada, salida, mapa, modo):
+    from recortar_alineamientos import recortar_archivo
+    mascara, umbrales = recortar_archivo(entrada, salida, mapa, modo=modo)
+    print(f"✅ {len(mascara)} → {int(mascara.sum())} columnas "
+          f"(ocupación >= {umbrales['ocupacion']:.3f})")
+
+
+def _supermatriz(alineamientos, fasta, nexus):
+    from alineamientos import concatenar, escribir_fasta, escribir_nexus
+    nombres, secuencias, particiones = concatenar(alineamientos)
+    escribir_fasta(fasta, nombres, secuencias)
+    escribir_nexus(nexus, nombres, secuencias, particiones)
+    print(f"✅ Supermatriz: {len(nombres)} taxones × {len(secuencias[0])} sitios")
+    for marcador, inicio, fin in particiones:
+        print(f"   {marcador:12} {inicio:6}-{fin}")
+
+
+def _tnt(fasta, tnt):
+    from convertidor_fasta_corregido import fasta_to_tnt
+    fasta_to_tnt(fasta, tnt)
+
+
+def _seleccionar_modelo(fasta, tabla, salida_json, procesos=1):
+    from alineamientos import leer_codificado
+    from seleccion_modelos import escribir_tabla, mejor_modelo, seleccionar_modelos
+    nombres, codigos = leer_codificado(fasta)
+    resultados = seleccionar_modelos(nombres, codigos, procesos=procesos)
+    escribir_tabla(tabla, resultados)
+    mejor = mejor_modelo(resultados)
+    with open(salida_json, 'w') as f:
+        json.dump(mejor, f, indent=2)
+    print(f"✅ Mejor modelo (BIC): {mejor['modelo']}")
+
+
+def _nombre_modelo(modelo):
+    if modelo.endswith('.json'):
+        with open(modelo) as f:
+            return json.load(f)['modelo']
+    return modelo
+
+
+def _arboles_iniciales(fasta, upgma, nj):
+    sys.path.insert(0, str(RAIZ_PROYECTO / 'analyses' / 'beast'))
+    from arboles_rapidos import (arbol_alineamiento, calibrar, escribir_arbol_mrbayes,
+                                 escribir_newick, neighbor_joining)
+    from beast_thesis_config import CALIBRATION_AGE, CALIBRATION_TAXA
+    raiz, nombres, distancias = arbol_alineamiento(fasta, 'upgma', clado=CALIBRATION_TAXA)
+    escribir_newick(upgma, calibrar(raiz, CALIBRATION_TAXA, CALIBRATION_AGE))
+    escribir_arbol_mrbayes(nj, neighbor_joining(distancias, nombres))
+    print(f"✅ Árboles iniciales: {upgma} + {nj} ({len(nombres)} taxones)")
+
+
+def _mrbayes(nexus, plantilla, modelo, datos, comandos, arbol=None):
+    from seleccion_modelos import actualizar_mrbayes
+    shutil.copyfile(nexus, datos)
+    shutil.copyfile(plantilla, comandos)
+    actualizar_mrbayes(comandos, _nombre_modelo(modelo))
+    if arbol:
+        from arboles_rapidos import fijar_arbol_mrbayes
+        copia = os.path.join(os.path.dirname(comandos), os.path.basename(arbol))
+        shutil.copyfile(arbol, copia)
+        fijar_arbol_mrbayes(comandos, copia)
+    print(f"✅ MrBayes: {datos} + {comandos}")
+
+
+def _beast(nexus, modelo, salida, arbol=None, replicas=1, semilla=None):
+    sys.path.insert(0, str(RAIZ_PROYECTO / 'analyses' / 'beast'))
+    from beast_thesis_config import generate_beast_xml_thesis, generate_replicates, load_model
+    inicial = None
+    if arbol:
+        with open(arbol) as f:
+            inicial = f.read()
+    if replicas > 1:
+        generate_replicates(nexus, replicas, load_model(modelo), os.path.dirname(salida), inicial,
+                            seed=semilla)
+    else:
+        generate_beast_xml_thesis(nexus, load_model(modelo), salida, initial_tree=inicial)
+
+
+def construir_etapas(config):
+    """Lista de etapas del flujo completo según la configuración"""
+    t = Path(config['trabajo'])
+    ruta = lambda *partes: str(t.joinpath(*partes))
+    descargas, curados = ruta(config['descargas']), ruta(config['curados'])
+    entrada_mafft, alineados = ruta(config['entrada_mafft']), ruta(config['alineamientos'])
+    recortados = ruta(config['recortados'])
+    supermatriz = ruta(config['supermatriz'])
+    etapas = []
+
+    if config['descargar']:
+        # Se declara una salida por marcador para que la limpieza de cada
+        # marcador solo dependa (y se invalide) por sus propios archivos
+        etapas.append(Etapa('descarga', _descargar,
+                            salidas=[os.path.join(descargas, f'*_{m}.fasta')
+                                     for m in config['marcadores']],
+                            params={'carpeta': descargas,
+                                    'comprimir': config['comprimir_descargas']}))
+
+    por_marcador = {}
+    pares = {}
+    for m in config['marcadores']:
+        crudos = os.path.join(descargas, f'*_{m}.fasta')
+        limpios = os.path.join(curados, f'*_{m}.fasta')
+        consolidado = os.path.join(entrada_mafft, f'{m}_all.fasta')
+        alineado = os.path.join(alineados, f'{m}_aligned.fasta')
+        pares[m] = (consolidado, alineado)
+
+        etapas += [
+            Etapa(f'limpiar:{m}', _limpiar, [crudos], [limpios],
+                  {'entrada': descargas, 'salida': curados, 'marcador': m}),
+            Etapa(f'consolidar:{m}', _consolidar, [limpios], [consolidado],
+                  {'entrada': curados, 'salida': entrada_mafft, 'marcador': m}),
+        ]
+
+    # Un solo paso de alineamiento para repartir los núcleos entre marcadores;
+    # los marcadores sin cambios salen de la caché de alinear_marcadores.py
+    etapas.append(Etapa('mafft', _alinear, [c for c, _ in pares.values()],
+                        [a for _, a in pares.values()],
+                        {'pares': pares, 'ejecutable': config['mafft'],
+                         'nucleos': config['nucleos_mafft']}))
+    for m, (_, alineado) in pares.items():
+        por_marcador[m] = alineado
+        if config['recorte']:
+            recortado = os.path.join(recortados, f'{m}_trimmed.fasta')
+            mapa = os.path.join(recortados, f'{m}_columnas.tsv')
+            etapas.append(Etapa(f'recortar:{m}', _recortar, [alineado], [recortado, mapa],
+                                {'entrada': alineado, 'salida': recortado, 'mapa': mapa,
+                                 'modo': config['recorte']}))
+            por_marcador[m] = recortado
+
+    fasta = os.path.join(supermatriz, 'supermatriz.fasta')
+    nexus = os.path.join(supermatriz, 'supermatriz.nex')
+    tnt = os.path.join(supermatriz, 'supermatriz.tnt')
+    etapas += [
+        Etapa('supermatriz', _supermatriz, list(por_marcador.values()), [fasta, nexus],
+              {'alineamientos': por_marcador, 'fasta': fasta, 'nexus': nexus}),
+        Etapa('tnt', _tnt, [fasta], [tnt], {'fasta': fasta, 'tnt': tnt}),
+    ]
+
+    modelo = config['modelo']
+    entradas_modelo = []
+    if modelo == 'auto':
+        modelo = os.path.join(supermatriz, 'modelo.json')
+        tabla = os.path.join(supermatriz, 'modelos.tsv')
+        entradas_modelo = [modelo]
+        etapas.append(Etapa('modelo', _seleccionar_modelo, [fasta], [tabla, modelo],
+                            {'fasta': fasta, 'tabla': tabla, 'salida_json': modelo}))
+
+    arbol_upgma = arbol_nj = None
+    if config['arboles_iniciales']:
+        arbol_upgma = os.path.join(supermatriz, 'arbol_inicial_upgma.nwk')
+        arbol_nj = os.path.join(supermatriz, 'arbol_inicial_nj.nex')
+        etapas.append(Etapa('arboles_iniciales', _arboles_iniciales, [fasta],
+                            [arbol_upgma, arbol_nj],
+                            {'fasta': fasta, 'upgma': arbol_upgma, 'nj': arbol_nj}))
+
+    datos_mb = ruta(config['mrbayes'], 'combretaceae.nex')
+    comandos_mb = ruta(config['mrbayes'], 'mrbayes_commands.nex')
+    xml = ruta(config['beast'], 'combretaceae_thesis.xml')
+    replicas = config['replicas_beast']
+    salidas_beast = [xml] if replicas <= 1 else \
+        [ruta(config['beast'], f'combretaceae_thesis_r{k}.xml') for k in range(1, replicas + 1)] + \
+        [ruta(config['beast'], 'replicas.tsv'), ruta(config['beast'], 'run_replicas.sh')]
+    etapas += [
+        Etapa('mrbayes', _mrbayes,
+              [nexus, config['plantilla_mrbayes']] + entradas_modelo + ([arbol_nj] if arbol_nj else []),
+              [datos_mb, comandos_mb],
+              {'nexus': nexus, 'plantilla': config['plantilla_mrbayes'], 'modelo': modelo,
+               'datos': datos_mb, 'comandos': comandos_mb, 'arbol': arbol_nj}),
+        Etapa('beast', _beast, [nexus] + entradas_modelo + ([arbol_upgma] if arbol_upgma else []),
+              salidas_beast, {'nexus': nexus, 'modelo': modelo, 'salida': xml, 'arbol': arbol_upgma,
+                              'replicas': replicas, 'semilla': config['semilla_beast']}),
+    ]
+    return etapas
+
+
+# ============================================================================
+# HUELLAS
+# ============================================================================
+
+def _expandir(patron):
+    """Archivos de una ruta, carpeta o patrón glob (ordenados; el patrón
+    también abarca las versiones comprimidas, p. ej. *_ITS.fasta.gz)"""
+    if glob.has_magic(patron):
+        rutas = glob.glob(patron)
+        for extension in EXTENSIONES:
+            rutas += glob.glob(patron + extension)
+    else:
+        rutas = [patron]
+    archivos = []
+    for r in sorted(rutas):
+        if os.path.isdir(r):
+            for base, _, nombres in sorted(os.walk(r)):
+                archivos += [os.path.join(base, n) for n in sorted(nombres)]
+        elif os.path.exists(r):
+            archivos.append(r)
+    return archivos
+
+
+def _importados(codigo):
+    """Nombres de los módulos importados en un código fuente (también dentro de funciones)"""
+    nombres = set()
+    for nodo in ast.walk(ast.parse(codigo)):
+        if isinstance(nodo, ast.Import):
+            nombres.update(alias.name.split('.')[0] for alias in nodo.names)
+        elif isinstance(nodo, ast.ImportFrom) and nodo.module and not nodo.level:
+            nombres.add(nodo.module.split('.')[0])
+    return nombres
+
+
+def fuentes_etapa(funcion):
+    """
+    Archivos .py del proyecto de los que depende una etapa: los que importa
+    su función y, transitivamente, los que importan esos módulos
+    """
+    pendientes = _importados(inspect.getsource(funcion))
+    vistos = set()
+    archivos = []
+    while pendientes:
+        modulo = pendientes.pop()
+        if modulo in vistos:
+            continue
+        vistos.add(modulo)
+        for carpeta in CARPETAS_MODULOS:
+            ruta = carpeta / f"{modulo}.py"
+            if ruta.exists():
+                archivos.append(str(ruta))
+                with open(ruta, encoding='utf-8') as f:
+                    pendientes |= _importados(f.read()) - vistos
+                break
+    return sorted(archivos)
+
+
+class CacheHuellas:
+    """SHA-256 de archivos, reutilizado mientras no cambien tamaño ni mtime"""
+
+    def __init__(self, datos=None):
+        self.datos = datos or {}
+
+    def archivo(self, ruta):
+        info = os.stat(ruta)
+        clave = [info.st_size, info.st_mtime_ns]
+        guardado = self.datos.get(ruta)
+        if guardado and guardado[:2] == clave:
+            return guardado[2]
+        h = hashlib.sha256()
+        with open(ruta, 'rb') as f:
+            for bloque in iter(lambda: f.read(1 << 20), b''):
+                h.update(bloque)
+        self.datos[ruta] = clave + [h.hexdigest()]
+        return h.hexdigest()
+
+    def etapa(self, etapa):
+        """Huella de código (función y scripts que usa) + parámetros + entradas"""
+        entradas = {}
+        for patron in etapa.entradas:
+            archivos = _expandir(patron)
+            if not archivos and not glob.has_magic(patron):
+                raise FileNotFoundError(f"{etapa.nombre}: falta la entrada {patron}")
+            entradas[patron] = [(a, self.archivo(a)) for a in archivos]
+        contenido = {
+            'funcion': etapa.funcion.__name__,
+            'codigo': inspect.getsource(etapa.funcion),
+            'modulos': [(Path(a).name, self.archivo(a)) for a in fuentes_etapa(etapa.funcion)],
+            'params': etapa.params,
+            'entradas': entradas,
+        }
+        texto = json.dumps(contenido, sort_keys=True, default=str)
+        return hashlib.sha256(texto.encode()).hexdigest()
+
+
+def leer_estado(ruta):
+    if os.path.exists(ruta):
+        with open(ruta) as f:
+            return json.load(f)
+    return {'etapas': {}, 'archivos': {}}
+
+
+def guardar_estado(ruta, estado):
+    temporal = ruta + '.tmp'
+    with open(temporal, 'w') as f:
+        json.dump(estado, f, indent=1, sort_keys=True)
+    os.replace(temporal, ruta)
+
+
+# ============================================================================
+# EJECUCIÓN
+# ============================================================================
+
+def dependencias(etapas):
+    """{etapa: {etapas de las que depende}}; error si hay ciclos"""
+    productores = {}
+    for e in etapas:
+        for salida in e.salidas:
+            productores[salida] = e.nombre
+    deps = {e.nombre: {productores[p] for p in e.entradas
+                       if p in productores and productores[p] != e.nombre}
+            for e in etapas}
+
+    pendientes = {n: set(d) for n, d in deps.items()}
+    while pendientes:
+        libres = [n for n, d in pendientes.items() if not d]
+        if not libres:
+            raise ValueError(f"Dependencias cíclicas entre: {', '.join(sorted(pendientes))}")
+        for n in libres:
+            del pendientes[n]
+        for d in pendientes.values():
+            d.difference_update(libres)
+    return deps
+
+
+def seleccionar(etapas, objetivos):
+    """Subconjunto de etapas necesario para construir los objetivos"""
+    if not objetivos:
+        return etapas
+    por_nombre = {e.nombre: e for e in etapas}
+    deps = dependencias(etapas)
+    necesarias = set()
+    pila = []
+    for objetivo in objetivos:
+        coincidencias = [n for n in por_nombre if n == objetivo or n.startswith(objetivo + ':')]
+        if not coincidencias:
+            raise ValueError(f"Etapa desconocida: {objetivo}")
+        pila += coincidencias
+    while pila:
+        n = pila.pop()
+        if n not in necesarias:
+            necesarias.add(n)
+            pila.extend(deps[n])
+    return [e for e in etapas if e.nombre in necesarias]
+
+
+def _correr_etapa(nombre, funcion, params, salidas, log):
+    import instrumentacion as inst
+
+    for carpeta in {os.path.dirname(s) for s in salidas} | {os.path.dirname(log)}:
+        if carpeta:
+            os.makedirs(carpeta, exist_ok=True)
+
+    # Los procesos del pool no ejecutan atexit: las métricas se vuelcan por
+    # etapa, con un archivo Prometheus por etapa (<base>.<etapa>.prom)
+    metricas = inst.reiniciar()
+    metricas.script = 'pipeline.py'
+    prometheus = os.environ.get('CONOCARPUS_METRICAS_PROM')
+    if prometheus:
+        base, extension = os.path.splitext(prometheus)
+        metricas.prometheus = f"{base}.{nombre.replace(':', '_')}{extension}"
+
+    inicio = time.perf_counter()
+    try:
+        with open(log, 'w') as f, redirect_stdout(f), redirect_stderr(f), inst.etapa(nombre):
+            funcion(**params)
+    finally:
+        inst.METRICAS.finalizar()
+    return time.perf_counter() - inicio
+
+
+def _salidas_presentes(etapa):
+    return all(_expandir(s) for s in etapa.salidas)
+
+
+def ejecutar(etapas, procesos=1, forzar=(), plan=False, trabajo='.'):
+    """
+    Ejecuta las etapas pendientes respetando dependencias
+
+    Returns:
+        {etapa: 'al día' | 'ejecutada' | 'error' | 'bloqueada' | 'pendiente'}
+    """
+    ruta_estado = os.path.join(trabajo, ESTADO)
+    estado = leer_estado(ruta_estado)
+    cache = CacheHuellas(estado['archivos'])
+    deps = dependencias(etapas)
+    por_nombre = {e.nombre: e for e in etapas}
+    resultado = {}
+    en_curso = {}
+
+    def lista(nombre):
+        return nombre not in resultado and nombre not in en_curso.values() \
+            and all(resultado.get(d) in ('al día', 'ejecutada') for d in deps[nombre])
+
+    def bloqueada(nombre):
+        return any(resultado.get(d) in ('error', 'bloqueada', 'pendiente') for d in deps[nombre])
+
+    with ProcessPoolExecutor(max(1, procesos)) as pool:
+        while len(resultado) < len(etapas):
+            avance = False
+            for e in etapas:
+                if e.nombre in resultado or e.nombre in en_curso.values():
+                    continue
+                if bloqueada(e.nombre):
+                    resultado[e.nombre] = 'pendiente' if plan else 'bloqueada'
+                    avance = True
+                    continue
+                if not lista(e.nombre):
+                    continue
+                avance = True
+                try:
+                    huella = cache.etapa(e)
+                except FileNotFoundError as error:
+                    print(f"❌ {error}")
+                    resultado[e.nombre] = 'error'
+                    continue
+                previa = estado['etapas'].get(e.nombre, {}).get('huella')
+                if previa == huella and e.nombre not in forzar and _salidas_presentes(e):
+                    resultado[e.nombre] = 'al día'
+                    print(f"⏭️  {e.nombre:22} al día")
+                    continue
+                if plan:
+                    resultado[e.nombre] = 'pendiente'
+                    print(f"📝 {e.nombre:22} se ejecutaría")
+                    continue
+                log = os.path.join(trabajo, 'logs', e.nombre.replace(':', '_') + '.log')
+                futuro = pool.submit(_correr_etapa, e.nombre, e.funcion, e.params, e.salidas, log)
+                en_curso[futuro] = e.nombre
+                estado['etapas'].setdefault(e.nombre, {})['huella_en_curso'] = huella
+                print(f"▶️  {e.nombre:22} en ejecución")
+
+            if en_curso:
+                hechos, _ = wait(list(en_curso), return_when=FIRST_COMPLETED)
+                for futuro in hechos:
+                    nombre = en_curso.pop(futuro)
+                    e = por_nombre[nombre]
+                    registro = estado['etapas'][nombre]
+                    huella = registro.pop('huella_en_curso')
+                    try:
+                        segundos = futuro.result()
+                    except Exception as error:
+                        resultado[nombre] = 'error'
+                        print(f"❌ {nombre:22} error: {error} (ver logs/)")
+                        continue
+                    if not _salidas_presentes(e):
+                        resultado[nombre] = 'error'
+                        print(f"❌ {nombre:22} no generó: {', '.join(e.salidas)}")
+                        continue
+                    registro['huella'] = huella
+                    registro['segundos'] = round(segundos, 3)
+                    resultado[nombre] = 'ejecutada'
+                    guardar_estado(ruta_estado, estado)
+                    print(f"✅ {nombre:22} {segundos:8.1f} s")
+            elif not avance:
+                break
+
+    if not plan:
+        guardar_estado(ruta_estado, estado)
+    return resultado
+
+
+def cargar_config(ruta=None):
+    config = dict(CONFIG)
+    if ruta:
+        with open(ruta) as f:
+            config_usuario = json.load(f)
+        desconocidas = set(config_usuario) - set(CONFIG)
+        if desconocidas:
+            raise ValueError(f"Claves desconocidas en {ruta}: {', '.join(sorted(desconocidas))}")
+        config.update(config_usuario)
+    return config
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pipeline incremental (descarga → BEAST)")
+    parser.add_argument("objetivos", nargs='*',
+                        help="Etapas a construir (p. ej. beast, mafft, limpiar:ITS); defecto: todas")
+    parser.add_argument("--config", help="JSON con claves de CONFIG a reemplazar")
+    parser.add_argument("--procesos", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--forzar", action='append', default=[],
+                        help="Reejecutar esta etapa aunque su huella no cambie")
+    parser.add_argument("--plan", action="store_true", help="Solo mostrar qué se ejecutaría")
+    parser.add_argument("--listar", action="store_true", help="Listar etapas y dependencias")
+    args = parser.parse_args()
+
+    config = cargar_config(args.config)
+    etapas = seleccionar(construir_etapas(config), args.objetivos)
+
+    if args.listar:
+        deps = dependencias(etapas)
+        for e in etapas:
+            print(f"{e.nombre:22} ← {', '.join(sorted(deps[e.nombre])) or '-'}")
+        return
+
+    print("=" * 80)
+    print("🔁 PIPELINE INCREMENTAL")
+    print("=" * 80)
+    print(f"\n📁 Trabajo: {config['trabajo']}  ({len(etapas)} etapas, "
+          f"{args.procesos} proceso(s))\n")
+
+    resultado = ejecutar(etapas, args.procesos, set(args.forzar), args.plan, config['trabajo'])
+
+    conteo = {}
+    for valor in resultado.values():
+        conteo[valor] = conteo.get(valor, 0) + 1
+    print("\n" + "=" * 80)
+    print("📊 " + ', '.join(f"{v}: {n}" for v, n in sorted(conteo.items())))
+    print("=" * 80)
+    if any(v in ('error', 'bloqueada') for v in resultado.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
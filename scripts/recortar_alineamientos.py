@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+RECORTE DE COLUMNAS DE ALINEAMIENTOS - PROYECTO MANGLARES COMBRETACEAE
+======================================================================
+Propósito: Quitar de los alineamientos (sobre todo ITS y trnH-psbA) las
+          columnas con casi solo gaps, ambiguas o ruidosas, al estilo de
+          trimAl / Gblocks, antes de armar la supermatriz.
+
+Puntajes por columna (operaciones sobre la matriz completa, sin bucles por
+columna):
+    ocupacion     fracción de taxones sin gap ('-'); los '?' (marcador
+                  ausente en la supermatriz) no cuentan en ningún puntaje
+    ambiguedad    fracción de taxones con código ambiguo (N, R, Y, ...)
+                  entre los que no tienen gap
+    conservacion  identidad de pares: Σ c_b (c_b - 1) / (m (m - 1)), con c_b
+                  el conteo de cada base y m el total de bases no ambiguas
+                  (1 = columna invariable; columnas con m < 2 valen 0)
+
+Modos:
+    umbral       se conservan las columnas con ocupacion >= --ocupacion,
+                 ambiguedad <= --ambiguedad y conservacion >= --conservacion
+                 (como trimAl -gt / -st); --minimo garantiza una fracción
+                 mínima de columnas, devolviendo las de mayor ocupación
+                 (como trimAl -cons)
+    automatico   el umbral de ocupación se elige por pendiente, como
+                 trimAl -gappyout: la curva de ocupación ordenada se divide
+                 en VENTANAS tramos y el corte va donde más aumenta la
+                 pendiente entre tramos consecutivos. El umbral nunca pasa
+                 de OCUPACION_TOPE ni de (n-1)/n con n taxones: nunca se
+                 exige ocupación completa. Ambigüedad <= 0.5
+
+En ambos modos se descartan las columnas sin ninguna base, y con
+--bloque-minimo los tramos conservados más cortos que ese largo (como b4 de
+Gblocks).
+
+Salida: alineamiento recortado (FASTA o NEXUS, según la extensión) y un mapa
+de columnas TSV con los puntajes y la posición nueva de cada columna
+original (desde 1). Los charsets de una supermatriz NEXUS se trasladan a las
+columnas conservadas (los marcadores sin columnas se omiten) y se escriben en
+la salida NEXUS.
+
+Uso:
+    python recortar_alineamientos.py alineamientos/ITS_aligned.fasta ITS_trimmed.fasta
+    python recortar_alineamientos.py supermatriz.fasta recortada.nex --modo umbral --ocupacion 0.7
+"""
+
+import argparse
+import sys
+
+import numpy as np
+
+from alineamientos import (
+    BASES,
+    GAP,
+    codificar,
+    escribir_fasta,
+    escribir_nexus,
+    leer_matriz,
+    leer_particiones,
+)
+from archivos import sin_compresion
+
+# ============================================================================
+# CONFIGURACIÓN
+# ============================================================================
+
+MODOS = ('automatico', 'umbral')
+
+UMBRALES = {
+    'ocupacion': 0.5,
+    'ambiguedad': 0.5,
+    'conservacion': 0.0,
+    'minimo': 0.0,
+    'bloque_minimo': 1,
+}
+
+VENTANAS = 20            # tramos de la curva de ocupación en modo automático
+OCUPACION_TOPE = 0.9     # umbral automático máximo
+
+# ============================================================================
+# PUNTAJES
+# ============================================================================
+
+def puntajes(codigos, faltantes=None):
+    """
+    Puntajes por columna de una matriz codificada (taxones × sitios)
+
+    Args:
+        faltantes: máscara booleana de celdas '?' (se excluyen del conteo)
+
+    Returns:
+        dict con 'ocupacion', 'ambiguedad', 'conservacion' y 'bases'
+        (número de bases no ambiguas), arreglos float64 / int64 de largo L
+    """
+    n = np.full(codigos.shape[1], codigos.shape[0])
+    if faltantes is not None:
+        n = n - faltantes.sum(axis=0)
+    gaps = (codigos == GAP).sum(axis=0)
+    con_dato = n - gaps
+
+    conteos = np.stack([(codigos == b).sum(axis=0) for b in BASES])    # (4, L)
+    bases = conteos.sum(axis=0)
+    ambiguas = con_dato - bases
+
+    pares = bases * (bases - 1)
+    iguales = (conteos * (conteos - 1)).sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        conservacion = np.where(pares > 0, iguales / np.maximum(pares, 1), 0.0)
+        ambiguedad = np.where(con_dato > 0, ambiguas / np.maximum(con_dato, 1), 1.0)
+        ocupacion = np.where(n > 0, con_dato / np.maximum(n, 1), 0.0)
+
+    return {
+        'ocupacion': ocupacion,
+        'ambiguedad': ambiguedad,
+        'conservacion': conservacion,
+        'bases': bases,
+        'taxones': codigos.shape[0],
+    }
+
+
+def ocupacion_automatica(ocupacion, taxones=None):
+    """
+    Umbral de ocupación por pendiente (estilo gappyout): sobre la curva
+    ordenada de mayor a menor ocupación, en tramos de igual número de
+    columnas, el corte va en el tramo donde más aumenta la pendiente
+    respecto del anterior (fin de la meseta, comienzo de la caída hacia
+    las columnas con muchos gaps), en su mayor salto entre columnas
+
+    Args:
+        taxones: número de taxones; el umbral no pasa de (n-1)/n
+
+    Returns:
+        umbral, como máximo OCUPACION_TOPE
+    """
+    tope = OCUPACION_TOPE if not taxones else min(OCUPACION_TOPE, 1.0 - 1.0 / taxones)
+    curva = np.sort(ocupacion)[::-1]
+    if len(curva) < 3 or curva[0] == curva[-1]:
+        return min(float(curva[-1]), tope) if len(curva) else 0.0
+    ancho = max(1, len(curva) // VENTANAS)
+    puntos = np.unique(np.append(np.arange(0, len(curva), ancho), len(curva) - 1))
+    pendientes = (curva[puntos[:-1]] - curva[puntos[1:]]) / np.diff(puntos)
+    if len(pendientes) < 2:
+        return min(float(curva[-1]), tope)
+    salto = int(np.argmax(np.diff(pendientes))) + 1
+    # Dentro del tramo empinado, el corte va en la mayor caída entre columnas
+    tramo = curva[puntos[salto]:puntos[salto + 1] + 1]
+    return min(float(tramo[int(np.argmax(tramo[:-1] - tramo[1:]))]), tope)
+
+
+def _quitar_bloques_cortos(mascara, bloque_minimo):
+    """Descarta tramos de columnas conservadas más cortos que bloque_minimo"""
+    if bloque_minimo <= 1 or not mascara.any():
+        return mascara
+    bordes = np.diff(np.concatenate(([0], mascara.view(np.int8), [0])))
+    inicios = np.flatnonzero(bordes == 1)
+    fines = np.flatnonzero(bordes == -1)
+    cortos = fines - inicios < bloque_minimo
+    resultado = mascara.copy()
+    for inicio, fin in zip(inicios[cortos], fines[cortos]):
+        resultado[inicio:fin] = False
+    return resultado
+
+
+def seleccionar_columnas(p, modo='automatico', ocupacion=None, ambiguedad=None,
+                         conservacion=None, minimo=None, bloque_minimo=None):
+    """
+    Máscara booleana de columnas conservadas
+
+    Args:
+        p: puntajes() de la matriz
+        modo: 'automatico' o 'umbral'
+        resto: umbrales (defecto: UMBRALES); en modo automático el de
+            ocupación se calcula con ocupacion_automatica()
+
+    Returns:
+        (mascara, umbrales usados)
+    """
+    if modo not in MODOS:
+        raise ValueError(f"Modo desconocido: {modo} (opciones: {', '.join(MODOS)})")
+    u = dict(UMBRALES)
+    for clave, valor in (('ocupacion', ocupacion), ('ambiguedad', ambiguedad),
+                         ('conservacion', conservacion), ('minimo', minimo),
+                         ('bloque_minimo', bloque_minimo)):
+        if valor is not None:
+            u[clave] = valor
+    if modo == 'automatico' and ocupacion is None:
+        u['ocupacion'] = ocupacion_automatica(p['ocupacion'][p['bases'] > 0], p.get('taxones'))
+
+    mascara = ((p['bases'] > 0)
+               & (p['ocupacion'] >= u['ocupacion'])
+               & (p['ambiguedad'] <= u['ambiguedad'])
+               & (p['conservacion'] >= u['conservacion']))
+
+    # Fracción mínima: completar con las columnas de mayor ocupación
+    requeridas = int(np.ceil(u['minimo'] * len(mascara)))
+    if mascara.sum() < requeridas:
+        orden = np.lexsort((np.arange(len(mascara)), -p['ocupacion']))
+        orden = orden[p['bases'][orden] > 0]
+        mascara[orden[:requeridas]] = True
+
+    return _quitar_bloques_cortos(mascara, int(u['bloque_minimo'])), u
+
+
+# ============================================================================
+# APLICACIÓN
+# ============================================================================
+
+def recortar(registros, **opciones):
+    """
+    Recorta un alineamiento [(nombre, secuencia)] conservando los
+    caracteres originales
+
+    Returns:
+        (nombres, secuencias recortadas, mascara, puntajes, umbrales)
+    """
+    nombres, codigos = codificar(registros)
+    crudo = np.frombuffer(''.join(seq for _, seq in registros).encode('ascii'),
+                          dtype=np.uint8).reshape(codigos.shape)
+    p = puntajes(codigos, crudo == ord('?'))
+    mascara, umbrales = seleccionar_columnas(p, **opciones)
+    recortado = np.ascontiguousarray(crudo[:, mascara])
+    secuencias = [fila.tobytes().decode('ascii') for fila in recortado]
+    return nombres, secuencias, mascara, p, umbrales
+
+
+def remapear_particiones(particiones, mascara):
+    """[(marcador, inicio, fin)] (desde 1) a coordenadas del alineamiento recortado"""
+    nuevas = np.cumsum(mascara)
+    resultado = []
+    for marcador, inicio, fin in particiones:
+        conservadas = int(mascara[inicio - 1:fin].sum())
+        if conservadas:
+            ultimo = int(nuevas[fin - 1])
+            resultado.append((marcador, ultimo - conservadas + 1, ultimo))
+    return resultado
+
+
+def escribir_mapa(ruta, mascara, p):
+    """TSV: columna original, columna nueva ('-' si se descartó) y puntajes"""
+    nuevas = np.cumsum(mascara)
+    with open(ruta, 'w') as f:
+        f.write("original\tnueva\tocupacion\tambiguedad\tconservacion\n")
+        for i in range(len(mascara)):
+            nueva = str(int(nuevas[i])) if mascara[i] else '-'
+            f.write(f"{i + 1}\t{nueva}\t{p['ocupacion'][i]:.4f}\t"
+                    f"{p['ambiguedad'][i]:.4f}\t{p['conservacion'][i]:.4f}\n")
+
+
+def recortar_archivo(entrada, salida, mapa=None, **opciones):
+    """
+    Recorta un alineamiento de archivo a archivo (salida .nex/.nexus o FASTA);
+    los charsets de una entrada NEXUS pasan a la salida NEXUS remapeados
+
+    Raises:
+        ValueError: entrada sin alinear o recorte sin columnas
+    """
+    try:
+        nombres, secuencias, mascara, p, umbrales = recortar(leer_matriz(entrada), **opciones)
+    except ValueError as error:
+        # codificar(): secuencias de longitud desigual (archivo sin alinear)
+        raise ValueError(f"{entrada}: {error}") from None
+    if not mascara.any():
+        raise ValueError(f"{entrada}: el recorte no deja ninguna columna")
+    if sin_compresion(salida).lower().endswith(('.nex', '.nexus')):
+        particiones = None
+        if sin_compresion(entrada).lower().endswith(('.nex', '.nexus', '.nxs')):
+            particiones = remapear_particiones(leer_particiones(entrada), mascara)
+        escribir_nexus(salida, nombres, secuencias, particiones)
+    else:
+        escribir_fasta(salida, nombres, secuencias)
+    if mapa:
+        escribir_mapa(mapa, mascara, p)
+    return mascara, umbrales
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recorte de columnas (estilo trimAl / Gblocks)")
+    parser.add_argument("entrada", help="Alineamiento (FASTA, NEXUS o TNT)")
+    parser.add_argument("salida", help="Alineamiento recortado (.fasta o .nex)")
+    parser.add_argument("--modo", choices=MODOS, default='automatico')
+    parser.add_argument("--ocupacion", type=float,
+                        help="Fracción mínima de taxones sin gap (automático: por pendiente)")
+    parser.add_argument("--ambiguedad", type=float, help="Fracción máxima de códigos ambiguos")
+    parser.add_argument("--conservacion", type=float, help="Identidad de pares mínima")
+    parser.add_argument("--minimo", type=float, help="Fracción mínima de columnas a conservar")
+    parser.add_argument("--bloque-minimo", type=int, help="Largo mínimo de un tramo conservado")
+    parser.add_argument("--mapa", help="TSV con el mapa de columnas (defecto: <salida>.columnas.tsv)")
+    args = parser.parse_args()
+
+    mapa = args.mapa or f"{args.salida}.columnas.tsv"
+    try:
+        mascara, umbrales = recortar_archivo(
+            args.entrada, args.salida, mapa, modo=args.modo, ocupacion=args.ocupacion,
+            ambiguedad=args.ambiguedad, conservacion=args.conservacion, minimo=args.minimo,
+            bloque_minimo=args.bloque_minimo)
+    except ValueError as error:
+        sys.exit(f"❌ {error}")
+
+    print("=" * 80)
+    print("✂️  RECORTE DE COLUMNAS")
+    print("=" * 80)
+    print(f"\n📁 {args.entrada} → {args.salida}")
+    print(f"   Modo {args.modo}: ocupación >= {umbrales['ocupacion']:.3f}, "
+          f"ambigüedad <= {umbrales['ambiguedad']:.2f}, "
+          f"conservación >= {umbrales['conservacion']:.2f}")
+    print(f"   Columnas: {len(mascara)} → {int(mascara.sum())} "
+          f"({100 * mascara.mean():.1f}% conservadas)")
+    print(f"✅ Mapa de columnas: {mapa}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+REMUESTREO POR VECTORES DE PESOS - PROYECTO MANGLARES COMBRETACEAE
+==================================================================
+Propósito: Generar réplicas de bootstrap, Poisson, simétrico y jackknife
+          (bootstrap_2000.tre, poisson_1000.tre, symmetric_1000.tre) sin
+          copiar la matriz: cada réplica es un vector de pesos enteros
+          sobre los patrones de sitio.
+
+Método:
+  - Las columnas idénticas se comprimen en patrones con su conteo.
+  - La réplica i se genera con SeedSequence([semilla, i]): cualquier
+    réplica se reproduce por separado a partir de (método, semilla, i), así
+    que guardar 10.000 réplicas solo requiere guardar esos parámetros.
+  - Pesos por patrón de c sitios:
+        bootstrap  multinomial(n_sitios, conteos / n_sitios)
+        poisson    Poisson(c)                   (cada sitio ~ Poisson(1))
+        simetrico  c - bajan + suben, con (bajan, suben) ~ multinomial(c,
+                   [p/2, p/2]); TNT: p = 0.33
+        jackknife  binomial(c, 1 - p); TNT: p = 0.36
+  - Los vectores alimentan directamente a parsimonia_fitch.MatrizFitch
+    construida sobre los patrones, o se escriben como comandos `ccode`
+    de TNT (rangos 'a.b') o bloques `wtset` NEXUS (rangos 'a-b'); el peso
+    del patrón va en su primer sitio y el resto queda con peso 0.
+
+Uso:
+    python remuestreo.py supermatriz.tnt --metodo bootstrap --replicas 2000 --tnt boot.run
+    python remuestreo.py supermatriz.tnt --metodo jackknife --replicas 1000 --nexus jack.nex
+"""
+
+import argparse
+
+import numpy as np
+
+from alineamientos import leer_codificado
+from archivos import abrir
+
+# ============================================================================
+# CONFIGURACIÓN
+# ============================================================================
+
+METODOS = ('bootstrap', 'poisson', 'simetrico', 'jackknife')
+
+# Probabilidad de cambio por defecto (las de TNT para `resample`)
+PROBABILIDAD = {
+    'simetrico': 0.33,
+    'jackknife': 0.36,
+}
+
+# ============================================================================
+# PATRONES DE SITIO
+# ============================================================================
+
+def patrones(codigos):
+    """
+    Comprime columnas idénticas de una matriz codificada
+
+    Returns:
+        dict con 'codigos' (n, P) uint8, 'conteos' (P,), 'primeros' (P,)
+        índice del primer sitio de cada patrón y 'sitio_a_patron' (L,)
+    """
+    unicos, primeros, inversa, conteos = np.unique(
+        codigos.T, axis=0, return_index=True, return_inverse=True, return_counts=True)
+    # Orden de aparición en la matriz (más legible en los comandos de TNT)
+    orden = np.argsort(primeros)
+    rango = np.empty_like(orden)
+    rango[orden] = np.arange(len(orden))
+    return {
+        'codigos': np.ascontiguousarray(unicos[orden].T),
+        'conteos': conteos[orden],
+        'primeros': primeros[orden],
+        'sitio_a_patron': rango[inversa.ravel()],
+    }
+
+
+# ============================================================================
+# RÉPLICAS
+# ============================================================================
+
+def id_replica(metodo, semilla, replica):
+    return f"{metodo}-{semilla}-{replica}"
+
+
+def pesos_replica(conteos, metodo, semilla, replica, probabilidad=None):
+    """
+    Vector de pesos por patrón de una réplica (reproducible por separado)
+
+    Args:
+        conteos: sitios por patrón
+        metodo: 'bootstrap', 'poisson', 'simetrico' o 'jackknife'
+        semilla, replica: identifican la réplica
+        probabilidad: probabilidad de cambio (simétrico / jackknife)
+    """
+    if metodo not in METODOS:
+        raise ValueError(f"Método desconocido: {metodo} (opciones: {', '.join(METODOS)})")
+    if probabilidad is None:
+        probabilidad = PROBABILIDAD.get(metodo)
+
+    rng = np.random.default_rng(np.random.SeedSequence([semilla, replica]))
+    conteos = np.asarray(conteos, dtype=np.int64)
+
+    if metodo == 'bootstrap':
+        total = int(conteos.sum())
+        return rng.multinomial(total, conteos / total)
+    if metodo == 'poisson':
+        return rng.poisson(conteos)
+    if metodo == 'jackknife':
+        return rng.binomial(conteos, 1.0 - probabilidad)
+
+    bajan = rng.binomial(conteos, probabilidad / 2)
+    suben = rng.binomial(conteos - bajan, (probabilidad / 2) / (1 - probabilidad / 2))
+    return conteos - bajan + suben
+
+
+def iterar_replicas(conteos, metodo, n_replicas, semilla=1, probabilidad=None, inicio=0):
+    """Itera (id, pesos) para las réplicas inicio .. inicio + n_replicas - 1"""
+    for replica in range(inicio, inicio + n_replicas):
+        yield (id_replica(metodo, semilla, replica),
+               pesos_replica(conteos, metodo, semilla, replica, probabilidad))
+
+
+def pesos_por_sitio(pesos, datos):
+    """Expande pesos por patrón a pesos por sitio (peso en el primer sitio)"""
+    sitios = np.zeros(len(datos['sitio_a_patron']), dtype=np.int64)
+    sitios[datos['primeros']] = pesos
+    return sitios
+
+
+# ============================================================================
+# ESCRITURA
+# ============================================================================
+
+def _por_peso(pesos_sitio):
+    """{peso: [sitios]} para pesos > 0"""
+    grupos = {}
+    for peso in np.unique(pesos_sitio):
+        if peso > 0:
+            grupos[int(peso)] = np.flatnonzero(pesos_sitio == peso)
+    return grupos
+
+
+def _rangos(indices, base=0, separador='-'):
+    """
+    Lista compacta de índices consecutivos: '3-7 9 12-13' en NEXUS; en TNT
+    el rango se escribe '3.7' (separador='.'), porque en `ccode` el '-'
+    activa el modo no aditivo
+    """
+    partes = []
+    inicio = anterior = None
+    for i in indices:
+        i = int(i) + base
+        if anterior is not None and i == anterior + 1:
+            anterior = i
+            continue
+        if inicio is not None:
+            partes.append(str(inicio) if inicio == anterior else f"{inicio}{separador}{anterior}")
+        inicio = anterior = i
+    if inicio is not None:
+        partes.append(str(inicio) if inicio == anterior else f"{inicio}{separador}{anterior}")
+    return partes
+
+
+def escribir_tnt(ruta, datos, replicas, comando="mult = replic 10 hold 10 tbr ;"):
+    """
+    Script TNT: por réplica desactiva todos los caracteres, activa los de
+    peso > 0 con `ccode [ /peso lista`, ejecuta `comando` y restaura pesos
+    """
+    with abrir(ruta, 'w') as f:
+        for id_, pesos in replicas:
+            pesos_sitio = pesos_por_sitio(pesos, datos)
+            f.write(f"quote {id_} ;\n")
+            f.write("ccode ] . ;\n")
+            for peso, sitios in _por_peso(pesos_sitio).items():
+                # TNT admite pesos de 0 a 1000
+                f.write(f"ccode [ /{min(peso, 1000)} {' '.join(_rangos(sitios, separador='.'))} ;\n")
+            f.write(f"{comando}\n")
+            f.write("ccode [ /1 . ;\n")
+
+
+def escribir_nexus_pesos(ruta, datos, replicas):
+    """Bloque ASSUMPTIONS con un `wtset` por réplica (caracteres desde 1)"""
+    with abrir(ruta, 'w') as f:
+        f.write("#NEXUS\n\nbegin assumptions;\n")
+        for id_, pesos in replicas:
+            pesos_sitio = pesos_por_sitio(pesos, datos)
+            partes = [f"{peso}: {' '.join(_rangos(sitios, base=1))}"
+                      for peso, sitios in _por_peso(pesos_sitio).items()]
+            ceros = np.flatnonzero(pesos_sitio == 0)
+            if len(ceros):
+                partes.insert(0, f"0: {' '.join(_rangos(ceros, base=1))}")
+            nombre = id_.replace('-', '_')
+            f.write(f"    wtset {nombre} = {', '.join(partes)};\n")
+        f.write("end;\n")
+
+
+def guardar_replicas(ruta, datos, metodo, n_replicas, semilla=1, probabilidad=None):
+    """Guarda los vectores de pesos (.npz comprimido, tipo entero mínimo)"""
+    pesos = np.stack([p for _, p in iterar_replicas(
+        datos['conteos'], metodo, n_replicas, semilla, probabilidad)])
+    tipo = np.uint8 if pesos.max() < 256 else np.uint16 if pesos.max() < 65536 else np.uint32
+    np.savez_compressed(ruta, pesos=pesos.astype(tipo), conteos=datos['conteos'],
+                        primeros=datos['primeros'], metodo=metodo, semilla=semilla,
+                        probabilidad=-1.0 if probabilidad is None else probabilidad)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Réplicas de remuestreo como vectores de pesos")
+    parser.add_argument("matriz", help="Matriz (supermatriz.tnt, FASTA o NEXUS)")
+    parser.add_argument("--metodo", choices=METODOS, default='bootstrap')
+    parser.add_argument("--replicas", type=int, default=1000)
+    parser.add_argument("--semilla", type=int, default=1)
+    parser.add_argument("--inicio", type=int, default=0, help="Índice de la primera réplica")
+    parser.add_argument("--probabilidad", type=float,
+                        help="Probabilidad de cambio (simétrico 0.33, jackknife 0.36)")
+    parser.add_argument("--tnt", help="Script TNT con comandos ccode por réplica")
+    parser.add_argument("--comando", default="mult = replic 10 hold 10 tbr ;",
+                        help="Comando TNT a ejecutar en cada réplica")
+    parser.add_argument("--nexus", help="Bloque NEXUS con un wtset por réplica")
+    parser.add_argument("--npz", help="Guarda los vectores de pesos en .npz")
+    args = parser.parse_args()
+
+    nombres, codigos = leer_codificado(args.matriz)
+    datos = patrones(codigos)
+
+    print("=" * 80)
+    print("🎲 REMUESTREO POR VECTORES DE PESOS")
+    print("=" * 80)
+    print(f"\n📁 Matriz: {args.matriz} ({len(nombres)} taxones × {codigos.shape[1]} sitios, "
+          f"{len(datos['conteos'])} patrones)")
+    print(f"   {args.metodo}: {args.replicas} réplicas desde "
+          f"{id_replica(args.metodo, args.semilla, args.inicio)}\n")
+
+    def replicas():
+        return iterar_replicas(datos['conteos'], args.metodo, args.replicas,
+                               args.semilla, args.probabilidad, args.inicio)
+
+    if args.tnt:
+        escribir_tnt(args.tnt, datos, replicas(), args.comando)
+        print(f"✅ Script TNT: {args.tnt}")
+    if args.nexus:
+        escribir_nexus_pesos(args.nexus, datos, replicas())
+        print(f"✅ Bloque NEXUS: {args.nexus}")
+    if args.npz:
+        if args.inicio:
+            parser.error("--npz guarda réplicas desde 0; no combinar con --inicio")
+        guardar_replicas(args.npz, datos, args.metodo, args.replicas,
+                         args.semilla, args.probabilidad)
+        print(f"✅ Pesos: {args.npz}")
+    if not (args.tnt or args.nexus or args.npz):
+        # Resumen: fracción media de patrones excluidos (peso 0)
+        ceros = [float((p == 0).mean()) for _, p in replicas()]
+        print(f"   Patrones con peso 0 (media): {np.mean(ceros):.3f}")
+
+
+if __name__ == "__main__":
+    main()
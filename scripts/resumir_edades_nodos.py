@@ -0,0 +1,411 @@
+#!/usr/bin/env python3
+"""
+RESUMEN DE EDADES DE NODOS EN STREAMING - PROYECTO MANGLARES COMBRETACEAE
+==========================================================================
+Propósito: Reemplazo de TreeAnnotator para el análisis BEAST calibrado con
+          Dilcherocarpon. Recorre thesis_beast.trees en streaming, registra la
+          altura de cada clado del árbol objetivo y anota ese árbol con
+          height_median, height_95%_HPD y posterior.
+
+Las alturas se acumulan en bocetos de cuantiles de memoria acotada (tipo KLL),
+de modo que la memoria no crece con el número de muestras. Con --exacto se
+guardan todas las alturas y los cuantiles son exactos.
+
+Lectura del archivo de árboles:
+  - El total de muestras se cuenta primero sin parsear los árboles (o se
+    toma de un índice de desplazamientos ya guardado), de modo que el
+    burn-in se salta y cada muestra conservada va directo a los bocetos.
+  - Con --objetivo solo se registran frecuencias y alturas de los clados
+    del objetivo; no se guarda ninguna topología.
+  - Árbol MCC (sin --objetivo): cada muestra se codifica como (topología
+    canónica, alturas en preorden) con codificar() de almacen_arboles.py y
+    las topologías se internan (una por topología distinta, con un vector
+    de alturas representativo); el MCC se elige al final entre ellas (suma
+    de log de frecuencias de clados), sin volver a leer el archivo.
+
+Input:  thesis_beast.trees (NEXUS de BEAST o MrBayes)
+Output: árbol NEXUS anotado (equivalente a la salida de TreeAnnotator)
+
+Uso: python resumir_edades_nodos.py thesis_beast.trees thesis_mcc.tre --burnin 10
+"""
+
+import argparse
+import math
+from array import array
+
+from almacen_arboles import codificar, decodificar
+from arboles_nexus import (
+    alturas_nodos,
+    asignar_mascaras,
+    contar_arboles,
+    escribir_nexus,
+    iterar_arboles,
+    parsear_newick,
+    posiciones_arboles,
+)
+
+# ============================================================================
+# CONFIGURACIÓN
+# ============================================================================
+
+BURNIN_DEFECTO = 10.0   # % de árboles descartados (igual que TreeAnnotator)
+K_BOCETO = 200          # Tamaño de cada nivel del boceto de cuantiles
+MASA_HPD = 0.95
+
+# ============================================================================
+# BOCETOS DE CUANTILES
+# ============================================================================
+
+class BocetoCuantiles:
+    """
+    Boceto de cuantiles de memoria acotada (compactadores tipo KLL)
+
+    Cada nivel guarda como máximo k valores; al llenarse se ordena y se promueve
+    la mitad de los valores (alternando pares/impares) al nivel siguiente con
+    el doble de peso. Memoria O(k·log(n/k)), error de rango O(log(n/k)/k).
+    """
+
+    __slots__ = ('k', 'niveles', 'n', '_paridad')
+
+    def __init__(self, k=K_BOCETO):
+        self.k = k
+        self.niveles = [[]]
+        self.n = 0
+        self._paridad = 0
+
+    def agregar(self, valor):
+        self.niveles[0].append(valor)
+        self.n += 1
+        if len(self.niveles[0]) >= self.k:
+            self._compactar()
+
+    def _compactar(self):
+        nivel = 0
+        while nivel < len(self.niveles) and len(self.niveles[nivel]) >= self.k:
+            buffer = sorted(self.niveles[nivel])
+            resto = [buffer.pop()] if len(buffer) % 2 else []
+            self._paridad ^= 1
+            if nivel + 1 == len(self.niveles):
+                self.niveles.append([])
+            self.niveles[nivel + 1].extend(buffer[self._paridad::2])
+            self.niveles[nivel] = resto
+            nivel += 1
+
+    def items(self):
+        """Lista ordenada de (valor, peso)"""
+        return sorted((v, 1 << nivel)
+                      for nivel, valores in enumerate(self.niveles)
+                      for v in valores)
+
+
+class MuestrasExactas:
+    """Guarda todas las alturas (cuantiles exactos, memoria lineal)"""
+
+    __slots__ = ('valores',)
+
+    def __init__(self, k=None):
+        self.valores = array('d')
+
+    @property
+    def n(self):
+        return len(self.valores)
+
+    def agregar(self, valor):
+        self.valores.append(valor)
+
+    def items(self):
+        return [(v, 1) for v in sorted(self.valores)]
+
+
+def cuantil(items, q):
+    """Cuantil ponderado sobre items ordenados (valor, peso)"""
+    total = sum(p for _, p in items)
+    objetivo = q * total
+    acumulado = 0
+    for valor, peso in items:
+        acumulado += peso
+        if acumulado >= objetivo:
+            return valor
+    return items[-1][0]
+
+
+def intervalo_hpd(items, masa=MASA_HPD):
+    """Intervalo más corto que contiene la fracción `masa` del peso total"""
+    total = sum(p for _, p in items)
+    requerido = masa * total
+    mejor = (items[0][0], items[-1][0])
+    acumulado = 0
+    j = 0
+    # Ventana deslizante [i, j) sobre los valores ordenados
+    for i in range(len(items)):
+        while j < len(items) and acumulado < requerido:
+            acumulado += items[j][1]
+            j += 1
+        if acumulado < requerido:
+            break
+        if items[j - 1][0] - items[i][0] < mejor[1] - mejor[0]:
+            mejor = (items[i][0], items[j - 1][0])
+        acumulado -= items[i][1]
+    return mejor
+
+
+# ============================================================================
+# LECTURA DEL ARCHIVO DE ÁRBOLES
+# ============================================================================
+
+def _indice_taxa(raiz):
+    return {nombre: i for i, nombre in enumerate(sorted(h.nombre for h in raiz.hojas()))}
+
+
+def _mascaras_internas(topologia):
+    """[(posición en preorden, máscara)] de los nodos internos de una topología codificada"""
+    pila = []
+    internos = []
+    # Preorden invertido: los subárboles hijos ya están en la pila
+    for posicion in range(len(topologia) - 1, -1, -1):
+        codigo = topologia[posicion]
+        if codigo >= 0:
+            pila.append(1 << codigo)
+            continue
+        mascara = 0
+        for _ in range(-codigo):
+            mascara |= pila.pop()
+        pila.append(mascara)
+        internos.append((posicion, mascara))
+    internos.reverse()
+    return internos
+
+
+class ResumenClados:
+    """
+    Frecuencias y alturas de clados de muestras codificadas
+
+    Sin objetivos, las topologías se internan: cada una guarda sus máscaras
+    internas, un vector de alturas representativo (para reconstruir el MCC)
+    y cuántas muestras la tienen. Con objetivos solo se registran esos
+    clados y no se guarda ninguna topología.
+    """
+
+    def __init__(self, objetivos=None, exacto=False, k=K_BOCETO):
+        self.objetivos = objetivos
+        self.clase = MuestrasExactas if exacto else BocetoCuantiles
+        self.k = k
+        self.indice = None
+        self.ids = {}
+        self.topologias = []
+        self.internos = []
+        self.representantes = []
+        self.conteos = []
+        self.frecuencias = {}
+        self.alturas = {}
+        self.n_arboles = 0
+
+    def _internar(self, topologia, alturas):
+        """Id de una topología (se interna la primera vez que aparece)"""
+        clave = topologia.tobytes()
+        id_topologia = self.ids.get(clave)
+        if id_topologia is None:
+            id_topologia = self.ids[clave] = len(self.topologias)
+            self.topologias.append(topologia)
+            self.internos.append(_mascaras_internas(topologia))
+            self.representantes.append(alturas)
+            self.conteos.append(0)
+        return id_topologia
+
+    def agregar(self, raiz):
+        """Suma una muestra post burn-in"""
+        if self.indice is None:
+            self.indice = _indice_taxa(raiz)
+        topologia, _ = codificar(raiz, self.indice)
+        alturas = alturas_nodos(raiz)
+        vector = array('d', (alturas[n] for n in raiz.preorden()))
+        if self.objetivos is None:
+            id_topologia = self._internar(topologia, vector)
+            self.conteos[id_topologia] += 1
+            internos = self.internos[id_topologia]
+        else:
+            internos = [(posicion, mascara) for posicion, mascara in _mascaras_internas(topologia)
+                        if mascara in self.objetivos]
+        self.n_arboles += 1
+        for posicion, mascara in internos:
+            self.frecuencias[mascara] = self.frecuencias.get(mascara, 0) + 1
+            boceto = self.alturas.get(mascara)
+            if boceto is None:
+                boceto = self.alturas[mascara] = self.clase(self.k)
+            boceto.agregar(vector[posicion])
+
+    def elegir_mcc(self):
+        """Árbol de máxima credibilidad de clados (suma de log) entre las topologías vistas"""
+        mejor = None
+        mejor_score = -math.inf
+        for id_topologia, conteo in enumerate(self.conteos):
+            if not conteo:
+                continue
+            score = sum(math.log(self.frecuencias[m] / self.n_arboles)
+                        for _, m in self.internos[id_topologia])
+            if score > mejor_score:
+                mejor, mejor_score = id_topologia, score
+        return self.reconstruir(mejor), mejor_score
+
+    def reconstruir(self, id_topologia):
+        """Nodo de una topología internada, con las longitudes de su representante"""
+        topologia = self.topologias[id_topologia]
+        alturas = self.representantes[id_topologia]
+        taxa = sorted(self.indice, key=self.indice.get)
+        raiz = decodificar(topologia, [math.nan] * len(topologia), taxa)
+        altura = {}
+        for nodo, valor in zip(raiz.preorden(), alturas):
+            altura[nodo] = valor
+            if nodo.padre is not None:
+                nodo.longitud = altura[nodo.padre] - valor
+        asignar_mascaras(raiz, self.indice)
+        return raiz
+
+
+def registrar_alturas(ruta, burnin, objetivos=None, exacto=False, k=K_BOCETO):
+    """
+    Frecuencias y alturas de los clados de las muestras post burn-in
+
+    Args:
+        burnin: porcentaje de muestras iniciales descartadas
+        objetivos: conjunto de máscaras a registrar; None registra todos
+            (y las topologías, para elegir el MCC)
+        exacto: usar MuestrasExactas en lugar de BocetoCuantiles
+
+    Returns:
+        (ResumenClados, total de muestras, muestras descartadas)
+    """
+    posiciones = posiciones_arboles(ruta)
+    if posiciones is not None:
+        total = len(posiciones)
+    else:
+        total = contar_arboles(ruta) if burnin else None
+    saltar = int(total * burnin / 100) if total else 0
+
+    resumen = ResumenClados(objetivos, exacto, k)
+    for _, newick, traduccion in iterar_arboles(ruta, saltar=saltar, posiciones=posiciones):
+        resumen.agregar(parsear_newick(newick, traduccion))
+    return resumen, saltar + resumen.n_arboles, saltar
+
+
+# ============================================================================
+# ANOTACIÓN
+# ============================================================================
+
+def anotar_objetivo(objetivo, alturas, frecuencias, n_arboles, masa=MASA_HPD):
+    """
+    Fija alturas medianas en el árbol objetivo y devuelve las anotaciones
+
+    Returns:
+        {nodo: texto de anotación} para los nodos internos
+    """
+    alturas_originales = alturas_nodos(objetivo)
+    medianas = {}
+    anotaciones = {}
+
+    for nodo in objetivo.preorden():
+        if not nodo.hijos:
+            medianas[nodo] = 0.0
+            continue
+        posterior = frecuencias.get(nodo.mascara, 0) / n_arboles
+        boceto = alturas.get(nodo.mascara)
+        if boceto is None or boceto.n == 0:
+            medianas[nodo] = alturas_originales[nodo]
+            anotaciones[nodo] = f"posterior={posterior:.6g}"
+            continue
+        items = boceto.items()
+        mediana = cuantil(items, 0.5)
+        inferior, superior = intervalo_hpd(items, masa)
+        medianas[nodo] = mediana
+        anotaciones[nodo] = (f"height_median={mediana:.10g},"
+                             f"height_95%_HPD={{{inferior:.10g},{superior:.10g}}},"
+                             f"posterior={posterior:.6g}")
+
+    for nodo in objetivo.preorden():
+        if nodo.padre is not None:
+            nodo.longitud = max(0.0, medianas[nodo.padre] - medianas[nodo])
+
+    return anotaciones
+
+
+def resumir_edades(ruta_arboles, ruta_salida, ruta_objetivo=None,
+                   burnin=BURNIN_DEFECTO, exacto=False, k=K_BOCETO, masa=MASA_HPD):
+    """
+    Resume alturas de nodos y escribe el árbol objetivo anotado
+
+    Args:
+        ruta_arboles: archivo .trees de BEAST (o .t de MrBayes)
+        ruta_salida: archivo NEXUS de salida
+        ruta_objetivo: árbol objetivo; si es None se usa el árbol MCC
+        burnin: porcentaje de árboles iniciales descartados
+    """
+    print("=" * 80)
+    print("🌳 RESUMEN DE EDADES DE NODOS (STREAMING)")
+    print("=" * 80)
+    print(f"\n📁 Árboles:  {ruta_arboles} (burn-in {burnin:g}%)")
+
+    objetivo = None
+    objetivos = None
+    if ruta_objetivo:
+        _, newick, traduccion = next(iterar_arboles(ruta_objetivo))
+        objetivo = parsear_newick(newick, traduccion)
+        indice = _indice_taxa(objetivo)
+        asignar_mascaras(objetivo, indice)
+        objetivos = {n.mascara for n in objetivo.preorden() if n.hijos}
+        print(f"🎯 Objetivo: {ruta_objetivo}")
+    else:
+        print("🎯 Objetivo: árbol MCC (máxima credibilidad de clados)")
+
+    print(f"📐 Cuantiles: {'exactos' if exacto else f'boceto k={k}'}\n")
+
+    resumen, total, saltar = registrar_alturas(ruta_arboles, burnin, objetivos, exacto, k)
+    n_arboles, indice_muestras = resumen.n_arboles, resumen.indice
+    frecuencias, alturas = resumen.frecuencias, resumen.alturas
+    print(f"📊 {total} muestras, {saltar} de burn-in"
+          + (f", {len(resumen.topologias)} topologías distintas tras el burn-in"
+             if objetivos is None else ""))
+
+    if n_arboles == 0:
+        print("❌ ERROR: No quedan árboles después del burn-in")
+        return None
+
+    if objetivo is None:
+        objetivo, score = resumen.elegir_mcc()
+        print(f"✅ Árbol MCC elegido (log credibilidad: {score:.4f})")
+    elif set(indice) != set(indice_muestras):
+        raise ValueError("El árbol objetivo no tiene los mismos taxones que las muestras")
+    else:
+        asignar_mascaras(objetivo, indice_muestras)
+
+    anotaciones = anotar_objetivo(objetivo, alturas, frecuencias, n_arboles, masa)
+    taxa = sorted(indice_muestras, key=indice_muestras.get)
+    escribir_nexus(ruta_salida, taxa, [('TREE1', objetivo)],
+                   anotar=lambda nodo: anotaciones.get(nodo))
+
+    print(f"✅ {n_arboles} árboles resumidos, {len(anotaciones)} nodos anotados")
+    print(f"📁 Salida:   {ruta_salida}\n")
+    return ruta_salida
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Resume alturas de nodos (mediana y HPD) de un .trees de BEAST")
+    parser.add_argument("arboles", help="Archivo de árboles (.trees / .t)")
+    parser.add_argument("salida", help="Árbol NEXUS anotado de salida")
+    parser.add_argument("--objetivo", help="Árbol objetivo (por defecto: MCC)")
+    parser.add_argument("--burnin", type=float, default=BURNIN_DEFECTO,
+                        help="Porcentaje de burn-in (defecto: 10)")
+    parser.add_argument("--exacto", action="store_true",
+                        help="Cuantiles exactos (memoria proporcional a las muestras)")
+    parser.add_argument("--k", type=int, default=K_BOCETO,
+                        help="Tamaño del boceto de cuantiles (defecto: 200)")
+    parser.add_argument("--hpd", type=float, default=MASA_HPD,
+                        help="Masa del intervalo HPD (defecto: 0.95)")
+    args = parser.parse_args()
+
+    resumir_edades(args.arboles, args.salida, args.objetivo, args.burnin,
+                   args.exacto, args.k, args.hpd)
+
+
+if __name__ == "__main__":
+    main()
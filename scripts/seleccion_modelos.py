@@ -0,0 +1,539 @@
+#!/usr/bin/env python3
+"""
+SELECCIÓN DE MODELOS DE SUSTITUCIÓN - PROYECTO MANGLARES COMBRETACEAE
+======================================================================
+Propósito: Reemplazar la corrida manual de jModelTest (88 modelos, GTR+I+G
+          elegido) por un motor de verosimilitud en NumPy que se puede
+          re-ejecutar cada vez que cambia la matriz.
+
+Método:
+  - Compresión por patrones de sitio: cada columna distinta del alineamiento
+    se evalúa una sola vez y se pondera por su frecuencia.
+  - Pruning de Felsenstein con matrices P(t) calculadas en lote para todas
+    las ramas y categorías gamma a partir de la descomposición espectral de Q
+    (una sola eigh por evaluación, exponenciales vectorizadas).
+  - Modelos: JC, F81, K80, HKY, SYM, GTR, cada uno con +I, +G y +I+G
+    (24 candidatos; gamma discreta de 4 categorías, método de medias).
+  - Árbol fijo: NJ sobre distancias K2P (o el árbol que se indique). Se
+    optimizan los parámetros del modelo y un factor de escala del árbol; con
+    --optimizar-ramas se optimiza además cada longitud de rama.
+  - Los modelos se ajustan en paralelo en un pool de procesos.
+  - K cuenta parámetros de sustitución + frecuencias + I + G + 2n-3 ramas,
+    como jModelTest, para que AIC/AICc/BIC sean comparables.
+
+Input:  supermatriz.fasta o un alineamiento por marcador
+Output: tabla AIC/AICc/BIC (TSV), línea lset para MrBayes y JSON con el
+        modelo elegido para beast_thesis_config.py
+
+Uso: python seleccion_modelos.py supermatriz.fasta --salida modelos.tsv --procesos 4
+"""
+
+import argparse
+import json
+import math
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from alineamientos import DESCONOCIDO, GAP, leer_codificado
+from archivos import abrir
+
+# ============================================================================
+# CONFIGURACIÓN
+# ============================================================================
+
+# tasas: nº de tasas de intercambio libres; freqs: frecuencias empíricas
+MODELOS_BASE = {
+    'JC':  {'tasas': 0, 'freqs': False, 'nst': 1},
+    'F81': {'tasas': 0, 'freqs': True,  'nst': 1},
+    'K80': {'tasas': 1, 'freqs': False, 'nst': 2},
+    'HKY': {'tasas': 1, 'freqs': True,  'nst': 2},
+    'SYM': {'tasas': 5, 'freqs': False, 'nst': 6},
+    'GTR': {'tasas': 5, 'freqs': True,  'nst': 6},
+}
+VARIANTES = ['', '+I', '+G', '+I+G']
+MODELOS = [base + v for base in MODELOS_BASE for v in VARIANTES]
+
+N_CATEGORIAS_GAMMA = 4
+TOLERANCIA = 0.01       # mejora mínima de lnL por ronda de optimización
+MAX_RONDAS = 10
+
+# Intercambios en orden AC, AG, AT, CG, CT, GT (índices de A=0 C=1 G=2 T=3)
+PARES = [(0, 1), (0, 2), (0, 3), (1, 2), (1, 3), (2, 3)]
+TRANSICIONES = (1, 4)   # AG y CT
+
+# ============================================================================
+# DATOS: PATRONES DE SITIO
+# ============================================================================
+
+def patrones_de_sitio(codigos):
+    """
+    Comprime columnas idénticas
+
+    Returns:
+        dict con 'puntas' (n, P, 4) float, 'pesos' (P,), 'n_sitios',
+        'freqs' empíricas e 'invariable' (P, 4): estados compatibles con
+        una columna constante
+    """
+    codigos = np.where((codigos & GAP) > 0, DESCONOCIDO, codigos)
+    patrones, pesos = np.unique(codigos.T, axis=0, return_counts=True)
+    bits = np.arange(4, dtype=np.uint8)
+    puntas = ((patrones.T[:, :, None] >> bits) & 1).astype(np.float64)
+
+    # Frecuencias empíricas: cada código ambiguo reparte su peso entre sus bases
+    por_sitio = puntas / puntas.sum(axis=2, keepdims=True)
+    ambiguos = puntas.sum(axis=2) == 4
+    conteo = (por_sitio * (~ambiguos)[:, :, None] * pesos[None, :, None]).sum(axis=(0, 1))
+    freqs = conteo / conteo.sum()
+
+    return {
+        'puntas': puntas,
+        'pesos': pesos.astype(np.float64),
+        'n_sitios': int(codigos.shape[1]),
+        'freqs': freqs,
+        'invariable': puntas.prod(axis=0),
+    }
+
+
+# ============================================================================
+# MODELO DE SUSTITUCIÓN
+# ============================================================================
+
+def intercambios(base, tasas):
+    """Vector de 6 tasas de intercambio (GT = 1) para un modelo base"""
+    r = np.ones(6)
+    if MODELOS_BASE[base]['tasas'] == 1:
+        r[list(TRANSICIONES)] = tasas[0]
+    elif MODELOS_BASE[base]['tasas'] == 5:
+        r[:5] = tasas
+    return r
+
+
+def descomponer_q(r, freqs):
+    """
+    Descomposición espectral de Q normalizada (tasa media 1)
+
+    Returns:
+        (autovalores, A, B) con P(t) = A · diag(exp(λt)) · B
+    """
+    s = np.zeros((4, 4))
+    for (i, j), rij in zip(PARES, r):
+        s[i, j] = s[j, i] = rij
+    q = s * freqs[None, :]
+    np.fill_diagonal(q, -q.sum(axis=1))
+    q /= -np.dot(freqs, np.diag(q))
+
+    raiz_pi = np.sqrt(freqs)
+    simetrica = q * raiz_pi[:, None] / raiz_pi[None, :]
+    autovalores, u = np.linalg.eigh((simetrica + simetrica.T) / 2)
+    return autovalores, u / raiz_pi[:, None], u.T * raiz_pi[None, :]
+
+
+def matrices_p(descomposicion, longitudes, tasas_categoria):
+    """P(t) en lote: (ramas, categorías, 4, 4)"""
+    autovalores, a, b = descomposicion
+    tiempos = longitudes[:, None] * tasas_categoria[None, :]
+    expo = np.exp(tiempos[:, :, None] * autovalores[None, None, :])
+    p = np.einsum('ij,nkj,jl->nkil', a, expo, b)
+    return np.clip(p, 0.0, None)
+
+
+def _gamma_regularizada(a, x):
+    """P(a, x) incompleta regularizada (serie / fracción continua)"""
+    if x <= 0:
+        return 0.0
+    lg = math.lgamma(a)
+    if x < a + 1:
+        termino = suma = 1.0 / a
+        ap = a
+        for _ in range(500):
+            ap += 1
+            termino *= x / ap
+            suma += termino
+            if abs(termino) < abs(suma) * 1e-14:
+                break
+        return suma * math.exp(-x + a * math.log(x) - lg)
+    b = x + 1 - a
+    c = 1e300
+    d = 1 / b
+    h = d
+    for i in range(1, 500):
+        an = -i * (i - a)
+        b += 2
+        d = an * d + b
+        d = 1e-300 if abs(d) < 1e-300 else d
+        c = b + an / c
+        c = 1e-300 if abs(c) < 1e-300 else c
+        d = 1 / d
+        delta = d * c
+        h *= delta
+        if abs(delta - 1) < 1e-14:
+            break
+    return 1.0 - math.exp(-x + a * math.log(x) - lg) * h
+
+
+def tasas_gamma(alpha, k=N_CATEGORIAS_GAMMA):
+    """Tasas medias de k categorías de Gamma(alpha, alpha) (Yang 1994)"""
+    cortes = [0.0]
+    for i in range(1, k):
+        p = i / k
+        lo, hi = 0.0, 1.0
+        while _gamma_regularizada(alpha, alpha * hi) < p:
+            hi *= 2
+        for _ in range(60):
+            medio = (lo + hi) / 2
+            if _gamma_regularizada(alpha, alpha * medio) < p:
+                lo = medio
+            else:
+                hi = medio
+        cortes.append((lo + hi) / 2)
+
+    acumulado = [_gamma_regularizada(alpha + 1, alpha * x) for x in cortes[1:]] + [1.0]
+    tasas = np.diff([0.0] + acumulado) * k
+    return tasas / tasas.mean()
+
+
+# ============================================================================
+# ÁRBOL Y PRUNING DE FELSENSTEIN
+# ============================================================================
+
+def preparar_arbol(raiz, nombres):
+    """
+    Convierte un Nodo en arreglos para el pruning
+
+    Returns:
+        dict con 'hijos' (lista por nodo interno en postorden),
+        'longitudes' (por nodo, 0 en la raíz) y 'n_hojas'
+    """
+    indice_taxon = {nombre: i for i, nombre in enumerate(nombres)}
+    hojas = raiz.hojas()
+    if {h.nombre for h in hojas} != set(nombres):
+        raise ValueError("Los taxones del árbol no coinciden con el alineamiento")
+
+    # Hojas 0..n-1 en el orden del alineamiento, internos después (postorden)
+    ids = {h: indice_taxon[h.nombre] for h in hojas}
+    internos = [n for n in raiz.postorden() if n.hijos]
+    for k, nodo in enumerate(internos):
+        ids[nodo] = len(nombres) + k
+
+    longitudes = np.zeros(len(ids))
+    for nodo, i in ids.items():
+        if nodo is not raiz:
+            longitudes[i] = nodo.longitud or 0.0
+
+    return {
+        'hijos': [[ids[h] for h in nodo.hijos] for nodo in internos],
+        'longitudes': longitudes,
+        'n_hojas': len(nombres),
+        'raiz': ids[raiz],
+    }
+
+
+def log_verosimilitud(datos, arbol, base, tasas, pinv, alpha, longitudes):
+    """lnL de un modelo sobre el árbol fijo (patrones ponderados)"""
+    freqs = datos['freqs'] if MODELOS_BASE[base]['freqs'] else np.full(4, 0.25)
+    descomposicion = descomponer_q(intercambios(base, tasas), freqs)
+    tasas_cat = tasas_gamma(alpha) if alpha is not None else np.ones(1)
+    p = matrices_p(descomposicion, longitudes, tasas_cat)
+
+    n_hojas = arbol['n_hojas']
+    puntas = datos['puntas']
+    parciales = {}
+    escala = np.zeros(len(datos['pesos']))
+
+    for k, hijos in enumerate(arbol['hijos']):
+        producto = None
+        for h in hijos:
+            # (K, P, 4) = parcial del hijo · P(t)^T
+            parcial = puntas[h][None] if h < n_hojas else parciales.pop(h)
+            mensaje = np.matmul(parcial, p[h].transpose(0, 2, 1))
+            producto = mensaje if producto is None else producto * mensaje
+        maximo = producto.max(axis=(0, 2))
+        maximo[maximo <= 0] = 1e-300
+        producto /= maximo[None, :, None]
+        escala += np.log(maximo)
+        parciales[n_hojas + k] = producto
+
+    raiz = parciales[arbol['raiz']]
+    variable = (raiz @ freqs).mean(axis=0)
+    log_variable = np.log(np.maximum(variable, 1e-300)) + escala
+
+    if pinv:
+        invariable = datos['invariable'] @ freqs
+        with np.errstate(divide='ignore'):
+            por_sitio = np.logaddexp(np.log1p(-pinv) + log_variable,
+                                     np.log(pinv) + np.log(invariable))
+    else:
+        por_sitio = log_variable
+
+    return float(np.dot(datos['pesos'], por_sitio))
+
+
+# ============================================================================
+# OPTIMIZACIÓN
+# ============================================================================
+
+_RAZON_AUREA = (math.sqrt(5) - 1) / 2
+
+
+def _seccion_aurea(f, a, b, tol=1e-3):
+    """Maximiza f en [a, b] (unimodal); retorna (x, f(x))"""
+    c = b - _RAZON_AUREA * (b - a)
+    d = a + _RAZON_AUREA * (b - a)
+    fc, fd = f(c), f(d)
+    while abs(b - a) > tol:
+        if fc > fd:
+            b, d, fd = d, c, fc
+            c = b - _RAZON_AUREA * (b - a)
+            fc = f(c)
+        else:
+            a, c, fc = c, d, fd
+            d = a + _RAZON_AUREA * (b - a)
+            fd = f(d)
+    return (c, fc) if fc > fd else (d, fd)
+
+
+def ajustar_modelo(nombre, datos, arbol, optimizar_ramas=False):
+    """
+    Ajusta un modelo por optimización coordenada (sección áurea)
+
+    Returns:
+        dict con lnL, K y parámetros estimados
+    """
+    base = nombre.split('+')[0]
+    con_i = '+I' in nombre
+    con_g = '+G' in nombre
+    n_tasas = MODELOS_BASE[base]['tasas']
+
+    # Parámetros en escala transformada: (nombre, valor, límite inf, límite sup)
+    parametros = {f'log_r{i}': 0.0 for i in range(n_tasas)}
+    if n_tasas == 1:
+        parametros['log_r0'] = math.log(2.0)
+    if con_i:
+        parametros['pinv'] = 0.2
+    if con_g:
+        parametros['log_alpha'] = 0.0
+    parametros['log_escala'] = 0.0
+    limites = {'pinv': (0.0, 0.95), 'log_alpha': (math.log(0.02), math.log(100.0)),
+               'log_escala': (math.log(0.01), math.log(100.0))}
+
+    longitudes = arbol['longitudes'].copy()
+
+    def evaluar(valores, ramas):
+        tasas = [math.exp(valores[f'log_r{i}']) for i in range(n_tasas)]
+        alpha = math.exp(valores['log_alpha']) if con_g else None
+        return log_verosimilitud(datos, arbol, base, tasas, valores.get('pinv', 0.0),
+                                 alpha, ramas * math.exp(valores['log_escala']))
+
+    lnl = evaluar(parametros, longitudes)
+    for _ in range(MAX_RONDAS):
+        anterior = lnl
+        for clave in list(parametros):
+            a, b = limites.get(clave, (-7.0, 7.0))
+
+            def f(x, clave=clave):
+                return evaluar({**parametros, clave: x}, longitudes)
+
+            x, valor = _seccion_aurea(f, a, b)
+            if valor > lnl:
+                parametros[clave], lnl = x, valor
+
+        if optimizar_ramas:
+            for i in range(len(longitudes)):
+                if i == arbol['raiz']:
+                    continue
+
+                def f(x, i=i):
+                    ramas = longitudes.copy()
+                    ramas[i] = math.exp(x)
+                    return evaluar(parametros, ramas)
+
+                x, valor = _seccion_aurea(f, math.log(1e-8), math.log(10.0), tol=1e-2)
+                if valor > lnl:
+                    longitudes[i], lnl = math.exp(x), valor
+
+        if lnl - anterior < TOLERANCIA:
+            break
+
+    n_ramas = 2 * arbol['n_hojas'] - 3
+    k = n_tasas + (3 if MODELOS_BASE[base]['freqs'] else 0) + con_i + con_g + n_ramas
+    resultado = {
+        'modelo': nombre,
+        'lnL': lnl,
+        'K': k,
+        'tasas': intercambios(base, [math.exp(parametros[f'log_r{i}'])
+                                     for i in range(n_tasas)]).tolist(),
+        'freqs': (datos['freqs'] if MODELOS_BASE[base]['freqs'] else np.full(4, 0.25)).tolist(),
+        'pinv': parametros.get('pinv', 0.0),
+        'alpha': math.exp(parametros['log_alpha']) if con_g else None,
+        'escala_arbol': math.exp(parametros['log_escala']),
+    }
+    return resultado
+
+
+# ============================================================================
+# SELECCIÓN EN PARALELO
+# ============================================================================
+
+_CONTEXTO = {}
+
+
+def _iniciar_trabajador(datos, arbol, optimizar_ramas):
+    _CONTEXTO.update(datos=datos, arbol=arbol, optimizar_ramas=optimizar_ramas)
+
+
+def _ajustar_en_trabajador(nombre):
+    return ajustar_modelo(nombre, _CONTEXTO['datos'], _CONTEXTO['arbol'],
+                          _CONTEXTO['optimizar_ramas'])
+
+
+def arbol_inicial(nombres, codigos):
+    """Árbol NJ sobre distancias K2P (distancias NaN se reemplazan por el máximo)"""
+    from arboles_rapidos import neighbor_joining
+    from matriz_distancias import matriz_distancias
+
+    d = matriz_distancias(codigos, 'k2p')
+    maximo = np.nanmax(d) if np.isfinite(d).any() else 1.0
+    d[~np.isfinite(d)] = maximo
+    return neighbor_joining(d, nombres)
+
+
+def seleccionar_modelos(nombres, codigos, raiz=None, modelos=MODELOS,
+                        procesos=1, optimizar_ramas=False):
+    """Ajusta todos los modelos y retorna la tabla con AIC, AICc y BIC"""
+    datos = patrones_de_sitio(codigos)
+    if raiz is None:
+        raiz = arbol_inicial(nombres, codigos)
+    arbol = preparar_arbol(raiz, nombres)
+
+    if procesos > 1:
+        with ProcessPoolExecutor(procesos, initializer=_iniciar_trabajador,
+                                 initargs=(datos, arbol, optimizar_ramas)) as pool:
+            resultados = list(pool.map(_ajustar_en_trabajador, modelos))
+    else:
+        resultados = [ajustar_modelo(m, datos, arbol, optimizar_ramas) for m in modelos]
+
+    return criterios(resultados, datos['n_sitios'])
+
+
+def criterios(resultados, n):
+    """Agrega AIC, AICc, BIC, deltas y pesos de Akaike a cada resultado"""
+    for r in resultados:
+        k = r['K']
+        r['AIC'] = -2 * r['lnL'] + 2 * k
+        r['AICc'] = r['AIC'] + (2 * k * (k + 1) / (n - k - 1) if n - k - 1 > 0 else math.inf)
+        r['BIC'] = -2 * r['lnL'] + k * math.log(n)
+
+    for criterio in ('AIC', 'AICc', 'BIC'):
+        mejor = min(r[criterio] for r in resultados)
+        pesos = [math.exp(-0.5 * (r[criterio] - mejor)) for r in resultados]
+        total = sum(pesos)
+        for r, w in zip(resultados, pesos):
+            r[f'd{criterio}'] = r[criterio] - mejor
+            r[f'w{criterio}'] = w / total
+    return resultados
+
+
+def mejor_modelo(resultados, criterio='BIC'):
+    return min(resultados, key=lambda r: r[criterio])
+
+
+# ============================================================================
+# SALIDAS: TABLA, MRBAYES, BEAST
+# ============================================================================
+
+def escribir_tabla(ruta, resultados, criterio='BIC'):
+    columnas = ['modelo', 'lnL', 'K', 'AIC', 'dAIC', 'wAIC', 'AICc', 'dAICc', 'wAICc',
+                'BIC', 'dBIC', 'wBIC']
+    with abrir(ruta, 'w') as f:
+        f.write('\t'.join(columnas) + '\n')
+        for r in sorted(resultados, key=lambda r: r[criterio]):
+            f.write('\t'.join(str(r[c]) if c in ('modelo', 'K') else f"{r[c]:.4f}"
+                              for c in columnas) + '\n')
+
+
+def lset_mrbayes(modelo):
+    """Comandos lset/prset de MrBayes equivalentes al modelo"""
+    base = modelo.split('+')[0]
+    con_i = '+I' in modelo
+    con_g = '+G' in modelo
+    rates = {(False, False): 'equal', (True, False): 'propinv',
+             (False, True): 'gamma', (True, True): 'invgamma'}[(con_i, con_g)]
+    freqs = 'dirichlet(1,1,1,1)' if MODELOS_BASE[base]['freqs'] else 'fixed(equal)'
+    return [f"lset nst={MODELOS_BASE[base]['nst']} rates={rates};",
+            f"prset statefreqpr={freqs};"]
+
+
+def actualizar_mrbayes(ruta, modelo):
+    """Reescribe lset (y su comentario) y statefreqpr en mrbayes_commands.nex"""
+    with open(ruta, 'r') as f:
+        texto = f.read()
+
+    lset, prset = lset_mrbayes(modelo)
+    texto, n = re.subn(r"^([ \t]*)\[Set substitution model:[^\]]*\]\n([ \t]*)lset [^\n]*\n",
+                       lambda m: (f"{m.group(1)}[Set substitution model: {modelo} "
+                                  f"(best model from seleccion_modelos.py)]\n{m.group(2)}{lset}\n"),
+                       texto, flags=re.M)
+    if n == 0:
+        raise ValueError(f"No se encontró la línea lset en {ruta}")
+    texto = re.sub(r"prset statefreqpr=[^;]*;", prset, texto)
+
+    with open(ruta, 'w') as f:
+        f.write(texto)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Selección de modelos de sustitución (AIC/AICc/BIC)")
+    parser.add_argument("alineamiento", help="FASTA, NEXUS o TNT alineado")
+    parser.add_argument("--arbol", help="Árbol fijo (por defecto: NJ sobre K2P)")
+    parser.add_argument("--salida", default="modelos.tsv", help="Tabla de resultados")
+    parser.add_argument("--json", help="Escribe el modelo elegido (para beast_thesis_config.py)")
+    parser.add_argument("--criterio", choices=['AIC', 'AICc', 'BIC'], default='BIC')
+    parser.add_argument("--modelos", help="Lista separada por comas (defecto: los 24)")
+    parser.add_argument("--procesos", type=int, default=1)
+    parser.add_argument("--optimizar-ramas", action="store_true")
+    parser.add_argument("--actualizar-mrbayes", metavar="NEX",
+                        help="Reescribe la línea lset de mrbayes_commands.nex")
+    args = parser.parse_args()
+
+    nombres, codigos = leer_codificado(args.alineamiento)
+    raiz = None
+    if args.arbol:
+        from arboles_nexus import iterar_arboles, parsear_newick
+        _, newick, traduccion = next(iterar_arboles(args.arbol))
+        raiz = parsear_newick(newick, traduccion)
+
+    modelos = args.modelos.split(',') if args.modelos else MODELOS
+    print("=" * 80)
+    print("🧮 SELECCIÓN DE MODELOS DE SUSTITUCIÓN")
+    print("=" * 80)
+    print(f"\n📁 {args.alineamiento}: {len(nombres)} taxones × {codigos.shape[1]} sitios")
+    print(f"🔬 {len(modelos)} modelos, {args.procesos} proceso(s)\n")
+
+    resultados = seleccionar_modelos(nombres, codigos, raiz, modelos,
+                                     args.procesos, args.optimizar_ramas)
+    escribir_tabla(args.salida, resultados, args.criterio)
+
+    print(f"{'Modelo':<10} {'-lnL':>12} {'K':>4} {'AIC':>12} {'AICc':>12} {'BIC':>12}")
+    print("-" * 80)
+    for r in sorted(resultados, key=lambda r: r[args.criterio]):
+        print(f"{r['modelo']:<10} {-r['lnL']:12.4f} {r['K']:4d} "
+              f"{r['AIC']:12.4f} {r['AICc']:12.4f} {r['BIC']:12.4f}")
+
+    mejor = mejor_modelo(resultados, args.criterio)
+    print(f"\n✅ Mejor modelo ({args.criterio}): {mejor['modelo']} (-lnL = {-mejor['lnL']:.2f})")
+    print("   MrBayes: " + ' '.join(lset_mrbayes(mejor['modelo'])))
+    print(f"📁 Tabla: {args.salida}")
+
+    if args.json:
+        with abrir(args.json, 'w') as f:
+            json.dump(mejor, f, indent=2)
+        print(f"📁 Modelo elegido: {args.json}")
+    if args.actualizar_mrbayes:
+        actualizar_mrbayes(args.actualizar_mrbayes, mejor['modelo'])
+        print(f"📝 Actualizado: {args.actualizar_mrbayes}")
+
+
+if __name__ == "__main__":
+    main()
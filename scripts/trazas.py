@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+LECTURA DE TRAZAS MCMC - PROYECTO MANGLARES COMBRETACEAE
+========================================================
+Propósito: Leer trazas de parámetros de BEAST (.log) y MrBayes (.p) como
+          matrices NumPy, sin pasar por Tracer ni por R.
+
+Formato: texto separado por tabuladores; las líneas de comentario de BEAST
+('#') y la línea [ID: ...] de MrBayes se ignoran; la primera línea restante
+es la cabecera de columnas (Sample / Gen, ...). Las trazas .gz se leen y
+escriben de forma transparente (archivos.py).
+"""
+
+import numpy as np
+
+from archivos import abrir
+
+# ============================================================================
+# LECTURA
+# ============================================================================
+
+def leer_traza(ruta):
+    """
+    Lee una traza MCMC
+
+    Returns:
+        (columnas, valores) con valores float64 (muestras × columnas)
+    """
+    with abrir(ruta, 'r') as f:
+        for linea in f:
+            if linea.strip() and not linea.startswith(('#', '[')):
+                columnas = linea.rstrip('\n').split('\t')
+                break
+        else:
+            raise ValueError(f"Traza sin cabecera: {ruta}")
+        valores = np.loadtxt(f, delimiter='\t', ndmin=2, comments=('#', '['))
+
+    if valores.size and valores.shape[1] != len(columnas):
+        raise ValueError(f"{ruta}: {valores.shape[1]} valores por fila, "
+                         f"{len(columnas)} columnas en la cabecera")
+    return columnas, valores.reshape(-1, len(columnas))
+
+
+def escribir_traza(ruta, columnas, valores):
+    """Escribe una traza con el mismo formato (la primera columna como entero)"""
+    with abrir(ruta, 'w') as f:
+        f.write('\t'.join(columnas) + '\n')
+        for fila in valores:
+            f.write(f"{int(fila[0])}\t" + '\t'.join(repr(float(v)) for v in fila[1:]) + '\n')
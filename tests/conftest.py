@@ -0,0 +1,16 @@
+"""
+Configuración de pytest: los scripts del proyecto se importan como módulos
+sueltos desde scripts/ (igual que cuando se ejecutan desde esa carpeta).
+"""
+
+import os
+import sys
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPTS = os.path.join(RAIZ, 'scripts')
+DATOS = os.path.join(RAIZ, 'data')
+RESULTADOS = os.path.join(RAIZ, 'results')
+ANALISIS = os.path.join(RAIZ, 'analyses')
+
+if SCRIPTS not in sys.path:
+    sys.path.insert(0, SCRIPTS)
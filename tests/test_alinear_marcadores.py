@@ -0,0 +1,166 @@
+"""
+Pruebas de alinear_marcadores.py con mafft_falso.py en lugar de MAFFT:
+reparto de hilos, caché por contenido y manejo de fallas.
+"""
+
+import os
+import sys
+
+import pytest
+
+from conftest import SCRIPTS
+
+import alinear_marcadores as am
+from archivos import abrir
+
+MAFFT_FALSO = [sys.executable, os.path.join(SCRIPTS, 'mafft_falso.py')]
+
+
+def escribir_fasta(ruta, secuencias):
+    with abrir(ruta, 'w') as f:
+        for i, seq in enumerate(secuencias):
+            f.write(f">s{i}\n{seq}\n")
+
+
+def leer_fasta(ruta):
+    registros = {}
+    nombre = None
+    with abrir(ruta, 'r') as f:
+        for linea in f:
+            linea = linea.strip()
+            if linea.startswith('>'):
+                nombre = linea[1:]
+                registros[nombre] = ''
+            elif nombre:
+                registros[nombre] += linea
+    return registros
+
+
+@pytest.fixture
+def pares(tmp_path):
+    """Tres marcadores de costo muy distinto (ITS >> matK > rbcL)"""
+    entrada = tmp_path / 'entrada'
+    salida = tmp_path / 'salida'
+    entrada.mkdir()
+    tamanos = {'ITS': (12, 600), 'matK': (8, 300), 'rbcL': (4, 100)}
+    for marcador, (n, largo) in tamanos.items():
+        escribir_fasta(entrada / f'{marcador}_all.fasta',
+                       ['ACGT' * (largo // 4 - i) for i in range(n)])
+    return am.pares_carpeta(str(entrada), str(salida))
+
+
+# ============================================================================
+# PLANIFICACIÓN
+# ============================================================================
+
+def test_repartir_hilos_proporcional():
+    assert am.repartir_hilos([], 4) == []
+    assert am.repartir_hilos([5, 1, 1], 2) == [1, 1, 1]
+    hilos = am.repartir_hilos([90, 9, 1], 8)
+    assert sum(hilos) == 8
+    assert hilos[0] > hilos[1] >= hilos[2] >= 1
+
+
+def test_planificar_ordena_y_reparte(pares):
+    trabajos = am.planificar(pares, 8)
+    assert [t['marcador'] for t in trabajos] == ['ITS', 'matK', 'rbcL']
+    assert sum(t['hilos'] for t in trabajos) == 8
+    assert all(t['hilos'] >= 1 for t in trabajos)
+    assert trabajos[0]['hilos'] == max(t['hilos'] for t in trabajos)
+
+
+def test_planificar_algoritmo_grande(pares):
+    trabajos = am.planificar(pares, 4, umbral_secuencias=10)
+    algoritmos = {t['marcador']: t['algoritmo'] for t in trabajos}
+    assert algoritmos == {'ITS': 'fftns2', 'matK': 'linsi', 'rbcL': 'linsi'}
+
+
+# ============================================================================
+# ALINEAMIENTO Y CACHÉ
+# ============================================================================
+
+def test_alinea_con_mafft_falso(pares):
+    resultados = am.alinear_marcadores(pares, 4, MAFFT_FALSO)
+    assert {m: estado for m, (estado, _) in resultados.items()} == dict.fromkeys(pares, 'alineado')
+    for marcador, (entrada, salida) in pares.items():
+        alineado = leer_fasta(salida)
+        assert alineado.keys() == leer_fasta(entrada).keys()
+        assert len({len(seq) for seq in alineado.values()}) == 1
+
+
+def test_segunda_corrida_desde_cache(pares):
+    am.alinear_marcadores(pares, 4, MAFFT_FALSO)
+    primera = {m: open(s).read() for m, (_, s) in pares.items()}
+    for _, salida in pares.values():
+        os.remove(salida)
+
+    resultados = am.alinear_marcadores(pares, 4, MAFFT_FALSO)
+    assert {m: estado for m, (estado, _) in resultados.items()} == dict.fromkeys(pares, 'cache')
+    assert {m: open(s).read() for m, (_, s) in pares.items()} == primera
+
+
+def test_cache_guarda_un_alineamiento_por_marcador(pares):
+    cache = os.path.join(os.path.dirname(pares['ITS'][1]), am.CACHE)
+    am.alinear_marcadores(pares, 4, MAFFT_FALSO)
+    escribir_fasta(pares['ITS'][0], ['ACGTACGT', 'ACGT', 'ACG', 'AC'])
+
+    resultados = am.alinear_marcadores(pares, 4, MAFFT_FALSO)
+    assert resultados['ITS'][0] == 'alineado'
+    assert resultados['rbcL'][0] == 'cache'
+    archivos = sorted(os.listdir(cache))
+    assert len(archivos) == len(pares)
+    assert sorted(a.split('.', 1)[0] for a in archivos) == sorted(pares)
+
+
+def test_sin_cache(pares):
+    am.alinear_marcadores(pares, 4, MAFFT_FALSO, cache=False)
+    resultados = am.alinear_marcadores(pares, 4, MAFFT_FALSO, cache=False)
+    assert all(estado == 'alineado' for estado, _ in resultados.values())
+    assert not os.path.exists(os.path.join(os.path.dirname(pares['ITS'][1]), am.CACHE))
+
+
+def test_entrada_comprimida(tmp_path):
+    entrada = tmp_path / 'ITS_all.fasta.gz'
+    escribir_fasta(entrada, ['ACGTACGT', 'ACG'])
+    salida = tmp_path / 'ITS_aligned.fasta'
+    am.alinear_marcadores({'ITS': (str(entrada), str(salida))}, 1, MAFFT_FALSO)
+    assert leer_fasta(salida) == {'s0': 'ACGTACGT', 's1': 'ACG-----'}
+    assert sorted(os.listdir(tmp_path)) == sorted(['ITS_all.fasta.gz', 'ITS_aligned.fasta',
+                                                   am.CACHE])
+
+
+# ============================================================================
+# FALLAS
+# ============================================================================
+
+def _sin_temporales(pares):
+    carpeta = os.path.dirname(pares['ITS'][1])
+    return [a for a in os.listdir(carpeta) if a.endswith(('.tmp', '.entrada'))] == []
+
+
+@pytest.mark.parametrize('ejecutable', [
+    [sys.executable, '-c', 'import sys; sys.stderr.write("falla simulada\\n"); sys.exit(3)'],
+    [sys.executable, '-c', 'pass'],
+    [os.path.join(SCRIPTS, 'no_existe_mafft')],
+])
+def test_falla_del_alineador(pares, ejecutable):
+    with pytest.raises(RuntimeError, match='3 marcador'):
+        am.alinear_marcadores(pares, 2, ejecutable)
+    assert not any(os.path.exists(salida) for _, salida in pares.values())
+    assert _sin_temporales(pares)
+
+
+def test_mensaje_de_error_incluye_stderr(pares):
+    trabajo = am.planificar({'rbcL': pares['rbcL']}, 1)[0]
+    os.makedirs(os.path.dirname(trabajo['salida']))
+    ejecutable = [sys.executable, '-c', 'import sys; sys.stderr.write("falla simulada\\n"); sys.exit(3)']
+    with pytest.raises(RuntimeError, match='código 3') as error:
+        am.alinear(trabajo, ejecutable)
+    assert 'falla simulada' in str(error.value)
+
+
+def test_falla_no_contamina_la_cache(pares):
+    cache = os.path.join(os.path.dirname(pares['ITS'][1]), am.CACHE)
+    with pytest.raises(RuntimeError):
+        am.alinear_marcadores(pares, 2, [sys.executable, '-c', 'pass'])
+    assert not os.path.exists(cache) or os.listdir(cache) == []
@@ -0,0 +1,68 @@
+"""
+almacen_arboles: el .ctrees "d" reproduce sin pérdida cada muestra de
+thesis_beast.trees (nombres, topología y cada longitud de rama), también
+al exportarlo de vuelta a NEXUS; "q" respeta su cota de error.
+"""
+
+import os
+
+import pytest
+
+from conftest import RESULTADOS
+
+from almacen_arboles import compactar, contar_muestras, exportar_nexus, leer_cabecera
+from arboles_nexus import asignar_mascaras, contar_arboles, iterar_arboles, parsear_newick
+
+ARBOLES_BEAST = os.path.join(RESULTADOS, 'trees', 'bayesian', 'thesis_beast.trees')
+
+
+def ramas(ruta):
+    """[(nombre, {máscara del clado: longitud de su rama})] de cada muestra"""
+    indice = None
+    muestras = []
+    for nombre, newick, traduccion in iterar_arboles(ruta):
+        raiz = parsear_newick(newick, traduccion)
+        if indice is None:
+            indice = {n: i for i, n in enumerate(sorted(h.nombre for h in raiz.hojas()))}
+        asignar_mascaras(raiz, indice)
+        muestras.append((nombre, {n.mascara: n.longitud for n in raiz.preorden()}))
+    return muestras
+
+
+@pytest.fixture(scope='module')
+def originales():
+    return ramas(ARBOLES_BEAST)
+
+
+def test_ida_y_vuelta_sin_perdida(tmp_path, originales):
+    compacto = str(tmp_path / 'beast.ctrees')
+    n_muestras, n_topologias = compactar(ARBOLES_BEAST, compacto)
+    assert n_muestras == len(originales)
+    assert n_topologias < n_muestras
+    assert contar_muestras(compacto) == contar_arboles(compacto) == len(originales)
+    with open(compacto, 'rb') as f:
+        assert leer_cabecera(f)['version'] == 2
+
+    assert ramas(compacto) == originales
+    exportado = str(tmp_path / 'beast.trees')
+    exportar_nexus(compacto, exportado)
+    assert ramas(exportado) == originales
+
+
+def test_saltar_burnin(tmp_path, originales):
+    compacto = str(tmp_path / 'beast.ctrees')
+    compactar(ARBOLES_BEAST, compacto)
+    nombres = [nombre for nombre, _, _ in iterar_arboles(compacto, saltar=100)]
+    assert nombres == [nombre for nombre, _ in originales[100:]]
+
+
+def test_cuantizado_con_cota_de_error(tmp_path, originales):
+    compacto = str(tmp_path / 'beast_q.ctrees')
+    compactar(ARBOLES_BEAST, compacto, precision='q', decimales=4)
+    for (nombre_q, q), (nombre, exacto) in zip(ramas(compacto), originales):
+        assert nombre_q == nombre
+        assert q.keys() == exacto.keys()
+        for mascara, longitud in exacto.items():
+            if longitud is None:
+                continue
+            assert abs(q[mascara] - longitud) <= 0.5e-4 + 1e-12
@@ -0,0 +1,151 @@
+"""
+arboles_rapidos: el NJ con ventanas de candidatos da el mismo árbol que el
+NJ ingenuo O(n³) de Saitou & Nei; UPGMA respeta el clado de calibración.
+"""
+
+import os
+
+import numpy as np
+import pytest
+
+from conftest import DATOS
+
+from alineamientos import leer_codificado
+from arboles_nexus import biparticiones
+from arboles_rapidos import distancias_codificadas, neighbor_joining, upgma
+
+SUPERMATRIZ = os.path.join(DATOS, 'supermatrix', 'supermatriz.fasta')
+
+
+def nj_ingenuo(distancias, nombres):
+    """
+    NJ de libro: matriz Q completa en cada paso
+
+    Returns:
+        (conjunto de biparticiones como frozensets de nombres,
+         {par de hojas: distancia en el árbol})
+    """
+    # Cada nodo es la tupla de sus hojas
+    d = {((a,), (b,)): distancias[i, j]
+         for i, a in enumerate(nombres) for j, b in enumerate(nombres)}
+    activos = [(nombre,) for nombre in nombres]
+    hojas_bajo = {}
+    longitudes = {}
+    while len(activos) > 3:
+        n = len(activos)
+        sumas = {x: sum(d[x, y] for y in activos if y != x) for x in activos}
+        _, i, j = min(((n - 2) * d[x, y] - sumas[x] - sumas[y], a, b)
+                      for a, x in enumerate(activos) for b, y in enumerate(activos) if a < b)
+        x, y = activos[i], activos[j]
+        li = 0.5 * d[x, y] + (sumas[x] - sumas[y]) / (2 * (n - 2))
+        nuevo = x + y
+        longitudes[x], longitudes[y] = max(0.0, li), max(0.0, d[x, y] - li)
+        hojas_bajo[nuevo] = (x, y)
+        for z in activos:
+            if z not in (x, y):
+                d[nuevo, z] = d[z, nuevo] = 0.5 * (d[x, z] + d[y, z] - d[x, y])
+        activos = [z for z in activos if z not in (x, y)] + [nuevo]
+    a, b, c = activos
+    longitudes[a] = max(0.0, 0.5 * (d[a, b] + d[a, c] - d[b, c]))
+    longitudes[b] = max(0.0, 0.5 * (d[a, b] + d[b, c] - d[a, c]))
+    longitudes[c] = max(0.0, 0.5 * (d[a, c] + d[b, c] - d[a, b]))
+
+    todos = frozenset(nombres)
+    splits = set()
+    for clado in list(hojas_bajo) + [a, b, c]:
+        if 1 < len(clado) < len(nombres) - 1:
+            lado = frozenset(clado)
+            splits.add(min(lado, todos - lado, key=sorted))
+    return splits, _patristicas(longitudes, hojas_bajo, [a, b, c], nombres)
+
+
+def _patristicas(longitudes, hijos, raiz, nombres):
+    """Distancia entre hojas sumando ramas hasta el ancestro común"""
+    camino = {}
+    pila = [(clado, 0.0, ()) for clado in raiz]
+    while pila:
+        clado, profundidad, ancestros = pila.pop()
+        profundidad += longitudes[clado]
+        ancestros = ancestros + ((clado, profundidad),)
+        if len(clado) == 1:
+            camino[clado[0]] = ancestros
+        else:
+            pila.extend((h, profundidad, ancestros) for h in hijos[clado])
+    resultado = {}
+    for a in nombres:
+        for b in nombres:
+            comunes = [p for (c, p), (c2, _) in zip(camino[a], camino[b]) if c == c2]
+            base = comunes[-1] if comunes else 0.0
+            resultado[a, b] = 0.0 if a == b else camino[a][-1][1] + camino[b][-1][1] - 2 * base
+    return resultado
+
+
+def resumen_nj(raiz, nombres):
+    indice = {nombre: i for i, nombre in enumerate(nombres)}
+    splits = {frozenset(nombres[k] for k in range(len(nombres)) if s >> k & 1)
+              for s in biparticiones(raiz, indice)}
+    todos = frozenset(nombres)
+    splits = {min(s, todos - s, key=sorted) for s in splits}
+    profundidad = {raiz: 0.0}
+    ancestros = {raiz: (raiz,)}
+    for nodo in raiz.preorden():
+        for hijo in nodo.hijos:
+            profundidad[hijo] = profundidad[nodo] + hijo.longitud
+            ancestros[hijo] = ancestros[nodo] + (hijo,)
+    hojas = {h.nombre: h for h in raiz.hojas()}
+    patristicas = {}
+    for a in nombres:
+        for b in nombres:
+            comun = [x for x, y in zip(ancestros[hojas[a]], ancestros[hojas[b]]) if x is y][-1]
+            patristicas[a, b] = (profundidad[hojas[a]] + profundidad[hojas[b]]
+                                 - 2 * profundidad[comun])
+    return splits, patristicas
+
+
+def comparar(distancias, nombres, ventana):
+    splits, patristicas = resumen_nj(neighbor_joining(distancias, nombres, ventana), nombres)
+    splits_ingenuo, patristicas_ingenuo = nj_ingenuo(distancias, nombres)
+    assert splits == splits_ingenuo
+    for par, valor in patristicas_ingenuo.items():
+        assert patristicas[par] == pytest.approx(valor, abs=1e-9)
+
+
+@pytest.mark.parametrize('semilla', range(5))
+@pytest.mark.parametrize('ventana', [1, 4, 16])
+def test_nj_igual_a_ingenuo_aleatorio(semilla, ventana):
+    rng = np.random.default_rng(semilla)
+    n = 25
+    d = rng.random((n, n))
+    d = d + d.T
+    np.fill_diagonal(d, 0.0)
+    comparar(d, [f"t{i}" for i in range(n)], ventana)
+
+
+@pytest.mark.parametrize('ventana', [2, 16])
+def test_nj_igual_a_ingenuo_supermatriz(ventana):
+    nombres, d = distancias_codificadas(*leer_codificado(SUPERMATRIZ))
+    comparar(d, nombres, ventana)
+
+
+def test_nj_recupera_arbol_aditivo():
+    # ((a:1,b:2):1,c:3,(d:1,e:1):2) no enraizado
+    nombres = ['a', 'b', 'c', 'd', 'e']
+    d = np.array([[0, 3, 5, 5, 5],
+                  [3, 0, 6, 6, 6],
+                  [5, 6, 0, 6, 6],
+                  [5, 6, 6, 0, 2],
+                  [5, 6, 6, 2, 0]], dtype=float)
+    splits, patristicas = resumen_nj(neighbor_joining(d, nombres), nombres)
+    # Cada bipartición se representa por su lado con el primer nombre
+    assert splits == {frozenset('ab'), frozenset('abc')}
+    for i, a in enumerate(nombres):
+        for j, b in enumerate(nombres):
+            assert patristicas[a, b] == pytest.approx(d[i, j])
+
+
+def test_upgma_clado_monofiletico():
+    nombres, d = distancias_codificadas(*leer_codificado(SUPERMATRIZ))
+    clado = ['Buchenavia_tetraphylla', 'Conocarpus_erectus',
+             'Laguncularia_racemosa', 'Terminalia_catappa']
+    raiz = upgma(d, nombres, clado)
+    assert any({h.nombre for h in nodo.hojas()} == set(clado) for nodo in raiz.preorden())
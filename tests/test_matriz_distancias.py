@@ -0,0 +1,55 @@
+"""
+matriz_distancias: las distancias vectorizadas por bloques coinciden con un
+cálculo directo sitio a sitio sobre la supermatriz.
+"""
+
+import math
+import os
+
+import numpy as np
+import pytest
+
+from conftest import DATOS
+
+from alineamientos import codificar, leer_matriz
+from matriz_distancias import matriz_distancias
+
+SUPERMATRIZ = os.path.join(DATOS, 'supermatrix', 'supermatriz.fasta')
+PURINAS = {'A', 'G'}
+
+
+def distancia_directa(a, b, modelo):
+    """Distancia por pares recorriendo los sitios uno a uno"""
+    validos = diferentes = transiciones = 0
+    for x, y in zip(a, b):
+        if x not in 'ACGT' or y not in 'ACGT':
+            continue
+        validos += 1
+        if x != y:
+            diferentes += 1
+            if (x in PURINAS) == (y in PURINAS):
+                transiciones += 1
+    if validos == 0:
+        return math.nan
+    p = diferentes / validos
+    if modelo == 'p':
+        return p
+    if modelo == 'jc69':
+        return -0.75 * math.log(1 - 4 * p / 3)
+    P = transiciones / validos
+    Q = p - P
+    return -0.5 * math.log(1 - 2 * P - Q) - 0.25 * math.log(1 - 2 * Q)
+
+
+@pytest.mark.parametrize('modelo', ['p', 'jc69', 'k2p'])
+@pytest.mark.parametrize('bloque, procesos', [(512, 1), (3, 1), (7, 2)])
+def test_igual_a_calculo_directo(modelo, bloque, procesos):
+    registros = [(n, seq.upper()) for n, seq in leer_matriz(SUPERMATRIZ)]
+    _, codigos = codificar(registros)
+    d = matriz_distancias(codigos, modelo, bloque=bloque, procesos=procesos)
+    esperado = np.array([[0.0 if i == j else distancia_directa(a, b, modelo)
+                          for j, (_, b) in enumerate(registros)]
+                         for i, (_, a) in enumerate(registros)])
+    # Conteos exactos; el cociente se calcula en float32
+    np.testing.assert_allclose(d, esperado, rtol=1e-6, atol=1e-9)
+    np.testing.assert_array_equal(d, d.T)
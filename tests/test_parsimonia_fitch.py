@@ -0,0 +1,109 @@
+"""
+parsimonia_fitch: longitud de Fitch y pasos mínimos/máximos del árbol de
+TNT sobre supermatriz.tnt (analyses/tnt/tnt_stats.log), y el algoritmo
+empaquetado contra un Fitch de conjuntos sitio a sitio.
+"""
+
+import os
+
+import numpy as np
+import pytest
+
+from conftest import ANALISIS, DATOS, RESULTADOS
+
+from alineamientos import DESCONOCIDO, GAP, TABLA, leer_codificado
+from arboles_nexus import iterar_arboles, parsear_newick
+from parsimonia_fitch import MatrizFitch
+
+MATRIZ_TNT = os.path.join(DATOS, 'supermatrix', 'supermatriz.tnt')
+ARBOL_TNT = os.path.join(RESULTADOS, 'trees', 'parsimony', 'arbol_conocarpus_parsimonia.tre')
+LOG_TNT = os.path.join(ANALISIS, 'tnt', 'tnt_stats.log')
+
+# analyses/tnt/tnt_stats.log: "Best score (TBR): 1891", "Minimum possible
+# steps (total = 1325)", "Maximum possible steps (total = 3079)"
+LONGITUD_TNT = 1891
+MINIMO_TNT = 1325
+MAXIMO_TNT = 3079
+
+
+@pytest.fixture(scope='module')
+def matriz():
+    return MatrizFitch(*leer_codificado(MATRIZ_TNT))
+
+
+@pytest.fixture(scope='module')
+def arbol():
+    _, newick, traduccion = next(iterar_arboles(ARBOL_TNT))
+    return parsear_newick(newick, traduccion)
+
+
+def test_valores_del_log_de_tnt():
+    with open(LOG_TNT) as f:
+        log = f.read()
+    assert f"Best score (TBR): {LONGITUD_TNT}." in log
+    assert f"Minimum possible steps (total = {MINIMO_TNT})" in log
+    assert f"Maximum possible steps (total = {MAXIMO_TNT})" in log
+
+
+def test_longitud_igual_a_tnt(matriz, arbol):
+    assert matriz.longitud(arbol) == LONGITUD_TNT
+
+
+def test_minmax_igual_a_tnt(matriz):
+    assert int(matriz.minimos.sum()) == MINIMO_TNT
+    assert int(matriz.maximos.sum()) == MAXIMO_TNT
+    ci, ri = matriz.indices(LONGITUD_TNT)
+    assert ci == pytest.approx(MINIMO_TNT / LONGITUD_TNT)
+    assert ri == pytest.approx((MAXIMO_TNT - LONGITUD_TNT) / (MAXIMO_TNT - MINIMO_TNT))
+
+
+def fitch_conjuntos(raiz, filas, codigos, sitio):
+    """Fitch clásico con conjuntos de Python en un sitio"""
+    pasos = 0
+    conjuntos = {}
+    for nodo in raiz.postorden():
+        if not nodo.hijos:
+            conjuntos[nodo] = {b for b in range(5) if codigos[filas[nodo], sitio] >> b & 1}
+            continue
+        actual = conjuntos[nodo.hijos[0]]
+        for hijo in nodo.hijos[1:]:
+            otro = conjuntos[hijo]
+            if actual & otro:
+                actual = actual & otro
+            else:
+                actual = actual | otro
+                pasos += 1
+        conjuntos[nodo] = actual
+    return pasos
+
+
+def test_por_sitio_igual_a_fitch_de_conjuntos(matriz, arbol):
+    longitud, pasos = matriz.longitud(arbol, por_sitio=True)
+    filas = matriz._filas_hojas(arbol)
+    codigos = matriz.codigos & 0b1111
+    esperado = [fitch_conjuntos(arbol, filas, codigos, s) for s in range(matriz.n_sitios)]
+    np.testing.assert_array_equal(pasos, esperado)
+    assert longitud == LONGITUD_TNT
+
+
+def test_pesos_equivalen_a_duplicar_sitios(matriz, arbol):
+    pesos = np.ones(matriz.n_sitios, dtype=np.int64)
+    pesos[::3] = 2
+    _, pasos = matriz.longitud(arbol, por_sitio=True)
+    assert matriz.longitud(arbol, pesos=pesos) == int(np.dot(pasos, pesos))
+
+
+def test_gap_quinto_estado_y_datos_faltantes():
+    secuencias = [b'A-A', b'A-A', b'C?-', b'CN-']
+    codigos = np.array([TABLA[np.frombuffer(s, dtype=np.uint8)] for s in secuencias])
+    arbol = parsear_newick('((a,b),(c,d));')
+
+    faltante = MatrizFitch('abcd', codigos)
+    assert faltante.longitud(arbol, por_sitio=True)[1].tolist() == [1, 0, 0]
+
+    quinto = MatrizFitch('abcd', codigos, gaps='quinto')
+    # N y '?' admiten también el gap: la columna 2 no suma pasos
+    assert quinto.longitud(arbol, por_sitio=True)[1].tolist() == [1, 0, 1]
+    assert quinto.minimos.tolist() == [1, 0, 1]
+    assert quinto.maximos.tolist() == [2, 0, 2]
+    assert (quinto.codigos[2:, 1] == DESCONOCIDO | GAP).all()
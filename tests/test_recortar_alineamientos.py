@@ -0,0 +1,43 @@
+"""
+recortar_alineamientos: los charsets de una supermatriz NEXUS siguen a las
+columnas conservadas; una entrada sin alinear termina con un mensaje.
+"""
+
+import sys
+
+import numpy as np
+import pytest
+
+import recortar_alineamientos as ra
+from alineamientos import escribir_fasta, escribir_nexus, leer_matriz, leer_particiones
+
+
+def test_remapear_particiones():
+    mascara = np.array([1, 0, 1, 0, 0, 0, 1, 1], dtype=bool)
+    particiones = [('ITS', 1, 3), ('matK', 4, 6), ('rbcL', 7, 8)]
+    assert ra.remapear_particiones(particiones, mascara) == [('ITS', 1, 2), ('rbcL', 3, 4)]
+
+
+def test_charsets_pasan_a_la_salida(tmp_path):
+    # ITS: columnas 1-4 (la 3 casi sin datos); matK: 5-8
+    nombres = ['a', 'b', 'c', 'd']
+    secuencias = ['AC-TACGT', 'AC-TACGA', 'ACGTACGT', 'AG-TTCGT']
+    entrada = tmp_path / 'sm.nex'
+    salida = tmp_path / 'recortada.nex'
+    escribir_nexus(entrada, nombres, secuencias, [('ITS', 1, 4), ('matK', 5, 8)])
+
+    mascara, _ = ra.recortar_archivo(str(entrada), str(salida), modo='umbral', ocupacion=0.5)
+    assert mascara.tolist() == [True, True, False, True, True, True, True, True]
+    assert leer_particiones(salida) == [('ITS', 1, 3), ('matK', 4, 7)]
+    assert [seq for _, seq in leer_matriz(salida)] == ['ACTACGT', 'ACTACGA', 'ACTACGT', 'AGTTCGT']
+
+
+def test_entrada_sin_alinear_termina_con_mensaje(tmp_path, monkeypatch, capsys):
+    entrada = tmp_path / 'ITS_all.fasta'
+    escribir_fasta(entrada, ['a', 'b'], ['ACGTAC', 'ACG'])
+    monkeypatch.setattr(sys, 'argv', ['recortar_alineamientos.py', str(entrada),
+                                      str(tmp_path / 'salida.fasta')])
+    with pytest.raises(SystemExit) as salida:
+        ra.main()
+    assert 'longitud desigual' in str(salida.value.code)
+    assert str(entrada) in str(salida.value.code)